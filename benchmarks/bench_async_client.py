@@ -0,0 +1,55 @@
+""" Compare the synchronous make_request() with the pooled AsyncClient against a local mock API.
+
+Run from the repository root:
+    python -m benchmarks.bench_async_client
+"""
+import asyncio
+import contextlib
+import io
+import time
+import outages
+from benchmarks.mock_api import serve, base_url
+from benchmarks.synthetic import generate_site
+
+def summarise(name, latencies, seconds):
+    """ Return a line of requests/sec and p99 latency. """
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return f'{name:<24} {len(latencies) / seconds:>10.1f} {p99 * 1000:>10.2f}'
+
+def bench_sync(num_requests, url):
+    """ Sequential make_request() calls, each opening a new connection. """
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(num_requests):
+        t = time.perf_counter()
+        outages.make_request('GET', 'site-info/norwich-pear-tree', {}, base_url=url)
+        latencies.append(time.perf_counter() - t)
+    return latencies, time.perf_counter() - start
+
+async def bench_async(num_requests, max_connections, url):
+    """ 'max_connections' concurrent callers sharing an AsyncClient's pool of keep-alive connections. """
+    latencies = []
+    async def caller(client):
+        for _ in range(num_requests // max_connections):
+            t = time.perf_counter()
+            await client.make_request('GET', 'site-info/norwich-pear-tree')
+            latencies.append(time.perf_counter() - t)
+    async with outages.AsyncClient({}, max_connections, base_url=url) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(caller(client) for _ in range(max_connections)))
+        return latencies, time.perf_counter() - start
+
+def main(num_requests=1000):
+    server = serve([], [generate_site(100)])
+    url = base_url(server)
+    lines = [f'{"client":<24} {"req/s":>10} {"p99 (ms)":>10}']
+    with contextlib.redirect_stdout(io.StringIO()): # silence per-request status lines
+        lines.append(summarise('make_request (sync)', *bench_sync(num_requests, url)))
+        for max_connections in (1, 10):
+            lines.append(summarise(f'AsyncClient ({max_connections} conn)', *asyncio.run(bench_async(num_requests, max_connections, url))))
+    server.shutdown()
+    print('\n'.join(lines))
+
+if __name__ == "__main__":
+    main()
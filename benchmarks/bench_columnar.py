@@ -0,0 +1,53 @@
+""" Compare the per-outage pipeline with the columnar engine (columnar.py, needs NumPy).
+
+Both compute the date filter, device join, durations and warnings for every outage.
+The speed-up includes the time to build the columns from the outage dicts.
+
+Run from the repository root (sizes default to 10^6 and 10^7 outages):
+    python -m benchmarks.bench_columnar [num_outages ...]
+"""
+import sys
+import time
+from datetime import datetime
+from columnar import OutageColumns
+from outages import build_device_index, generate_site_outages, check_date_warnings
+from benchmarks.synthetic import generate_site, generate_outages
+
+EARLIEST = '2022-01-01T00:00:00.000Z'
+
+def per_outage(outages, site, device_index):
+    """ The current pipeline: generate_site_outages, then strptime and check_date_warnings per outage. """
+    for outage in generate_site_outages(outages, site, EARLIEST, device_index):
+        begin = datetime.strptime(outage["begin"], '%Y-%m-%dT%H:%M:%S.%fZ')
+        end = datetime.strptime(outage["end"], '%Y-%m-%dT%H:%M:%S.%fZ')
+        end - begin
+        check_date_warnings(begin, end)
+
+def columnar(columns, device_index):
+    """ The columnar engine, once the columns are built. """
+    site_outages = columns.join(device_index, EARLIEST)
+    site_outages.durations()
+    site_outages.warnings()
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+def main(sizes):
+    site = generate_site(5000)
+    device_index = build_device_index(site)
+    device_ids = list(device_index)
+    print(f'{"outages":>10} {"per-outage (s)":>15} {"build columns (s)":>18} {"columnar (s)":>13} {"speed-up":>9}')
+    for num_outages in sizes:
+        outages = generate_outages(num_outages, device_ids)
+        slow = timed(per_outage, outages, site, device_index)
+        start = time.perf_counter()
+        columns = OutageColumns.from_outages(outages)
+        build = time.perf_counter() - start
+        fast = timed(columnar, columns, device_index)
+        print(f'{num_outages:>10} {slow:>15.2f} {build:>18.2f} {fast:>13.2f} {slow / (build + fast):>8.1f}x')
+        del outages, columns
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [10 ** 6, 10 ** 7])
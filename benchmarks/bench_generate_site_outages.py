@@ -0,0 +1,33 @@
+""" Benchmark the device join in generate_site_outages().
+
+Run from the repository root:
+    python -m benchmarks.bench_generate_site_outages
+"""
+import time
+from outages import build_device_index, generate_site_outages
+from benchmarks.synthetic import generate_site, generate_outages
+
+EARLIEST = '2022-01-01T00:00:00.000Z'
+
+def bench(num_outages, num_devices, repeat=3):
+    """ Return the best time (seconds) of 'repeat' runs of generate_site_outages(). """
+    site = generate_site(num_devices)
+    outages = generate_outages(num_outages, [d['id'] for d in site['devices']])
+    device_index = build_device_index(site)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        generate_site_outages(outages, site, EARLIEST, device_index)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    num_devices = 5000
+    print(f'generate_site_outages ({num_devices} devices)')
+    print(f'{"outages":>10} {"seconds":>10} {"ns/outage":>10}')
+    for num_outages in (10_000, 100_000, 1_000_000):
+        seconds = bench(num_outages, num_devices)
+        print(f'{num_outages:>10} {seconds:>10.4f} {seconds / num_outages * 1e9:>10.1f}')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+""" Compare IntervalIndex queries with scanning every site outage.
+
+Run from the repository root:
+    python -m benchmarks.bench_interval_index
+"""
+import random
+import time
+from datetime import datetime, timedelta
+from outages import IntervalIndex, build_device_index, generate_site_outages, parse_timestamp
+from benchmarks.synthetic import generate_dataset
+
+def scan_down_at(spans, instant):
+    """ Devices down at 'instant', by checking every outage. """
+    return {device_id for device_id, begin, end in spans if begin <= instant < end}
+
+def main(num_outages=200_000, num_queries=1000):
+    site, outages = generate_dataset(num_outages, 1000, match_ratio=1)
+    site_outages = generate_site_outages(outages, site, '2000-01-01T00:00:00.000Z', build_device_index(site))
+    spans = [(o['id'], parse_timestamp(o['begin']), parse_timestamp(o['end'])) for o in site_outages]
+    rng = random.Random(0)
+    instants = [datetime(2021, 1, 1) + timedelta(seconds=rng.randrange(2 * 365 * 24 * 3600)) for _ in range(num_queries)]
+
+    start = time.perf_counter()
+    index = IntervalIndex(site_outages)
+    build = time.perf_counter() - start
+    print(f'{len(site_outages)} site outages, index built in {build:.2f} s')
+    print(f'{"query":<28} {"scan (ms)":>10} {"index (ms)":>11}')
+
+    start = time.perf_counter()
+    scanned = [scan_down_at(spans, instant) for instant in instants]
+    scan = time.perf_counter() - start
+    start = time.perf_counter()
+    indexed = [index.down_at(instant) for instant in instants]
+    indexed_seconds = time.perf_counter() - start
+    assert scanned == [set(devices) for devices in indexed]
+    print(f'{"down_at":<28} {scan / num_queries * 1000:>10.3f} {indexed_seconds / num_queries * 1000:>11.3f}')
+
+    device_id = spans[0][0]
+    start = time.perf_counter()
+    for instant in instants:
+        sum((min(end, instant + timedelta(days=7)) - max(begin, instant) for d, begin, end in spans
+             if d == device_id and begin < instant + timedelta(days=7) and end > instant), timedelta(0)) # double counts overlaps
+    scan = time.perf_counter() - start
+    start = time.perf_counter()
+    for instant in instants:
+        index.downtime(device_id, instant, instant + timedelta(days=7))
+    indexed_seconds = time.perf_counter() - start
+    print(f'{"downtime in a week":<28} {scan / num_queries * 1000:>10.3f} {indexed_seconds / num_queries * 1000:>11.3f}')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+""" Compare datetime.strptime with parse_timestamp() for outage timestamps.
+
+Run from the repository root:
+    python -m benchmarks.bench_parse_timestamp
+"""
+import random
+import timeit
+from datetime import datetime
+from outages import parse_timestamp
+from benchmarks.synthetic import generate_outages
+
+def strptime(timestamp):
+    return datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%S.%fZ')
+
+def bench(fn, timestamps, repeat=5):
+    """ Return the best time per timestamp (ns) of parsing every timestamp with 'fn'. """
+    def run():
+        for timestamp in timestamps:
+            fn(timestamp)
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    return best / len(timestamps) * 1e9
+
+def main(num_timestamps=100_000):
+    outages = generate_outages(num_timestamps // 2, [])
+    unique = [t for outage in outages for t in (outage['begin'], outage['end'])]
+    rng = random.Random(0)
+    repeated = [rng.choice(unique[:200]) for _ in range(num_timestamps)] # e.g. planned maintenance windows
+
+    print(f'{"parser":<36} {"ns/timestamp":>13}')
+    print(f'{"strptime":<36} {bench(strptime, unique):>13.0f}')
+    print(f'{"parse_timestamp (no memo)":<36} {bench(parse_timestamp.__wrapped__, unique):>13.0f}')
+    parse_timestamp.cache_clear()
+    print(f'{"parse_timestamp (all unique)":<36} {bench(parse_timestamp, unique):>13.0f}')
+    parse_timestamp.cache_clear()
+    print(f'{"parse_timestamp (200 repeated)":<36} {bench(parse_timestamp, repeated):>13.0f}')
+
+if __name__ == "__main__":
+    main()
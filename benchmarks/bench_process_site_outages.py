@@ -0,0 +1,33 @@
+""" Measure how the throughput of process_site_outages() scales with the number of worker processes.
+
+The single-process baseline runs generate_site_outages() and report_row(), the
+same work each worker does. Speed-up can only grow up to the number of CPU cores.
+
+Run from the repository root:
+    python -m benchmarks.bench_process_site_outages
+"""
+import os
+import time
+from outages import build_device_index, generate_site_outages, process_site_outages, report_row
+from benchmarks.synthetic import generate_dataset
+
+EARLIEST = '2022-01-01T00:00:00.000Z'
+
+def main(num_outages=1_000_000):
+    site, outages = generate_dataset(num_outages, 1000, invalid_ratio=0.05)
+    device_index = build_device_index(site)
+
+    start = time.perf_counter()
+    rows = [report_row(outage) for outage in generate_site_outages(outages, site, EARLIEST, device_index)]
+    baseline = time.perf_counter() - start
+    print(f'{os.cpu_count()} CPU cores, {num_outages} outages, {len(rows)} for the site')
+    print(f'{"processes":>10} {"seconds":>8} {"outages/s":>12} {"speed-up":>9}')
+    print(f'{"(serial)":>10} {baseline:>8.2f} {num_outages / baseline:>12,.0f} {1:>8.1f}x')
+    for processes in sorted({1, 2, 4, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        process_site_outages(outages, site, EARLIEST, device_index, processes=processes)
+        seconds = time.perf_counter() - start
+        print(f'{processes:>10} {seconds:>8.2f} {num_outages / seconds:>12,.0f} {baseline / seconds:>8.1f}x')
+
+if __name__ == "__main__":
+    main()
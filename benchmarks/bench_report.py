@@ -0,0 +1,42 @@
+""" Compare generate_pretty_table() with write_report() for large reports.
+
+Peak memory includes the rendered report, which is written to an in-memory buffer.
+
+Run from the repository root:
+    python -m benchmarks.bench_report
+"""
+import io
+import time
+import tracemalloc
+from outages import build_device_index, generate_site_outages, generate_pretty_table, write_report
+from benchmarks.synthetic import generate_site, generate_outages
+
+def measure(fn):
+    """ Return the time (seconds) and peak traced memory (bytes) of calling 'fn'. """
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    tracemalloc.start() # traced separately, tracing slows everything down
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+def main():
+    site = generate_site(1000)
+    print(f'{"rows":>8} {"renderer":<24} {"seconds":>8} {"peak MiB":>9}')
+    for num_rows in (10_000, 50_000):
+        outages = generate_outages(num_rows, list(build_device_index(site)), match_ratio=1)
+        site_outages = generate_site_outages(outages, site, '2000-01-01T00:00:00.000Z')
+        renderers = {
+            'generate_pretty_table': lambda: io.StringIO().write(str(generate_pretty_table(site_outages))),
+            'write_report (table)': lambda: write_report(site_outages, io.StringIO()),
+            'write_report (csv)': lambda: write_report(site_outages, io.StringIO(), 'csv'),
+            'write_report (jsonl)': lambda: write_report(site_outages, io.StringIO(), 'jsonl')
+        }
+        for name, fn in renderers.items():
+            seconds, peak = measure(fn)
+            print(f'{num_rows:>8} {name:<24} {seconds:>8.2f} {peak / 2 ** 20:>9.1f}')
+
+if __name__ == "__main__":
+    main()
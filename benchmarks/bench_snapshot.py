@@ -0,0 +1,44 @@
+""" Compare generating site outages from a JSON feed with replaying a snapshot of it.
+
+Run from the repository root:
+    python -m benchmarks.bench_snapshot
+"""
+import json
+import os
+import tempfile
+import time
+from outages import build_device_index, generate_site_outages, iter_json_array, STREAM_CHUNK_SIZE
+from snapshot import Snapshot, save_snapshot
+from benchmarks.synthetic import generate_dataset
+
+EARLIEST = '2022-01-01T00:00:00.000Z'
+
+def main():
+    print(f'{"outages":>10} {"JSON MiB":>9} {"snap MiB":>9} {"save (s)":>9} {"JSON (s)":>9} {"open (ms)":>10} {"snap (s)":>9}')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'outages.snap')
+        for num_outages in (100_000, 1_000_000):
+            site, outages = generate_dataset(num_outages, 1000)
+            device_index = build_device_index(site)
+            body = json.dumps(outages).encode()
+            chunks = [body[i:i + STREAM_CHUNK_SIZE] for i in range(0, len(body), STREAM_CHUNK_SIZE)]
+            del outages
+
+            start = time.perf_counter()
+            expected = generate_site_outages(iter_json_array(chunks), site, EARLIEST, device_index) # as main() does
+            json_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            save_snapshot(iter_json_array(chunks), path)
+            save_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            with Snapshot(path) as snapshot:
+                open_seconds = time.perf_counter() - start
+                site_outages = snapshot.site_outages(site, EARLIEST, device_index)
+            snapshot_seconds = time.perf_counter() - start
+            assert site_outages == expected
+            print(f'{num_outages:>10} {len(body) / 2 ** 20:>9.1f} {os.path.getsize(path) / 2 ** 20:>9.1f} {save_seconds:>9.2f} '
+                  f'{json_seconds:>9.2f} {open_seconds * 1000:>10.3f} {snapshot_seconds:>9.2f}')
+
+if __name__ == "__main__":
+    main()
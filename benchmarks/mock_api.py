@@ -0,0 +1,156 @@
+""" A local stand-in for the KrakenFlex API, for benchmarking.
+
+Run from the repository root:
+    python -m benchmarks.mock_api
+"""
+import gzip
+import hashlib
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from benchmarks.synthetic import generate_site, generate_outages
+
+class MockAPIHandler(BaseHTTPRequestHandler):
+    """ Serve 'GET /outages', 'GET /site-info/{siteId}' and 'POST /site-outages/{siteId}'.
+
+    A POST replaces the site's outages (kept in the server's 'site_outages'). A
+    chunk from post_site_outages_chunked() is held until every chunk of its
+    'X-Upload-Id' has arrived, in any order, and the site's outages are then
+    replaced by all of them, in chunk order.
+
+    A fraction of requests (the server's 'error_rate') fail with one of its
+    'error_statuses' instead, to measure the cost of retries.
+    """
+    protocol_version = 'HTTP/1.1' # allow keep-alive connections
+    disable_nagle_algorithm = True
+    wbufsize = -1 # send headers and body together, flushed after each request
+
+    def log_message(self, format, *args):
+        pass # keep benchmark output clean
+
+    def send_json(self, status, body=b'{}'):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def inject_error(self):
+        """ Count the request, and fail it if it is picked to fail. Returns True if it failed. """
+        server = self.server
+        with server.lock:
+            server.stats['requests'] += 1
+            status = server.rng.choice(server.error_statuses) if server.rng.random() < server.error_rate else None
+            if status is not None:
+                server.stats['errors'] += 1
+        if status is None:
+            return False
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', '2')
+        if status in (429, 503):
+            self.send_header('Retry-After', '0') # retry straight away, benchmarks measure retries not waits
+        self.end_headers()
+        self.wfile.write(b'{}')
+        return True
+
+    def send_cacheable_json(self, body):
+        """ Send a 200 with an ETag, or a 304 if the client already has this body. """
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.inject_error():
+            return
+        path = self.path.rsplit('/v1/', 1)[-1]
+        if path == 'outages':
+            self.send_cacheable_json(self.server.outages_body)
+        elif path.startswith('site-info/') and path[len('site-info/'):] in self.server.sites:
+            self.send_cacheable_json(self.server.sites[path[len('site-info/'):]])
+        else:
+            self.send_json(404, b'{"message": "Not Found"}')
+
+    def do_POST(self):
+        path = self.path.rsplit('/v1/', 1)[-1]
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.inject_error():
+            return
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        site_id = path[len('site-outages/'):]
+        if not path.startswith('site-outages/') or site_id not in self.server.sites:
+            self.send_json(404, b'{"message": "Not Found"}')
+            return
+        outages = json.loads(body) # a real server would validate the payload
+        upload_id = self.headers.get('X-Upload-Id')
+        if upload_id is None:
+            with self.server.lock:
+                self.server.site_outages[site_id] = outages
+            self.send_json(200)
+            return
+        try:
+            index, count = int(self.headers['X-Chunk-Index']), int(self.headers['X-Chunk-Count'])
+        except (KeyError, ValueError):
+            index = count = -1
+        if not 0 <= index < count:
+            self.send_json(400, b'{"message": "Invalid chunk"}')
+            return
+        with self.server.lock:
+            chunks = self.server.uploads.setdefault((site_id, upload_id), {})
+            chunks[index] = outages # a resent chunk replaces itself
+            if len(chunks) == count:
+                self.server.site_outages[site_id] = [outage for i in range(count) for outage in chunks[i]]
+                del self.server.uploads[(site_id, upload_id)]
+        self.send_json(200)
+
+def serve(outages, sites, port=0, error_rate=0.0, error_statuses=(500, 503), seed=0):
+    """ Start the mock API on a background thread.
+
+    Returns the running server; its base URL is f'http://127.0.0.1:{server.server_port}/v1'.
+    server.stats counts the requests served and the errors injected, and
+    server.site_outages holds the outages last posted to each site.
+    Call server.shutdown() to stop it.
+
+    Keyword arguments:
+    outages        -- [list(dict)] outages served by 'GET /outages'
+    sites          -- [list(dict)] site information served by 'GET /site-info/{siteId}'
+    port           -- [int] (Optional) port to listen on, any free port when 0 (defaults to 0)
+    error_rate     -- [float] (Optional) fraction of requests that fail (defaults to 0)
+    error_statuses -- [tuple(int)] (Optional) status codes failed requests are given, picked at random (defaults to 500 and 503)
+    seed           -- [int] (Optional) random seed for picking failed requests, so runs are repeatable
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), MockAPIHandler)
+    server.daemon_threads = True
+    server.error_rate = error_rate
+    server.error_statuses = error_statuses
+    server.rng = random.Random(seed)
+    server.lock = threading.Lock()
+    server.stats = {'requests': 0, 'errors': 0}
+    server.outages_body = json.dumps(outages).encode()
+    server.sites = {site['id']: json.dumps(site).encode() for site in sites}
+    server.site_outages = {} # site ID -> outages last posted
+    server.uploads = {} # (site ID, upload ID) -> chunk index -> outages, until every chunk has arrived
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def base_url(server):
+    """ Return the base URL of a server started with serve(). """
+    return f'http://127.0.0.1:{server.server_port}/v1'
+
+if __name__ == "__main__":
+    site = generate_site(100)
+    server = serve(generate_outages(10_000, [d['id'] for d in site['devices']]), [site], port=8000)
+    print(f'Mock API listening on {base_url(server)}')
+    threading.Event().wait()
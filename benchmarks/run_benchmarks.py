@@ -0,0 +1,159 @@
+""" Repeatable benchmarks of main() end to end, and of each function it uses, against a local mock API.
+
+Every benchmark runs 'repeat' times on the same seeded synthetic data, and the
+median and fastest times are reported. The results are appended to
+bench_output.txt, headed by the date, commit and parameters, so runs can be
+compared over time.
+
+Run from the repository root:
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --outages 1000000 --invalid-ratio 0.1 --error-rate 0.05
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+import outages
+from benchmarks.mock_api import serve, base_url
+from benchmarks.synthetic import generate_dataset
+
+EARLIEST = '2022-01-01T00:00:00.000Z'
+
+def measure(fn, repeat, setup=None):
+    """ Call 'fn' 'repeat' times, each after 'setup' (untimed), and return the times in seconds. """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+def summarise(name, times, rows):
+    """ Return a line of the median and fastest time and the rows/s at the median. """
+    median = statistics.median(times)
+    return f'{name:<36} {median:>10.4f} {min(times):>10.4f} {rows / median if median else 0:>12,.0f}'
+
+def run_main(directory, url, full_resync=False):
+    """ Run outages.main() against the API at 'url' in 'directory', which holds its api-key.txt, cache and sync state. """
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        outages.main(full_resync=full_resync, base_url=url)
+    finally:
+        os.chdir(cwd)
+
+def fresh_directory(parent):
+    """ Return a new directory under 'parent' with an api-key.txt, and no cache or sync state. """
+    directory = tempfile.mkdtemp(dir=parent)
+    with open(os.path.join(directory, 'api-key.txt'), 'w') as f:
+        f.write('benchmark')
+    return directory
+
+def bench_main(site, feed, args, parent):
+    """ Benchmark main() cold (empty cache and sync state), warm (both up to date) and with injected errors. """
+    lines = []
+    server = serve(feed, [site], seed=args.seed)
+    url = base_url(server)
+    directories = []
+    lines.append(summarise('main (cold)', measure(lambda: run_main(directories[-1], url), args.repeat,
+                                                  setup=lambda: directories.append(fresh_directory(parent))), len(feed)))
+    lines.append(summarise('main (warm, cached and synced)', measure(lambda: run_main(directories[-1], url), args.repeat), len(feed)))
+    server.shutdown()
+
+    if args.error_rate:
+        server = serve(feed, [site], error_rate=args.error_rate, seed=args.seed)
+        url = base_url(server)
+        times = measure(lambda: run_main(directories[-1], url), args.repeat, setup=lambda: directories.append(fresh_directory(parent)))
+        lines.append(summarise(f'main (cold, {args.error_rate:.0%} errors)', times, len(feed)))
+        lines.append(f'  {server.stats["errors"]} of {server.stats["requests"]} requests failed and were retried')
+        server.shutdown()
+    return lines
+
+def bench_requests(site, feed, args):
+    """ Benchmark make_request() for each endpoint, without a cache. """
+    server = serve(feed, [site], seed=args.seed)
+    url = base_url(server)
+    payload = outages.to_payload(outages.generate_site_outages(feed, site, EARLIEST))
+    with outages.make_session() as session:
+        benchmarks = {
+            'make_request GET site-info': (lambda: outages.make_request('GET', f'site-info/{site["id"]}', {}, session=session, base_url=url), 1),
+            'make_request GET outages': (lambda: outages.make_request('GET', 'outages', {}, session=session, base_url=url), len(feed)),
+            'make_request GET outages (stream)': (lambda: sum(1 for _ in outages.make_request('GET', 'outages', {}, stream=True, session=session, base_url=url)), len(feed)),
+            'make_request POST site-outages': (lambda: outages.make_request('POST', f'site-outages/{site["id"]}', {}, payload, session=session, base_url=url), len(payload))
+        }
+        lines = [summarise(name, measure(fn, args.repeat), rows) for name, (fn, rows) in benchmarks.items()]
+    server.shutdown()
+    return lines
+
+def bench_functions(site, feed, args):
+    """ Benchmark each step of main() on data already in memory. """
+    body = json.dumps(feed).encode()
+    chunks = [body[i:i + outages.STREAM_CHUNK_SIZE] for i in range(0, len(body), outages.STREAM_CHUNK_SIZE)]
+    device_index = outages.build_device_index(site)
+    site_outages = outages.generate_site_outages(feed, site, EARLIEST, device_index)
+    _, checkpoint = outages.diff_site_outages(site_outages)
+    parsed = [(outages.parse_timestamp(o['begin']), outages.parse_timestamp(o['end'])) for o in site_outages]
+    benchmarks = {
+        'iter_json_array': (lambda: sum(1 for _ in outages.iter_json_array(chunks)), len(feed), None),
+        'build_device_index': (lambda: outages.build_device_index(site), len(site['devices']), None),
+        'generate_site_outages': (lambda: outages.generate_site_outages(feed, site, EARLIEST, device_index), len(feed), None),
+        'parse_timestamp (cold cache)': (lambda: [outages.parse_timestamp(o['begin']) for o in feed], len(feed),
+                                         outages.parse_timestamp.cache_clear),
+        'check_date_warnings': (lambda: [outages.check_date_warnings(begin, end) for begin, end in parsed], len(parsed), None),
+        'diff_site_outages (first run)': (lambda: outages.diff_site_outages(site_outages), len(site_outages), None),
+        'diff_site_outages (unchanged)': (lambda: outages.diff_site_outages(site_outages, checkpoint), len(site_outages), None),
+        'to_payload': (lambda: outages.to_payload(site_outages), len(site_outages), None)
+    }
+    for format in outages.REPORT_FORMATS:
+        benchmarks[f'write_report ({format})'] = (lambda format=format: outages.write_report(site_outages, io.StringIO(), format),
+                                                 len(site_outages), None)
+    return [summarise(name, measure(fn, args.repeat, setup), rows) for name, (fn, rows, setup) in benchmarks.items()]
+
+def describe(args):
+    """ Return the header line identifying a run. """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = 'unknown'
+    return (f'# {datetime.now():%Y-%m-%d %H:%M:%S} commit {commit}, Python {platform.python_version()}, '
+            f'{args.outages} outages, {args.devices} devices, match ratio {args.match_ratio}, '
+            f'invalid ratio {args.invalid_ratio}, error rate {args.error_rate}, repeat {args.repeat}, seed {args.seed}')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark main() and each function against a local mock API.')
+    parser.add_argument('--outages', type=int, default=100_000, help='outages served by GET /outages')
+    parser.add_argument('--devices', type=int, default=1000, help='devices at the site')
+    parser.add_argument('--match-ratio', type=float, default=0.5, help='fraction of outages for devices at the site')
+    parser.add_argument('--invalid-ratio', type=float, default=0.05, help='fraction of outages with invalid dates')
+    parser.add_argument('--error-rate', type=float, default=0.05, help='fraction of requests the mock API fails, 0 to skip')
+    parser.add_argument('--repeat', type=int, default=5, help='times each benchmark is run')
+    parser.add_argument('--seed', type=int, default=0, help='random seed for the data and the injected errors')
+    parser.add_argument('--output', default='bench_output.txt', help='file the results are appended to')
+    args = parser.parse_args(argv)
+
+    site, feed = generate_dataset(args.outages, args.devices, args.match_ratio, args.invalid_ratio, seed=args.seed)
+    retry_policy = outages.DEFAULT_RETRY_POLICY
+    outages.DEFAULT_RETRY_POLICY = outages.RetryPolicy(base_delay=0.01) # measure the retries, not the back-off waits
+    lines = [describe(args), f'{"benchmark":<36} {"median (s)":>10} {"min (s)":>10} {"rows/s":>12}']
+    try:
+        with tempfile.TemporaryDirectory() as parent, contextlib.redirect_stdout(io.StringIO()): # silence status lines and reports
+            lines += bench_main(site, feed, args, parent)
+            lines += bench_requests(site, feed, args)
+            lines += bench_functions(site, feed, args)
+    finally:
+        outages.DEFAULT_RETRY_POLICY = retry_policy
+    with open(args.output, 'a') as f:
+        f.write('\n'.join(lines) + '\n\n')
+    print('\n'.join(lines))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import random
+import uuid
+from datetime import datetime, timedelta
+
+def generate_site(num_devices, site_id='norwich-pear-tree', seed=0):
+    """ Generate site information in the 'GET /site-info/{siteId}' schema.
+
+    Keyword arguments:
+    num_devices -- [int] number of devices attached to the site
+    site_id     -- [str] (Optional) site ID (defaults to 'norwich-pear-tree')
+    seed        -- [int] (Optional) random seed, so runs are repeatable
+    """
+    rng = random.Random(seed)
+    return {
+        'id': site_id,
+        'name': site_id.replace('-', ' ').title(),
+        'devices': [
+            {'id': str(uuid.UUID(int=rng.getrandbits(128), version=4)), 'name': f'Battery {i+1}'}
+            for i in range(num_devices)
+        ]
+    }
+
+def generate_outages(num_outages, device_ids, match_ratio=0.5, invalid_ratio=0.0, seed=0):
+    """ Generate outages in the 'GET /outages' schema.
+
+    Keyword arguments:
+    num_outages   -- [int] number of outages to generate
+    device_ids    -- [list(str)] device IDs that outages may refer to
+    match_ratio   -- [float] (Optional) fraction of outages referring to one of 'device_ids',
+                     the rest refer to unknown devices (defaults to 0.5)
+    invalid_ratio -- [float] (Optional) fraction of outages with invalid dates, i.e. ending before they
+                     begin or lying in the future, which check_date_warnings() warns about (defaults to 0)
+    seed          -- [int] (Optional) random seed, so runs are repeatable
+    """
+    rng = random.Random(seed)
+    start = datetime(2021, 1, 1)
+    outages = []
+    for _ in range(num_outages):
+        if device_ids and rng.random() < match_ratio:
+            device_id = rng.choice(device_ids)
+        else:
+            device_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        begin = start + timedelta(seconds=rng.randrange(2 * 365 * 24 * 3600), milliseconds=rng.randrange(1000))
+        end = begin + timedelta(seconds=rng.randrange(30 * 24 * 3600), milliseconds=rng.randrange(1000))
+        if rng.random() < invalid_ratio:
+            if rng.random() < 0.5:
+                begin, end = end, begin # ends before it begins
+            else:
+                begin, end = begin + timedelta(days=10 * 365), end + timedelta(days=10 * 365) # in the future
+        outages.append({
+            'id': device_id,
+            'begin': begin.strftime('%Y-%m-%dT%H:%M:%S.') + f'{begin.microsecond // 1000:03d}Z',
+            'end': end.strftime('%Y-%m-%dT%H:%M:%S.') + f'{end.microsecond // 1000:03d}Z'
+        })
+    return outages
+
+def generate_dataset(num_outages, num_devices, match_ratio=0.5, invalid_ratio=0.0, site_id='norwich-pear-tree', seed=0):
+    """ Generate a site and outages for it, see generate_site() and generate_outages().
+
+    Returns (site, outages).
+    """
+    site = generate_site(num_devices, site_id, seed)
+    return site, generate_outages(num_outages, [device['id'] for device in site['devices']], match_ratio, invalid_ratio, seed)
@@ -0,0 +1,126 @@
+""" Optional columnar engine for large outage feeds.
+
+Requires NumPy (pip install numpy). Outages are held as arrays rather than a
+dict per outage: 'begin' and 'end' as datetime64[ms] and device IDs as a
+categorical column (unique IDs + an integer code per outage). The date filter,
+device join, durations and warnings are then computed a whole column at a
+time, with the same results as generate_site_outages() and
+check_date_warnings() in outages.py.
+
+This is a library for scripts and notebooks working on whole feeds in memory;
+main() and the command line do not use it, as they stream the feed instead.
+"""
+import numpy as np
+from datetime import datetime
+from records import SiteOutage
+
+WARNINGS = {
+    'negative_duration': 'Negative duration detected\n',
+    'future_begin': 'Outage has future begin date\n',
+    'future_end': 'Outage has future end date\n'
+}
+
+def parse_timestamps(timestamps):
+    """ Parse API timestamps (e.g. '2022-01-01T00:00:00.000Z') into a datetime64[ms] array.
+
+    Keyword arguments:
+    timestamps -- [iterable(str)] ISO 8601 timestamps in UTC
+    """
+    return np.array([timestamp.rstrip('Z') for timestamp in timestamps], dtype='datetime64[ms]')
+
+def format_timestamps(timestamps):
+    """ Format a datetime64[ms] array as API timestamps, the inverse of parse_timestamps(). """
+    return np.char.add(np.datetime_as_string(timestamps, unit='ms'), 'Z')
+
+class OutageColumns:
+    """ A table of outages held as columns.
+
+    Keyword arguments:
+    categories -- [ndarray(str)] distinct outage IDs
+    codes      -- [ndarray(int)] index into 'categories' of each outage's ID
+    begin      -- [ndarray(datetime64[ms])] begin date of each outage
+    end        -- [ndarray(datetime64[ms])] end date of each outage
+    names      -- [ndarray(object)] (Optional) device name of each outage, once joined to a site
+    """
+    def __init__(self, categories, codes, begin, end, names=None):
+        self.categories = categories
+        self.codes = codes
+        self.begin = begin
+        self.end = end
+        self.names = names
+
+    @classmethod
+    def from_outages(cls, outages):
+        """ Build columns from outages (dict) from 'GET /outages'. """
+        outages = list(outages)
+        index = {} # outage ID -> code, in order of first appearance
+        codes = np.fromiter((index.setdefault(outage["id"], len(index)) for outage in outages), dtype=np.int32, count=len(outages))
+        return cls(
+            np.array(list(index), dtype=str),
+            codes,
+            parse_timestamps(outage["begin"] for outage in outages),
+            parse_timestamps(outage["end"] for outage in outages))
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def ids(self):
+        """ The outage ID of each outage. """
+        return self.categories[self.codes]
+
+    def join(self, device_index, earliest):
+        """ Return the outages for a site, as generate_site_outages() does, with a 'names' column.
+
+        Keyword arguments:
+        device_index -- [dict] index of the site's devices from build_device_index(site)
+        earliest     -- the earliest date an outage is deemed valid (ISO 8601 form)
+        """
+        devices = [device_index.get(category, ()) for category in self.categories.tolist()] # one lookup per distinct ID
+        counts = np.array([len(names) for names in devices], dtype=np.int64) # device names per distinct ID
+        keep = (self.begin >= parse_timestamps([earliest])[0]) & (counts[self.codes] > 0)
+        codes = self.codes[keep]
+        if counts.max(initial=0) <= 1:
+            names = np.array([names[0] if names else None for names in devices], dtype=object)
+            return OutageColumns(self.categories, codes, self.begin[keep], self.end[keep], names[codes])
+        # a device ID listed more than once: one row per listing, as generate_site_outages() does
+        repeats = counts[codes]
+        rows = np.repeat(np.arange(len(codes)), repeats)
+        listing = np.arange(len(rows)) - np.repeat(np.cumsum(repeats) - repeats, repeats) # which listing of its device each row is
+        names = np.array([devices[code][i] for code, i in zip(codes[rows].tolist(), listing.tolist())], dtype=object)
+        return OutageColumns(self.categories, codes[rows], self.begin[keep][rows], self.end[keep][rows], names)
+
+    def durations(self):
+        """ Return the duration (end - begin) of each outage as a timedelta64[ms] array. """
+        return self.end - self.begin
+
+    def warnings(self, now=None):
+        """ Return a dict of warning -> boolean array saying which outages have that warning.
+
+        The warnings are those of check_date_warnings(): 'negative_duration',
+        'future_begin' and 'future_end'.
+
+        Keyword arguments:
+        now -- [datetime] (Optional) the current time (defaults to datetime.now())
+        """
+        now = np.datetime64(now or datetime.now(), 'us')
+        return {
+            'negative_duration': self.end < self.begin,
+            'future_begin': self.begin > now,
+            'future_end': self.end > now
+        }
+
+    def warning_lists(self, now=None):
+        """ Return each outage's warnings as check_date_warnings() would, e.g. ['Negative duration detected\\n']. """
+        flags = self.warnings(now)
+        columns = [[WARNINGS[name] if flag else None for flag in flags[name].tolist()] for name in WARNINGS]
+        return [[warning for warning in row if warning] for row in zip(*columns)]
+
+    def to_site_outages(self):
+        """ Return the joined outages as a list of SiteOutage records, as generate_site_outages() does. """
+        return [
+            SiteOutage(outage_id, name, begin, end)
+            for outage_id, name, begin, end in zip(
+                self.ids.tolist(), self.names.tolist(),
+                format_timestamps(self.begin).tolist(), format_timestamps(self.end).tolist())
+        ]
@@ -1,69 +1,1329 @@
-import requests
+import bisect
+import codecs
+import contextlib
+import csv
+import functools
+import gzip
+import hashlib
+import importlib.util
+import itertools
+import json
+import operator
+import os
+import random
+import signal
 import sys
+import threading
 import time
-from datetime import datetime
+import unicodedata
+from collections import deque
+from datetime import datetime, timedelta
 from http import HTTPStatus
-from prettytable import PrettyTable
+from records import SiteOutage, to_payload, build_device_index, parse_timestamp # also part of this module's API
 
-def make_request(type, endpoint, headers, data=None, retries=0):
+def _lazy_import(name):
+    """ Return a module that is only imported when one of its attributes is first used.
+
+    Keeps start-up fast for runs that never need the module, e.g. prettytable
+    when the report is written as JSON lines. See the importlib.util.LazyLoader recipe.
+
+    Keyword arguments:
+    name -- [str] module name, e.g. 'requests'
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f'No module named \'{name}\'', name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    parent, _, child = name.rpartition('.')
+    if parent: # as 'import parent.child' would
+        setattr(sys.modules[parent], child, module)
+    return module
+
+asyncio = _lazy_import('asyncio') # only needed by AsyncClient
+email_utils = _lazy_import('email.utils') # only needed to parse a Retry-After date
+argparse = _lazy_import('argparse') # only needed by the command line, see cli()
+futures = _lazy_import('concurrent.futures') # only needed for concurrent requests or worker processes
+prettytable = _lazy_import('prettytable') # only needed by generate_pretty_table()
+requests = _lazy_import('requests') # only needed once a request is made
+snapshot = _lazy_import('snapshot') # only needed to save or replay a snapshot
+
+BASE_URL = 'https://api.krakenflex.systems/interview-tests-mock-api/v1'
+SITE_ID = 'norwich-pear-tree' # site processed when none is given
+EARLIEST = '2022-01-01T00:00:00.000Z' # outages beginning before this are left out
+API_KEY_FILE = './api-key.txt'
+STREAM_CHUNK_SIZE = 64 * 1024 # bytes read at a time when streaming a response body
+CACHE_DIR = './.http-cache'
+SYNC_STATE_DIR = './.sync-state'
+GZIP_LEVEL = 6 # compression level for chunked uploads, a good trade of size for speed
+REPORT_FIELDS = ['Device Name', 'Begin', 'End', 'Duration', '']
+REPORT_FORMATS = ('table', 'csv', 'jsonl')
+DOWNTIME_FIELDS = ['Device Name', 'Outages', 'Merged', 'Downtime']
+PROCESS_CHUNK_SIZE = 10_000 # outages sent to a worker process at a time, large enough to outweigh the cost of sending them
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120) # histogram bucket bounds in seconds
+WATCH_INTERVAL = 60.0 # seconds between polls in watch mode
+SITE_REFRESH = 10 # polls between fetching each site's information again in watch mode
+
+class _Timer:
+    """ Context manager that records the seconds it was open in a Metrics histogram. """
+    __slots__ = ('metrics', 'name', 'labels', 'start')
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+
+class _NullTimer:
+    """ Context manager that does nothing, used while Metrics are disabled. """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+_NULL_TIMER = _NullTimer()
+
+class Metrics:
+    """ Counters and histograms (e.g. stage and request timings) collected during a run.
+
+    Disabled by default, in which case every method returns straight away and
+    nothing is recorded. Each metric has a name and optional labels, e.g.
+    metrics.incr('http_retries_total', method='GET', endpoint='outages').
+
+    Keyword arguments:
+    enabled -- [bool] (Optional) record metrics (defaults to False)
+    buckets -- [tuple(float)] (Optional) upper bounds of the histogram buckets (defaults to LATENCY_BUCKETS)
+    """
+    def __init__(self, enabled=False, buckets=LATENCY_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self.counters = {}   # (name, labels) -> value
+        self.histograms = {} # (name, labels) -> {'count', 'sum', 'min', 'max', 'buckets'}
+        self._lock = threading.Lock()
+
+    def incr(self, name, value=1, **labels):
+        """ Add 'value' to a counter. """
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """ Record a value (e.g. a latency in seconds) in a histogram. """
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'count': 0, 'sum': 0.0, 'min': value, 'max': value, 'buckets': [0] * len(self.buckets)}
+            histogram['count'] += 1
+            histogram['sum'] += value
+            histogram['min'] = min(histogram['min'], value)
+            histogram['max'] = max(histogram['max'], value)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram['buckets'][i] += 1
+                    break
+
+    def timer(self, name, **labels):
+        """ Return a context manager recording the seconds spent inside it in a histogram. """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def counted(self, name, items, weigh=None, **labels):
+        """ Pass 'items' through, adding 1 (or weigh(item)) per item to a counter once they are used up. """
+        if not self.enabled:
+            return items
+        def count():
+            total = 0
+            try:
+                for item in items:
+                    total += 1 if weigh is None else weigh(item)
+                    yield item
+            finally:
+                self.incr(name, total, **labels)
+        return count()
+
+    def summary(self):
+        """ Return every metric as a JSON-serialisable dict. """
+        with self._lock:
+            return {
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                             for (name, labels), value in sorted(self.counters.items())],
+                'histograms': [{'name': name, 'labels': dict(labels), 'count': h['count'], 'sum': h['sum'],
+                                'min': h['min'], 'max': h['max'],
+                                'buckets': {str(bound): count for bound, count in zip(self.buckets, h['buckets'])}}
+                               for (name, labels), h in sorted(self.histograms.items())]
+            }
+
+    def to_prometheus(self):
+        """ Return every metric in the Prometheus text exposition format. """
+        def series(name, labels, extra=()):
+            pairs = list(labels) + list(extra)
+            return name + ('{' + ','.join(f'{key}="{value}"' for key, value in pairs) + '}' if pairs else '')
+        lines = []
+        summary = self.summary()
+        for name in sorted({counter['name'] for counter in summary['counters']}):
+            lines.append(f'# TYPE {name} counter')
+            lines += [f'{series(name, c["labels"].items())} {c["value"]}' for c in summary['counters'] if c['name'] == name]
+        for name in sorted({histogram['name'] for histogram in summary['histograms']}):
+            lines.append(f'# TYPE {name} histogram')
+            for h in (h for h in summary['histograms'] if h['name'] == name):
+                labels = h['labels'].items()
+                cumulative = 0
+                for bound, count in h['buckets'].items():
+                    cumulative += count
+                    lines.append(f'{series(name + "_bucket", labels, [("le", bound)])} {cumulative}')
+                lines.append(f'{series(name + "_bucket", labels, [("le", "+Inf")])} {h["count"]}')
+                lines.append(f'{series(name + "_sum", labels)} {h["sum"]}')
+                lines.append(f'{series(name + "_count", labels)} {h["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """ Write every metric to 'path', in the Prometheus text format if it ends in '.prom', else as JSON. """
+        with open(path, 'w') as f:
+            if path.endswith('.prom'):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.summary(), f, indent=2)
+
+    def reset(self):
+        """ Stop recording and forget every metric recorded so far. """
+        with self._lock:
+            self.enabled = False
+            self.counters.clear()
+            self.histograms.clear()
+
+metrics = Metrics() # shared by the whole run, enabled by main(metrics_file=...)
+
+def iter_json_array(chunks):
+    """ Incrementally decode a JSON array, yielding its elements one at a time.
+
+    Only the element currently being decoded is held in memory, so the size of
+    the array does not affect peak memory use.
+
+    Keyword arguments:
+    chunks -- [iterable(bytes)] UTF-8 encoded JSON text, split at arbitrary points
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buf = ''
+    pos = 0
+    started = False
+    eof = False
+    while True:
+        while pos < len(buf) and buf[pos] in ' \t\n\r,':
+            pos += 1 # skip whitespace and separators between elements
+        if pos < len(buf):
+            if not started:
+                if buf[pos] != '[':
+                    raise ValueError('Expected a JSON array')
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == ']':
+                return
+            try:
+                element, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                if end < len(buf) or eof: # a number could still be cut short at the end of the buffer
+                    yield element
+                    pos = end
+                    continue
+        if eof:
+            raise ValueError('Unexpected end of JSON array')
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+            buf = buf[pos:] + utf8.decode(b'', final=True)
+        else:
+            buf = buf[pos:] + utf8.decode(chunk)
+        pos = 0
+
+def _stream_json_array(r, chunks=None):
+    """ Yield the elements of a JSON array response body, closing the response when done.
+
+    Keyword arguments:
+    r      -- [requests.Response or file] response (or open file) to read and then close
+    chunks -- [iterable(bytes)] (Optional) the body, if it should not be read from 'r' directly
+    """
+    try:
+        if chunks is None:
+            chunks = r.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+        chunks = iter(chunks)
+        yield from iter_json_array(chunks)
+        for _ in chunks: # read to the end, e.g. so a cached copy is completed
+            pass
+    finally:
+        r.close()
+
+def make_session(pool_size=10):
+    """ Create a requests.Session that keeps up to 'pool_size' connections alive for reuse.
+
+    Keyword arguments:
+    pool_size -- [int] (Optional) maximum number of pooled connections (defaults to 10)
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def parse_retry_after(value, now=None):
+    """ Return the number of seconds a 'Retry-After' header asks us to wait, or None if it is missing or invalid.
+
+    Keyword arguments:
+    value -- [str] header value, either a number of seconds or an HTTP date
+    now   -- [float] (Optional) current UNIX time, used for HTTP dates (defaults to time.time())
+    """
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email_utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - (time.time() if now is None else now))
+
+class RetryPolicy:
+    """ When and for how long make_request waits before retrying a failed request.
+
+    Waits grow exponentially with each attempt, with full jitter so that many
+    clients retrying at once spread out. A 'Retry-After' header on a 429 or 503
+    response is honoured instead. Requests that failed without a response (a
+    connection error or timeout) are retried too. No retry is made that would
+    end after the deadline for the call, and make_request times out each
+    attempt at the deadline.
+
+    Keyword arguments:
+    max_retries    -- [int] (Optional) maximum number of retries per call (defaults to 5)
+    base_delay     -- [float] (Optional) maximum wait in seconds before the first retry, doubled for each retry after (defaults to 1)
+    max_delay      -- [float] (Optional) cap on the wait in seconds before any one retry (defaults to 30)
+    deadline       -- [float] (Optional) total seconds a call may take, including waits (defaults to 120)
+    retry_statuses -- [tuple(int)] (Optional) status codes worth retrying (defaults to 429, 500, 502, 503 and 504)
+    clock          -- [function] (Optional) monotonic clock in seconds (defaults to time.monotonic)
+    sleep          -- [function] (Optional) waits for a number of seconds (defaults to time.sleep)
+    random         -- [function] (Optional) returns a float in [0, 1) for jitter (defaults to random.random)
+    """
+    def __init__(self, max_retries=5, base_delay=1.0, max_delay=30.0, deadline=120.0,
+                 retry_statuses=(429, 500, 502, 503, 504), clock=time.monotonic, sleep=time.sleep, random=random.random):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.retry_statuses = retry_statuses
+        self.clock = clock
+        self.sleep = sleep
+        self.random = random
+
+    def delay(self, attempt, r):
+        """ Return the seconds to wait before retry number 'attempt' (starting at 0) after response 'r' (or None). """
+        if r is not None and r.status_code in (429, 503):
+            retry_after = parse_retry_after(r.headers.get('Retry-After'))
+            if retry_after is not None:
+                return retry_after
+        return self.random() * min(self.max_delay, self.base_delay * 2 ** attempt)
+
+    def next_delay(self, attempt, r, deadline):
+        """ Return the seconds to wait before retrying after response 'r', or None if it should not be retried.
+
+        Keyword arguments:
+        attempt  -- [int] number of retries already made
+        r        -- [requests.Response] the failed response, or None if there was none (e.g. a timeout)
+        deadline -- [float] clock() time by which the call must finish
+        """
+        if (r is not None and r.status_code not in self.retry_statuses) or attempt >= self.max_retries:
+            return None
+        delay = self.delay(attempt, r)
+        if self.clock() + delay > deadline:
+            return None
+        return delay
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+class RateLimiter:
+    """ Client-side limit on the rate and concurrency of requests, shared by every request given it.
+
+    A token bucket lets requests start at 'rate' per second on average, in bursts
+    of up to 'burst', and at most 'max_in_flight' requests are sent at once. The
+    rate adapts to the server (additive increase, multiplicative decrease): each
+    successful response raises it a little, up to 'max_rate', and each 429 or 503
+    response cuts it by 'decrease', down to 'min_rate'. Responses to requests sent
+    before the last cut do not cut it again, as they were sent at the old rate.
+    A 'Retry-After' header on a 429 or 503 pauses every request until it has passed.
+
+    Keyword arguments:
+    rate          -- [float] (Optional) requests per second to start at (defaults to 10)
+    max_in_flight -- [int] (Optional) maximum number of requests sent at once (defaults to 8)
+    burst         -- [float] (Optional) most requests that may start at once after a quiet spell (defaults to max_in_flight)
+    min_rate      -- [float] (Optional) lowest rate to back off to (defaults to 0.1)
+    max_rate      -- [float] (Optional) highest rate to increase to (defaults to 100)
+    increase      -- [float] (Optional) requests per second added for every second of successful requests (defaults to 1)
+    decrease      -- [float] (Optional) factor the rate is multiplied by on a 429 or 503 response (defaults to 0.5)
+    clock         -- [function] (Optional) monotonic clock in seconds (defaults to time.monotonic)
+    sleep         -- [function] (Optional) waits for a number of seconds (defaults to time.sleep)
+    """
+    def __init__(self, rate=10.0, max_in_flight=8, burst=None, min_rate=0.1, max_rate=100.0, increase=1.0, decrease=0.5,
+                 clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0 or max_in_flight < 1:
+            raise ValueError('A rate limiter needs a positive rate and at least one request in flight')
+        self.rate = float(rate)
+        self.max_in_flight = max_in_flight
+        self.burst = float(max_in_flight if burst is None else burst)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._tokens = self.burst
+        self._updated = clock() # when tokens were last added, in the future while paused by a Retry-After
+        self._last_decrease = float('-inf')
+        self._waiting = 0
+        self._in_flight = 0
+
+    @property
+    def queue_depth(self):
+        """ Number of requests waiting for a slot or a token. """
+        return self._waiting
+
+    @property
+    def in_flight(self):
+        """ Number of requests acquired and not yet released. """
+        return self._in_flight
+
+    def _refill(self, now):
+        if now > self._updated:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def acquire(self):
+        """ Wait until a request may be sent, and return the clock() time it may be sent at, to pass to release(). """
+        with self._lock:
+            self._waiting += 1
+        start = self.clock()
+        try:
+            self._slots.acquire()
+            try:
+                while True:
+                    with self._lock:
+                        now = self.clock()
+                        self._refill(now)
+                        if self._tokens >= 1 - 1e-9: # allow for rounding in _refill()
+                            self._tokens -= 1
+                            self._in_flight += 1
+                            break
+                        wait = max(0.0, self._updated - now) + (1 - self._tokens) / self.rate
+                    self.sleep(wait)
+            except BaseException:
+                self._slots.release()
+                raise
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        metrics.observe('rate_limiter_wait_seconds', now - start)
+        return now
+
+    def release(self, started, r=None):
+        """ Free the slot of a request, adapting the rate to its response.
+
+        Keyword arguments:
+        started -- [float] time returned by acquire() for the request
+        r       -- [requests.Response] (Optional) the response, or None if the request failed without one
+        """
+        try:
+            if r is not None:
+                self._adapt(started, r)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    def _adapt(self, started, r):
+        with self._lock:
+            if r.status_code in (429, 503):
+                metrics.incr('rate_limiter_throttled_total')
+                now = self.clock()
+                if started > self._last_decrease:
+                    self.rate = max(self.min_rate, self.rate * self.decrease)
+                    self._last_decrease = now
+                retry_after = parse_retry_after(r.headers.get('Retry-After'))
+                if retry_after is not None and now + retry_after > self._updated: # no tokens until it has passed
+                    self._tokens = min(self._tokens, 0.0)
+                    self._updated = now + retry_after
+            elif r.status_code < 400:
+                self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+
+class HTTPCache:
+    """ On-disk cache of GET response bodies, revalidated with conditional requests.
+
+    Responses carrying an 'ETag' or 'Last-Modified' header are stored. Later
+    requests for the same URL send 'If-None-Match' / 'If-Modified-Since', and a
+    '304 Not Modified' response is answered from the stored body. Entries not
+    revalidated within 'ttl' seconds are evicted, as are the least recently
+    revalidated entries once the cache grows past 'max_bytes'.
+
+    Keyword arguments:
+    directory -- [str] directory the cache is stored in, created if missing
+    ttl       -- [float] (Optional) seconds an entry is kept after it was last revalidated (defaults to 7 days)
+    max_bytes -- [int] (Optional) maximum total size of stored bodies (defaults to 1 GiB)
+    clock     -- [function] (Optional) current UNIX time in seconds (defaults to time.time)
+    """
+    def __init__(self, directory, ttl=7 * 24 * 3600, max_bytes=1024 ** 3, clock=time.time):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url, suffix):
+        return os.path.join(self.directory, hashlib.sha256(url.encode()).hexdigest() + suffix)
+
+    def _read_meta(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, entry):
+        tmp = self._path(entry['url'], f'.json.{threading.get_ident()}.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp, self._path(entry['url'], '.json')) # atomic, readers never see a partial file
+
+    def _evict(self, url):
+        for suffix in ('.json', '.body'):
+            try:
+                os.remove(self._path(url, suffix))
+            except FileNotFoundError:
+                pass
+
+    def lookup(self, url):
+        """ Return the cache entry for 'url', or None if there is no fresh entry. """
+        entry = self._read_meta(self._path(url, '.json'))
+        if entry is None or not os.path.exists(self._path(url, '.body')):
+            return None
+        if self.clock() - entry['validated_at'] > self.ttl:
+            with self._lock:
+                self._evict(url)
+            return None
+        return entry
+
+    def validators(self, entry):
+        """ Return the conditional request headers for a cache entry. """
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def open(self, entry):
+        """ Open a cache entry's stored body for reading (binary). """
+        return open(self._path(entry['url'], '.body'), 'rb')
+
+    def revalidated(self, entry):
+        """ Record that the server confirmed a cache entry is still current. """
+        entry['validated_at'] = self.clock()
+        with self._lock:
+            self._write_meta(entry)
+
+    def store(self, url, r, chunks):
+        """ Store a response body as it is read, yielding each chunk on unchanged.
+
+        The entry is only saved once every chunk has been read, so an interrupted
+        read never leaves a partial body in the cache. Responses without an 'ETag'
+        or 'Last-Modified' header cannot be revalidated and are not stored.
+
+        Keyword arguments:
+        url    -- [str] URL the response was requested from
+        r      -- [requests.Response] the 200 response
+        chunks -- [iterable(bytes)] the response body
+        """
+        entry = {'url': url, 'etag': r.headers.get('ETag'), 'last_modified': r.headers.get('Last-Modified')}
+        if not entry['etag'] and not entry['last_modified']:
+            yield from chunks
+            return
+        tmp = self._path(url, f'.body.{threading.get_ident()}.tmp')
+        size = 0
+        try:
+            with open(tmp, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+                    yield chunk
+            entry['size'] = size
+            entry['validated_at'] = self.clock()
+            with self._lock:
+                os.replace(tmp, self._path(url, '.body'))
+                self._write_meta(entry)
+                self._prune()
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def prune(self):
+        """ Evict expired entries, then the least recently revalidated entries until the cache fits in 'max_bytes'. """
+        with self._lock:
+            self._prune()
+
+    def _prune(self):
+        now = self.clock()
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                entry = self._read_meta(os.path.join(self.directory, name))
+                if entry is None:
+                    continue
+                if now - entry['validated_at'] > self.ttl:
+                    self._evict(entry['url'])
+                else:
+                    entries.append(entry)
+        total = sum(entry['size'] for entry in entries)
+        for entry in sorted(entries, key=lambda entry: entry['validated_at']):
+            if total <= self.max_bytes:
+                break
+            self._evict(entry['url'])
+            total -= entry['size']
+
+def _transient_errors():
+    """ Return the exceptions a request is worth retrying after: connection failures and timeouts. """
+    exceptions = importlib.import_module('requests.exceptions') # only needed once a request has failed
+    return (exceptions.ConnectionError, exceptions.Timeout, ConnectionError, TimeoutError)
+
+def make_request(type, endpoint, headers, data=None, stream=False, session=None, retry_policy=None, cache=None, limiter=None,
+                 base_url=None):
     """ Make an HTTP request to the krakenflex API.
+
+    Requests that fail with a retryable status code (e.g. 500), a connection
+    error or a timeout are retried according to 'retry_policy', and each attempt
+    times out at the policy's deadline. The interpreter exits if the request still fails.
     
     Keyword arguments:
-    type     -- [str] Request type. 'GET' and 'POST' only.
-    endpoint -- [str] API endpoint. e.g. 'outages'
-    headers  -- [dict] HTTP headers to be attached to the request.
-    data     -- [list(dict)] (Optional) Payload to be sent to the server. Only used for POST requests (defaults to None)
-    retries  -- [int] (Optional) Recursion counter. Used to count retry attempts when status code 500 is received.
-    """
-    url = f'https://api.krakenflex.systems/interview-tests-mock-api/v1/{endpoint}'
-    if type == 'GET':
-        r = requests.get(url, headers=headers)
-    elif type == 'POST':
-        r = requests.post(url, headers=headers, json=data)
-    else:
+    type         -- [str] Request type. 'GET' and 'POST' only.
+    endpoint     -- [str] API endpoint. e.g. 'outages'
+    headers      -- [dict] HTTP headers to be attached to the request.
+    data         -- [list(dict) or bytes] (Optional) Payload to be sent to the server, either as JSON or already encoded.
+                    Records (e.g. SiteOutage) are converted with to_payload(). Only used for POST requests (defaults to None)
+    stream       -- [bool] (Optional) GET only. Return a generator over the elements of a JSON array response,
+                    decoding the body as it arrives instead of loading it all into memory (defaults to False)
+    session      -- [requests.Session] (Optional) session used to reuse pooled connections, see make_session().
+                    A new connection is opened for the request when not given.
+    retry_policy -- [RetryPolicy] (Optional) when and how long to wait before retrying (defaults to DEFAULT_RETRY_POLICY)
+    cache        -- [HTTPCache] (Optional) GET only. Cache to revalidate the response against and store it in (defaults to None)
+    limiter      -- [RateLimiter] (Optional) waited on before each attempt, and told of each response (defaults to None, no limit).
+                    A streamed body is read after the request's slot is freed.
+    base_url     -- [str] (Optional) base URL of the API, e.g. a local mock (defaults to None, BASE_URL)
+    """
+    if type not in ('GET', 'POST'):
         print(f'Invalid request type \'{type}\'')
         sys.exit(1)
+    url = f'{base_url or BASE_URL}/{endpoint}'
+    http = session or requests
+    if type == 'POST' and data is not None and not isinstance(data, bytes):
+        data = to_payload(data) # records are Mappings, not dicts, so requests cannot encode them as JSON
+    policy = retry_policy or DEFAULT_RETRY_POLICY
+    deadline = policy.clock() + policy.deadline
+    entry = cache.lookup(url) if cache is not None and type == 'GET' else None
+    if entry is not None:
+        headers = {**headers, **cache.validators(entry)}
+    labels = {'method': type, 'endpoint': endpoint.split('/', 1)[0]} # e.g. 'site-outages/norwich-pear-tree' -> 'site-outages'
+    attempt = 0
+    while True:
+        started = limiter.acquire() if limiter is not None else None
+        timeout = max(deadline - policy.clock(), 0.001) # requests does not accept a timeout of 0
+        r = error = None
+        try:
+            with metrics.timer('http_request_seconds', **labels):
+                if type == 'GET':
+                    r = http.get(url, headers=headers, stream=stream, timeout=timeout)
+                elif isinstance(data, bytes):
+                    r = http.post(url, headers=headers, data=data, timeout=timeout)
+                else:
+                    r = http.post(url, headers=headers, json=data, timeout=timeout)
+        except OSError as e: # requests' exceptions are all OSErrors
+            if not isinstance(e, _transient_errors()):
+                raise
+            error = e
+        finally:
+            if limiter is not None:
+                limiter.release(started, r)
+        if error is None:
+            if metrics.enabled:
+                metrics.incr('http_responses_total', status=str(r.status_code), **labels)
+                if type == 'POST':
+                    metrics.incr('http_request_bytes_total', len(r.request.body or b''), **labels)
+            if r.status_code == 200 or (r.status_code == 304 and entry is not None):
+                break
+        delay = policy.next_delay(attempt, r, deadline)
+        if delay is None:
+            break
+        attempt += 1
+        metrics.incr('http_retries_total', **labels)
+        if error is None:
+            print(f'Server returned {r.status_code}: {HTTPStatus(r.status_code).phrase}... Retrying... {attempt}/{policy.max_retries}')
+            r.close() # release the connection while we wait
+        else:
+            print(f'Request failed ({error.__class__.__name__})... Retrying... {attempt}/{policy.max_retries}')
+        policy.sleep(delay)
+    if error is not None:
+        print(f'Error ({error.__class__.__name__}: {error})')
+        sys.exit(1)
     phrase = HTTPStatus(r.status_code).phrase
+    if r.status_code == 304 and entry is not None: # unchanged since it was cached
+        print(f'{r.status_code} {phrase}')
+        r.close()
+        cache.revalidated(entry)
+        f = cache.open(entry)
+        if stream:
+            return _stream_json_array(f, iter(functools.partial(f.read, STREAM_CHUNK_SIZE), b''))
+        with f:
+            return json.load(f)
     if r.status_code == 200:
         print(f'{r.status_code} {phrase}')
-        if type == "GET" and r.json(): # avoid returning None
-            return r.json()
-        elif r.json() == None:
-            print(f'Server returned 200 but no valid data')
+        if type == "GET" and stream:
+            chunks = metrics.counted('http_response_bytes_total', r.iter_content(chunk_size=STREAM_CHUNK_SIZE), len, **labels)
+            if cache is None:
+                return _stream_json_array(r, chunks)
+            return _stream_json_array(r, cache.store(url, r, chunks))
+        if metrics.enabled:
+            metrics.incr('http_response_bytes_total', len(r.content), **labels)
+        if type == "GET" and cache is not None:
+            for _ in cache.store(url, r, [r.content]):
+                pass
+        body = r.json() # decode once
+        if body is None: # avoid returning None
+            print('Server returned 200 but no valid data')
             sys.exit(1)
+        elif type == "GET":
+            return body
         else:
             return r.status_code
-    elif r.status_code == 500 and retries < 5:
-        print(f'Server returned {r.status_code}: {phrase}... Retrying... {retries+1}/5')
-        time.sleep(retries*1.5)
-        retries+=1
-        make_request(type,endpoint,headers,data,retries)
     else:
         print(f'Error ({r.status_code}: {phrase})')
         sys.exit(1)
 
-def generate_site_outages(outages, site, earliest):
-    """ Generate a list of outages for a site.
+class AsyncClient:
+    """ Awaitable equivalent of make_request sharing one pool of keep-alive connections.
+
+    Requests run on a pool of worker threads so many GETs and POSTs can be awaited
+    concurrently, e.g. with asyncio.gather(). Status codes are handled exactly as
+    in make_request.
+
+    Keyword arguments:
+    headers         -- [dict] HTTP headers to be attached to every request
+    max_connections -- [int] (Optional) maximum number of concurrent requests and pooled connections (defaults to 10)
+    request_options -- (Optional) keyword arguments passed on to make_request, e.g. retry_policy or cache
+    """
+    def __init__(self, headers, max_connections=10, **request_options):
+        self.headers = headers
+        self.request_options = request_options
+        self.session = make_session(max_connections)
+        self._executor = futures.ThreadPoolExecutor(max_workers=max_connections)
+
+    async def make_request(self, type, endpoint, data=None):
+        """ Make an HTTP request to the krakenflex API, see make_request().
+
+        Keyword arguments:
+        type     -- [str] Request type. 'GET' and 'POST' only.
+        endpoint -- [str] API endpoint. e.g. 'outages'
+        data     -- [list(dict)] (Optional) Payload to be sent to the server, records included. Only used for POST requests (defaults to None)
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(
+            make_request, type, endpoint, self.headers, data, session=self.session, **self.request_options))
+
+    def close(self):
+        """ Close all pooled connections. """
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+def iter_site_outages(outages, device_index, earliest):
+    """ Lazily filter and join outages to a site's devices, yielding one site outage at a time.
+
+    Keyword arguments:
+    outages      -- [iterable(dict)] outages from 'GET /outages', e.g. a streamed response
+    device_index -- [dict] index of the site's devices from build_device_index(site)
+    earliest     -- the earliest date an outage is deemed valid (ISO 8601 form)
+    """
+    for outage in outages:
+        if outage["begin"] < earliest:
+            continue
+        names = device_index.get(outage["id"])
+        if names is not None:
+            for name in names:
+                yield SiteOutage(outage["id"], name, outage["begin"], outage["end"])
+
+def generate_site_outages(outages, site, earliest, device_index=None):
+    """ Generate a list of outages for a site, as SiteOutage records.
     
     Keyword arguments:
-    outages  -- a list of outages (dict) from 'GET /outages'
-    site     -- site information from 'GET /site-info/norwich-pear-tree'
-    earliest -- the earliest date an outage is deemed valid (ISO 8601 form) 
-               e.g. '2022-01-01T00:00:00.000Z'
+    outages      -- a list (or any iterable) of outages (dict) from 'GET /outages'
+    site         -- site information from 'GET /site-info/norwich-pear-tree'
+    earliest     -- the earliest date an outage is deemed valid (ISO 8601 form) 
+                    e.g. '2022-01-01T00:00:00.000Z'
+    device_index -- [dict] (Optional) prebuilt index from build_device_index(site).
+                    Built from 'site' when not given.
     """
-    site_outages = []
+    if device_index is None:
+        device_index = build_device_index(site)
+    return list(iter_site_outages(outages, device_index, earliest))
+
+def partition_site_outages(outages, sites, earliest, device_indexes=None):
+    """ Generate the outages for many sites in a single pass over the outages.
+
+    Returns a dict of site ID -> list of SiteOutage records for that site, as
+    generate_site_outages() would return.
+
+    Keyword arguments:
+    outages        -- [iterable(dict)] outages from 'GET /outages'
+    sites          -- [dict] site ID -> site information from 'GET /site-info/{siteId}'
+    earliest       -- the earliest date an outage is deemed valid (ISO 8601 form)
+    device_indexes -- [dict] (Optional) site ID -> prebuilt index from build_device_index(site).
+                      Built from 'sites' when not given.
+    """
+    partitions = {site_id: [] for site_id in sites}
+    devices = {} # device ID -> [(site outages list, device name)], a device may belong to several sites
+    for site_id, site in sites.items():
+        device_index = device_indexes[site_id] if device_indexes is not None else build_device_index(site)
+        for device_id, names in device_index.items():
+            devices.setdefault(device_id, []).extend((partitions[site_id], name) for name in names)
     for outage in outages:
         if outage["begin"] < earliest:
             continue
-        for device in site["devices"]:
-            if outage["id"] == device["id"]:
-                site_outages.append({
-                    "id": outage["id"],
-                    "name": device["name"],
-                    "begin": outage["begin"],
-                    "end": outage["end"]
-                    })
-    return site_outages
+        for site_outages, name in devices.get(outage["id"], ()):
+            site_outages.append(SiteOutage(outage["id"], name, outage["begin"], outage["end"]))
+    return partitions
+
+_worker_state = None # (device index, earliest) in each worker process of process_site_outages()
+_FIELD_SEPARATOR = '\x1e' # ASCII record separator, joins the fields of a chunk of outages into one string
+
+def _init_worker(device_index, earliest):
+    """ Give a worker process of process_site_outages() its read-only device index, once. """
+    global _worker_state
+    _worker_state = (device_index, earliest)
+
+def _pack_chunk(chunk):
+    """ Join the id, begin and end of every outage in a chunk into one string, which is far cheaper to
+    send to a worker process than a list of dicts. The chunk is returned as it is if it cannot be packed.
+    """
+    try:
+        packed = _FIELD_SEPARATOR.join(itertools.chain.from_iterable(map(operator.itemgetter("id", "begin", "end"), chunk)))
+    except TypeError: # a field that is not a string
+        return chunk
+    if packed.count(_FIELD_SEPARATOR) != 3 * len(chunk) - 1: # a field containing the separator
+        return chunk
+    return packed
+
+def _process_chunk(chunk):
+    """ Filter, join and evaluate the warnings of a chunk of outages in a worker process.
+
+    Returns (site outages, report rows) for the chunk, in the order of 'chunk'.
+    Site outages are returned as plain tuples, which are much faster to send back.
+    """
+    device_index, earliest = _worker_state
+    if isinstance(chunk, str):
+        fields = iter(chunk.split(_FIELD_SEPARATOR))
+        chunk = zip(fields, fields, fields)
+    else:
+        chunk = ((outage["id"], outage["begin"], outage["end"]) for outage in chunk)
+    site_outages = []
+    rows = []
+    for id, begin, end in chunk:
+        if begin < earliest:
+            continue
+        for name in device_index.get(id, ()):
+            site_outages.append((id, name, begin, end))
+            rows.append(report_row(SiteOutage(id, name, begin, end)))
+    return site_outages, rows
+
+def process_site_outages(outages, site, earliest, device_index=None, processes=None, chunk_size=PROCESS_CHUNK_SIZE):
+    """ Generate a site's outages and their report rows on a pool of worker processes.
+
+    The outages are split into chunks as they arrive, so a stream is never held
+    in memory all at once, and each chunk's date filter, device join and warnings
+    are computed in a worker process, using every CPU core. Only a few chunks per
+    worker are in flight at a time. Results are merged in the order of 'outages',
+    so they are the same as a single-process run.
+
+    Returns (site_outages, rows): the list generate_site_outages() would return,
+    and report_row() of each of them, which can be passed to write_report().
+
+    Keyword arguments:
+    outages      -- [iterable(dict)] outages from 'GET /outages', e.g. a streamed response
+    site         -- site information from 'GET /site-info/{siteId}'
+    earliest     -- the earliest date an outage is deemed valid (ISO 8601 form)
+    device_index -- [dict] (Optional) prebuilt index from build_device_index(site). Built from 'site' when not given.
+    processes    -- [int] (Optional) number of worker processes (defaults to None, one per CPU core)
+    chunk_size   -- [int] (Optional) outages sent to a worker at a time (defaults to PROCESS_CHUNK_SIZE)
+    """
+    if device_index is None:
+        device_index = build_device_index(site)
+    site_outages = []
+    rows = []
+
+    def merge(future):
+        chunk_outages, chunk_rows = future.result()
+        site_outages.extend(itertools.starmap(SiteOutage, chunk_outages))
+        rows.extend(chunk_rows)
+
+    outages = iter(outages)
+    processes = processes or os.cpu_count() or 1
+    max_pending = 2 * processes # keep every worker busy without reading far ahead of them
+    with futures.ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(device_index, earliest)) as pool:
+        pending = deque()
+        for chunk in iter(lambda: list(itertools.islice(outages, chunk_size)), []):
+            if len(pending) >= max_pending:
+                merge(pending.popleft()) # in submission order
+            pending.append(pool.submit(_process_chunk, _pack_chunk(chunk)))
+        for future in pending:
+            merge(future)
+    return site_outages, rows
+
+class SyncState:
+    """ Per-site checkpoints of the outages last sent successfully, stored as JSON files.
+
+    A checkpoint is a dict with 'digests' (outage ID -> content hash of that
+    ID's outages), see diff_site_outages().
+
+    Keyword arguments:
+    directory -- [str] directory the checkpoints are stored in, created if missing
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, site_id):
+        return os.path.join(self.directory, f'{site_id}.json')
+
+    def load(self, site_id):
+        """ Return a site's checkpoint, or an empty checkpoint if none has been saved. """
+        try:
+            with open(self._path(site_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'digests': {}}
+
+    def save(self, site_id, checkpoint):
+        """ Save a site's checkpoint, replacing the previous one atomically. """
+        tmp = self._path(site_id) + f'.{threading.get_ident()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp, self._path(site_id))
+
+def diff_site_outages(site_outages, checkpoint=None):
+    """ Find the outage IDs whose outages were added, changed or removed since a checkpoint.
+
+    Outages are grouped by ID and each group is hashed. The checkpoint only
+    decides whether a site needs sending at all: 'POST /site-outages/{siteId}'
+    replaces the site's outages, so whenever anything changed the site's full
+    list must be sent, never only the changed outages.
+
+    Returns (sorted IDs whose outages were added, changed or removed, the
+    checkpoint to save once the site's outages have been sent).
+
+    Every outage is still hashed on every run: the API has no way to ask for
+    only the outages changed since a given time.
+
+    Keyword arguments:
+    site_outages -- [list(dict)] outages for a site from generate_site_outages()
+    checkpoint   -- [dict] (Optional) checkpoint from the last successful send, see SyncState.
+                    Every ID counts as changed when not given.
+    """
+    groups = {}
+    for outage in site_outages:
+        groups.setdefault(outage["id"], []).append(f'{outage["begin"]}|{outage["end"]}|{outage["name"]}')
+    digests = {outage_id: hashlib.sha256('\n'.join(sorted(rows)).encode()).hexdigest() for outage_id, rows in groups.items()}
+    previous = checkpoint['digests'] if checkpoint else {}
+    removed = previous.keys() - digests.keys()
+    changed = {outage_id for outage_id, digest in digests.items() if previous.get(outage_id) != digest}
+    return sorted(removed | changed), {'digests': digests}
+
+def _try_request(*args, **kwargs):
+    """ Call make_request, returning (result, None) on success or (None, error) on failure. """
+    try:
+        return make_request(*args, **kwargs), None
+    except SystemExit: # make_request has already printed the reason
+        return None, 'request failed'
+    except Exception as e:
+        return None, str(e) or type(e).__name__
+
+def post_site_outages_chunked(site_id, site_outages, headers, chunk_size=1000, max_workers=4, compress=True, chunk_retries=1, **request_options):
+    """ Send a site's outages to 'POST /site-outages/{siteId}' in concurrent, gzip-compressed chunks.
+
+    Each chunk is a separate request over a shared pool of connections, so a
+    timeout or server error only costs that chunk. Chunks that still fail after
+    make_request's own retries are sent again, up to 'chunk_retries' more times.
+    Throughput is printed at the end.
+
+    As a POST replaces the site's outages, every chunk carries an 'X-Upload-Id'
+    shared by all chunks of this call, its 'X-Chunk-Index' and the
+    'X-Chunk-Count'. The server must hold the chunks, which can arrive in any
+    order, and only replace the site's outages once all of them have arrived,
+    as benchmarks/mock_api.py does. A server that ignores these headers would
+    keep only the last chunk to arrive, so only use chunks with one that reads
+    them. If any chunk fails, the site's outages are left as they were.
+
+    Returns a dict of {'chunks': number of chunks, 'failed': indexes of chunks that
+    could not be sent, 'rows': outages sent, 'bytes': request body bytes sent,
+    'seconds': time taken}.
+
+    Keyword arguments:
+    site_id         -- [str] site ID, e.g. 'norwich-pear-tree'
+    site_outages    -- [list(dict)] outages for the site from generate_site_outages()
+    headers         -- [dict] HTTP headers to be attached to every request
+    chunk_size      -- [int] (Optional) maximum outages per request (defaults to 1000)
+    max_workers     -- [int] (Optional) maximum number of concurrent requests (defaults to 4)
+    compress        -- [bool] (Optional) gzip each request body (defaults to True)
+    chunk_retries   -- [int] (Optional) times to resend chunks that failed (defaults to 1)
+    request_options -- (Optional) keyword arguments passed on to make_request, e.g. session or retry_policy
+    """
+    chunks = [site_outages[i:i + chunk_size] for i in range(0, len(site_outages), chunk_size)] or [[]]
+    chunk_headers = {**headers, 'Content-Type': 'application/json',
+                     'X-Upload-Id': os.urandom(8).hex(), 'X-Chunk-Count': str(len(chunks))} # lets the server reassemble the chunks
+    if compress:
+        chunk_headers['Content-Encoding'] = 'gzip'
+    session = request_options.pop('session', None)
+    own_session = session is None
+    if own_session:
+        session = make_session(max_workers)
+
+    def send(index):
+        body = json.dumps(to_payload(chunks[index]), separators=(',', ':')).encode()
+        if compress:
+            body = gzip.compress(body, GZIP_LEVEL)
+        _, error = _try_request('POST', f'site-outages/{site_id}', {**chunk_headers, 'X-Chunk-Index': str(index)}, body,
+                                session=session, **request_options)
+        return index, len(body), error
+
+    start = time.perf_counter()
+    rows = sent_bytes = 0
+    pending = list(range(len(chunks)))
+    try:
+        with futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for _ in range(chunk_retries + 1):
+                failed = []
+                for index, size, error in pool.map(send, pending):
+                    if error is None:
+                        rows += len(chunks[index])
+                        sent_bytes += size
+                    else:
+                        failed.append(index)
+                if not failed:
+                    break
+                pending = failed # only resend what failed
+    finally:
+        if own_session:
+            session.close()
+    seconds = max(time.perf_counter() - start, 1e-9)
+
+    print(f'Sent {rows} outages to {site_id} in {len(chunks) - len(failed)}/{len(chunks)} chunks '
+          f'({rows / seconds:.0f} rows/s, {sent_bytes / seconds:.0f} bytes/s)')
+    return {'chunks': len(chunks), 'failed': failed, 'rows': rows, 'bytes': sent_bytes, 'seconds': seconds}
+
+def run_batch(site_ids, headers, earliest, max_workers=8, sync_state=None, full_resync=False, chunk_size=None, **request_options):
+    """ Generate and send the outages for many sites.
+
+    'GET /site-info/{siteId}' is fetched for every site concurrently, 'GET /outages'
+    is fetched once and partitioned to every site in a single pass, then each
+    site's 'POST /site-outages/{siteId}' is sent concurrently. With 'sync_state',
+    a site is only posted, with all of its outages, if any were added, changed
+    or removed since its last successful send.
+
+    Returns a dict of site ID -> {'outages': number of site outages sent (or None),
+    'error': reason the site failed (or None)}, and prints a line per site.
+
+    Keyword arguments:
+    site_ids        -- [list(str)] site IDs, e.g. ['norwich-pear-tree']
+    headers         -- [dict] HTTP headers to be attached to every request
+    earliest        -- the earliest date an outage is deemed valid (ISO 8601 form)
+    max_workers     -- [int] (Optional) maximum number of concurrent requests (defaults to 8)
+    sync_state      -- [SyncState] (Optional) per-site checkpoints for incremental sends (defaults to None, send everything)
+    full_resync     -- [bool] (Optional) ignore the checkpoints, send everything and start new checkpoints (defaults to False)
+    chunk_size      -- [int] (Optional) send each site's outages in compressed chunks of this many, see
+                       post_site_outages_chunked() (defaults to None, one request per site)
+    request_options -- (Optional) keyword arguments passed on to make_request, e.g. retry_policy or cache
+    """
+    results = {site_id: {'outages': None, 'error': None} for site_id in site_ids}
+    with futures.ThreadPoolExecutor(max_workers=max_workers) as pool, make_session(max_workers) as session:
+        with metrics.timer('stage_seconds', stage='site_info'):
+            site_infos = list(pool.map(lambda site_id: _try_request('GET', f'site-info/{site_id}', headers, session=session, **request_options), site_ids))
+        sites = {}
+        for site_id, (site, error) in zip(site_ids, site_infos):
+            if error is None:
+                sites[site_id] = site
+            else:
+                results[site_id]['error'] = f'site-info: {error}'
+
+        if sites:
+            def send(site_id, site_outages):
+                checkpoint = None if sync_state is None or full_resync else sync_state.load(site_id)
+                sent, checkpoint, error = _send_site_outages(site_id, site_outages, headers, checkpoint, sync_state is None or full_resync,
+                                                             chunk_size, session=session, **request_options)
+                if checkpoint is not None and sync_state is not None:
+                    sync_state.save(site_id, checkpoint)
+                return sent, error
+
+            _fetch_and_send(sites, headers, earliest, send, results, pool, session=session, **request_options)
+
+    _print_results(results)
+    return results
+
+def _send_site_outages(site_id, site_outages, headers, checkpoint=None, force=False, chunk_size=None, **request_options):
+    """ Send every outage of a site if any was added, changed or removed since 'checkpoint'.
+
+    Nothing is sent if nothing changed, unless 'force'.
+    Returns (number of outages sent, the new checkpoint if they were sent or None, reason the send failed or None).
+
+    Keyword arguments:
+    site_id         -- [str] site ID, e.g. 'norwich-pear-tree'
+    site_outages    -- [list(dict)] every current outage of the site
+    headers         -- [dict] HTTP headers to be attached to every request
+    checkpoint      -- [dict] (Optional) checkpoint of the outages last sent, see diff_site_outages() (defaults to None, send everything)
+    force           -- [bool] (Optional) send even if nothing changed (defaults to False)
+    chunk_size      -- [int] (Optional) send the outages in compressed chunks of this many, see post_site_outages_chunked()
+                       (defaults to None, one request)
+    request_options -- (Optional) keyword arguments passed on to make_request, e.g. session or cache
+    """
+    metrics.incr('rows_matched_total', len(site_outages))
+    changed, checkpoint = diff_site_outages(site_outages, checkpoint)
+    if not changed and not force:
+        return 0, None, None
+    if chunk_size and site_outages: # no chunks at all would not clear the site's outages
+        report = post_site_outages_chunked(site_id, site_outages, headers, chunk_size, **request_options)
+        error = f'{len(report["failed"])} of {report["chunks"]} chunks failed' if report['failed'] else None
+    else:
+        error = _try_request('POST', f'site-outages/{site_id}', headers, site_outages, **request_options)[1]
+    return len(site_outages), (checkpoint if error is None else None), error
+
+def _fetch_and_send(sites, headers, earliest, send, results, pool, device_indexes=None, **request_options):
+    """ Fetch 'GET /outages' once, partition it to every site and send each site's outages concurrently.
+
+    Each site's number of outages sent and any error are recorded in 'results',
+    as run_batch() returns them.
+
+    Keyword arguments:
+    sites           -- [dict] site ID -> site information from 'GET /site-info/{siteId}'
+    headers         -- [dict] HTTP headers to be attached to every request
+    earliest        -- the earliest date an outage is deemed valid (ISO 8601 form)
+    send            -- [callable] send(site_id, site_outages) returning (number of outages sent, reason it failed or None)
+    results         -- [dict] site ID -> {'outages': ..., 'error': ...} to record the results in
+    pool            -- [ThreadPoolExecutor] pool to send the sites on
+    device_indexes  -- [dict] (Optional) site ID -> device index, see partition_site_outages() (defaults to None, built here)
+    request_options -- (Optional) keyword arguments passed on to make_request, e.g. session or cache
+    """
+    partitions = {}
+    with metrics.timer('stage_seconds', stage='outages'): # download, decode and match as the outages arrive
+        outages, error = _try_request('GET', 'outages', headers, stream=True, **request_options)
+        if error is None:
+            try:
+                partitions = partition_site_outages(metrics.counted('rows_in_total', outages), sites, earliest, device_indexes)
+            except Exception as e: # the stream can still fail part way through
+                error = str(e) or type(e).__name__
+    if error is not None:
+        for site_id in sites:
+            results[site_id]['error'] = f'outages: {error}'
+
+    with metrics.timer('stage_seconds', stage='post'):
+        for site_id, (sent, error) in zip(partitions, pool.map(lambda item: send(*item), partitions.items())):
+            results[site_id]['outages'] = sent
+            if error is None:
+                metrics.incr('rows_sent_total', sent)
+            else:
+                results[site_id]['error'] = f'site-outages: {error}'
+
+def _print_results(results):
+    """ Print a line per site of the results of run_batch() or Watcher.poll(). """
+    for site_id, result in results.items():
+        if result['error'] is None:
+            print(f'{site_id}: OK ({result["outages"]} outages sent)')
+        else:
+            print(f'{site_id}: FAILED ({result["error"]})')
+
+class Watcher:
+    """ Poll 'GET /outages' on an interval, sending each site's outages whenever they change.
+
+    Unlike running the program once per interval (e.g. from cron), the pooled
+    connections and each site's information, device index and checkpoint stay
+    in memory between polls. A poll therefore costs one request for the outages
+    (a conditional one, with a 'cache'), a single pass over them, and a POST
+    only for the sites whose outages were added, changed or removed since they
+    were last sent. Site information is fetched again every 'site_refresh' polls,
+    and a site's device index is only rebuilt if its devices changed.
+
+    Memory does not grow with the number of polls: only the latest information,
+    device index and checkpoint of each site is kept, and the outages of a poll
+    are released once they have been compared with the checkpoints.
+
+    Keyword arguments:
+    site_ids        -- [list(str)] sites to watch, e.g. ['norwich-pear-tree']
+    headers         -- [dict] HTTP headers to be attached to every request
+    earliest        -- the earliest date an outage is deemed valid (ISO 8601 form)
+    interval        -- [float] (Optional) seconds from the start of one poll to the start of the next (defaults to WATCH_INTERVAL)
+    site_refresh    -- [int] (Optional) polls between fetching each site's information again (defaults to SITE_REFRESH)
+    sync_state      -- [SyncState] (Optional) checkpoints to start from and to save after each send, so a restarted
+                       watcher only sends what changed while it was stopped (defaults to None, kept in memory only)
+    full_resync     -- [bool] (Optional) send every outage on the first poll, ignoring 'sync_state' (defaults to False)
+    chunk_size      -- [int] (Optional) send each site's outages in compressed chunks of this many, see
+                       post_site_outages_chunked() (defaults to None, one request per site)
+    max_workers     -- [int] (Optional) maximum number of concurrent requests (defaults to 8)
+    request_options -- (Optional) keyword arguments passed on to make_request, e.g. retry_policy or cache
+    """
+    def __init__(self, site_ids, headers, earliest, interval=WATCH_INTERVAL, site_refresh=SITE_REFRESH, sync_state=None,
+                 full_resync=False, chunk_size=None, max_workers=8, **request_options):
+        self.site_ids = list(site_ids)
+        self.headers = headers
+        self.earliest = earliest
+        self.interval = interval
+        self.site_refresh = site_refresh
+        self.sync_state = sync_state
+        self.full_resync = full_resync
+        self.chunk_size = chunk_size
+        self.request_options = request_options
+        self.polls = 0
+        self.sites = {} # site ID -> latest site information
+        self.device_indexes = {} # site ID -> device index of that site information
+        self.checkpoints = {} # site ID -> checkpoint of the outages last sent
+        self.stopping = threading.Event()
+        self._session = make_session(max_workers)
+        self._pool = futures.ThreadPoolExecutor(max_workers=max_workers)
+
+    def _refresh_sites(self, results):
+        """ Fetch the information of sites not yet known, or of every site when due, keeping the last one on failure. """
+        due = self.polls % self.site_refresh == 0
+        site_ids = [site_id for site_id in self.site_ids if due or site_id not in self.sites]
+        fetched = self._pool.map(lambda site_id: _try_request('GET', f'site-info/{site_id}', self.headers, session=self._session,
+                                                             **self.request_options), site_ids)
+        for site_id, (site, error) in zip(site_ids, fetched):
+            if error is not None:
+                if site_id not in self.sites:
+                    results[site_id]['error'] = f'site-info: {error}'
+            elif site != self.sites.get(site_id):
+                self.sites[site_id] = site
+                self.device_indexes[site_id] = build_device_index(site)
+
+    def _checkpoint(self, site_id):
+        """ Return the checkpoint a site's outages are compared with, loading it from 'sync_state' on first use. """
+        if site_id not in self.checkpoints:
+            if self.sync_state is None or self.full_resync:
+                return None
+            self.checkpoints[site_id] = self.sync_state.load(site_id)
+        return self.checkpoints[site_id]
+
+    def _send(self, site_id, site_outages):
+        """ Send a site's outages if they changed since its checkpoint, returning (outages sent, error). """
+        checkpoint = self._checkpoint(site_id)
+        sent, checkpoint, error = _send_site_outages(site_id, site_outages, self.headers, checkpoint, site_id not in self.checkpoints,
+                                                     self.chunk_size, session=self._session, **self.request_options)
+        if checkpoint is not None:
+            self.checkpoints[site_id] = checkpoint
+            if self.sync_state is not None:
+                self.sync_state.save(site_id, checkpoint)
+        return sent, error
+
+    def poll(self):
+        """ Fetch the outages once and send all the outages of every site where any changed.
+
+        Returns a dict of site ID -> {'outages': number of site outages sent (or None),
+        'error': reason the site failed (or None)}, as run_batch() does, and prints a line per site.
+        """
+        results = {site_id: {'outages': None, 'error': None} for site_id in self.site_ids}
+        with metrics.timer('stage_seconds', stage='site_info'):
+            self._refresh_sites(results)
+        sites = {site_id: self.sites[site_id] for site_id in self.site_ids if site_id in self.sites}
+
+        if sites: # only the checkpoints are kept between polls, not the outages
+            _fetch_and_send(sites, self.headers, self.earliest, self._send, results, self._pool, self.device_indexes,
+                            session=self._session, **self.request_options)
+
+        self.polls += 1
+        metrics.incr('watch_polls_total')
+        _print_results(results)
+        return results
+
+    def run(self, max_polls=None):
+        """ Poll every 'interval' seconds until stop() is called, SIGINT or SIGTERM is received, or 'max_polls' is reached.
+
+        A poll in progress is always finished before stopping, so checkpoints are
+        never left behind what was sent. A second signal stops immediately. A poll
+        that raises is printed and counted, and the next poll is made as usual.
+
+        Keyword arguments:
+        max_polls -- [int] (Optional) stop after this many polls (defaults to None, poll until stopped)
+        """
+        handlers = {}
+        if threading.current_thread() is threading.main_thread(): # signal handlers can only be set there
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                handlers[signum] = signal.signal(signum, self._on_signal)
+        try:
+            while not self.stopping.is_set():
+                start = time.monotonic()
+                try:
+                    self.poll()
+                except Exception as e: # e.g. a bug or a bad response, the next poll may well succeed
+                    self.polls += 1
+                    metrics.incr('watch_poll_errors_total')
+                    print(f'Poll failed ({e.__class__.__name__}: {e})')
+                if max_polls is not None and self.polls >= max_polls:
+                    break
+                self.stopping.wait(max(0.0, self.interval - (time.monotonic() - start)))
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+
+    def _on_signal(self, signum, frame):
+        if self.stopping.is_set():
+            raise KeyboardInterrupt
+        print(f'Received {signal.Signals(signum).name}, stopping after the current poll')
+        self.stop()
+
+    def stop(self):
+        """ Ask run() to stop once the current poll, if any, has finished. Safe to call from any thread. """
+        self.stopping.set()
+
+    def close(self):
+        """ Release the worker threads and pooled connections. """
+        self._pool.shutdown()
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
 def check_date_warnings(begin, end):
     """ Check site outages for dates that appear invalid.
@@ -82,43 +1342,415 @@ def check_date_warnings(begin, end):
         warnings.append('Outage has future end date\n')
     return warnings
 
+class IntervalIndex:
+    """ Per-device index of outage intervals, for point-in-time, range and downtime queries.
+
+    Each device's outages are sorted and merged where they overlap (or touch), so
+    no downtime is counted twice. Queries binary search the merged intervals,
+    taking O(log n) per device instead of scanning every outage. Outages that end
+    before they begin are counted but not indexed. Times may be given as datetimes
+    or in the API's ISO 8601 form. A device ID listed under several names (see
+    build_device_index()) is queried by ID and summarised once per name.
+
+    Keyword arguments:
+    site_outages -- [list(dict)] outages for a site from generate_site_outages()
+    """
+    _EMPTY = ([], [], [timedelta(0)])
+
+    def __init__(self, site_outages):
+        self.names = {} # device ID -> tuple of device names, in the order first seen
+        self.counts = {} # (device ID, device name) -> number of outages
+        spans = {}
+        for outage in site_outages:
+            device_id, name = outage["id"], outage["name"]
+            if (device_id, name) not in self.counts:
+                self.names[device_id] = self.names.get(device_id, ()) + (name,)
+            self.counts[device_id, name] = self.counts.get((device_id, name), 0) + 1
+            begin = parse_timestamp(outage["begin"])
+            end = parse_timestamp(outage["end"])
+            if begin <= end:
+                spans.setdefault(device_id, []).append((begin, end))
+        self._intervals = {} # device ID -> (begins, ends, downtime before each merged interval)
+        for device_id, device_spans in spans.items():
+            begins, ends = [], []
+            for begin, end in sorted(device_spans):
+                if ends and begin <= ends[-1]: # overlaps the previous interval
+                    ends[-1] = max(ends[-1], end)
+                else:
+                    begins.append(begin)
+                    ends.append(end)
+            totals = [timedelta(0)]
+            for begin, end in zip(begins, ends):
+                totals.append(totals[-1] + (end - begin))
+            self._intervals[device_id] = (begins, ends, totals)
+
+    def merged(self, device_id):
+        """ Return a device's merged outages as a sorted list of (begin, end) datetimes. """
+        begins, ends, _ = self._intervals.get(device_id, self._EMPTY)
+        return list(zip(begins, ends))
+
+    def is_down(self, device_id, instant):
+        """ Return True if the device had an outage at 'instant' (begin inclusive, end exclusive). """
+        instant = _as_datetime(instant)
+        begins, ends, _ = self._intervals.get(device_id, self._EMPTY)
+        i = bisect.bisect_right(begins, instant) - 1
+        return i >= 0 and instant < ends[i]
+
+    def down_at(self, instant):
+        """ Return the IDs of the devices that had an outage at 'instant', sorted by device name. """
+        instant = _as_datetime(instant)
+        return sorted((device_id for device_id in self._intervals if self.is_down(device_id, instant)),
+                      key=lambda device_id: (self.names[device_id], device_id))
+
+    def overlapping(self, begin, end):
+        """ Return device ID -> merged outages (begin, end) overlapping [begin, end), clipped to it. """
+        begin, end = _as_datetime(begin), _as_datetime(end)
+        result = {}
+        for device_id, (begins, ends, _) in self._intervals.items():
+            lo = bisect.bisect_right(ends, begin) # first interval ending after 'begin'
+            hi = bisect.bisect_left(begins, end) # intervals beginning before 'end'
+            if lo < hi:
+                result[device_id] = [(max(b, begin), min(e, end)) for b, e in zip(begins[lo:hi], ends[lo:hi])]
+        return result
+
+    def downtime(self, device_id, begin=None, end=None):
+        """ Return a device's total downtime (timedelta), optionally only within [begin, end). """
+        begins, ends, totals = self._intervals.get(device_id, self._EMPTY)
+        if begin is None and end is None:
+            return totals[-1]
+        lo = 0 if begin is None else bisect.bisect_right(ends, _as_datetime(begin))
+        hi = len(begins) if end is None else bisect.bisect_left(begins, _as_datetime(end))
+        if lo >= hi:
+            return timedelta(0)
+        total = totals[hi] - totals[lo]
+        if begin is not None and begins[lo] < _as_datetime(begin): # clip the first interval
+            total -= _as_datetime(begin) - begins[lo]
+        if end is not None and ends[hi - 1] > _as_datetime(end): # clip the last interval
+            total -= ends[hi - 1] - _as_datetime(end)
+        return total
+
+    def summary(self, begin=None, end=None):
+        """ Return a dict per device (and name), sorted by device name: id, name, outages (count),
+        merged (list of (begin, end) datetimes) and downtime (timedelta), optionally only within [begin, end).
+        """
+        if begin is None and end is None:
+            merged = {device_id: self.merged(device_id) for device_id in self._intervals}
+        else:
+            merged = self.overlapping(begin or datetime.min, end or datetime.max)
+        return [{"id": device_id, "name": name, "outages": self.counts[device_id, name],
+                 "merged": merged.get(device_id, []), "downtime": self.downtime(device_id, begin, end)}
+                for device_id, name in sorted(self.counts, key=lambda key: (key[1], key[0]))]
+
+def _format_timestamp(value):
+    """ Format a datetime in the API's ISO 8601 form, e.g. '2022-01-01T00:00:00.000Z'. """
+    return value.isoformat(timespec='milliseconds') + 'Z'
+
+def _as_datetime(value):
+    """ Return 'value' as a datetime, parsing it if it is a timestamp in the API's form. """
+    return parse_timestamp(value) if isinstance(value, str) else value
+
+def format_duration(duration):
+    """ Format a timedelta to the whole second, e.g. '1 day, 2:03:04'.
+
+    Keyword arguments:
+    duration -- [timedelta] outage's duration (may be negative)
+    """
+    return str(duration - timedelta(microseconds=duration.microseconds))
+
+def report_row(outage):
+    """ Return an outage's row of the report: device name, begin, end, duration and warnings (str).
+
+    Keyword arguments:
+    outage -- [dict] an outage for a site from generate_site_outages()
+    """
+    begin = parse_timestamp(outage["begin"]) # string to datetime object
+    end = parse_timestamp(outage["end"])
+    warnings = check_date_warnings(begin, end) # generate any warnings
+    warning_str = 'WARNING: \n' + ''.join(warnings) if warnings else ''
+    return (outage["name"], begin.strftime('%Y-%m-%d %H:%M:%S'), end.strftime('%Y-%m-%d %H:%M:%S'), # format date nicely
+            format_duration(end - begin), warning_str)
+
 def generate_pretty_table(site_outages):
     """ Return PrettyTable showing site outages + warnings
 
+    For large reports, write_report() produces the same table much faster.
+
     Keyword arguments:
     site_outages  -- [list(dict)] list of outages for a site
     """
-    table = PrettyTable()
-    table.field_names = ['Device Name', 'Begin', 'End', 'Duration', '']
+    table = prettytable.PrettyTable()
+    table.field_names = REPORT_FIELDS
 
     for outage in site_outages:
-        begin = datetime.strptime(outage["begin"], '%Y-%m-%dT%H:%M:%S.%fZ') # string to datetime object
-        end = datetime.strptime(outage["end"], '%Y-%m-%dT%H:%M:%S.%fZ')
-        duration = end - begin
-        warnings = check_date_warnings(begin, end) # generate any warnings
-        warning_str = 'WARNING: \n' if len(warnings) > 0 else ''
-        for warning in warnings:
-            warning_str+=warning
-        begin_str = begin.strftime('%Y-%m-%d %H:%M:%S') # format date nicely
-        end_str = end.strftime('%Y-%m-%d %H:%M:%S')
-        table.add_row([outage["name"], begin_str, end_str, str(duration)[:-7], warning_str])
+        table.add_row(list(report_row(outage)))
     table.align = 'l' # align columns left
     table.sortby = 'Device Name'
     return table
 
-def main():
-    with open('./api-key.txt') as f:
-        key = f.read() # get API key from file
+def _text_width(text):
+    """ Return the number of terminal columns 'text' takes up. """
+    if text.isascii():
+        return len(text)
+    return sum(0 if unicodedata.combining(c) else 2 if unicodedata.east_asian_width(c) in 'WF' else 1 for c in text)
+
+def _write_table(rows, out, fields=REPORT_FIELDS):
+    """ Write rows as a left-aligned text table with the same layout as generate_pretty_table(). """
+    widths = [_text_width(field) for field in fields]
+    for row in rows: # single pass to size every column
+        for i, cell in enumerate(row):
+            for line in cell.split('\n'):
+                width = _text_width(line)
+                if width > widths[i]:
+                    widths[i] = width
+    border = '+' + '+'.join('-' * (width + 2) for width in widths) + '+\n'
+
+    def write_row(row):
+        cells = [cell.split('\n') for cell in row]
+        for n in range(max(len(lines) for lines in cells)):
+            out.write('| ' + ' | '.join(
+                line + ' ' * (width - _text_width(line))
+                for line, width in ((lines[n] if n < len(lines) else '', width) for lines, width in zip(cells, widths))) + ' |\n')
+
+    out.write(border)
+    write_row(fields)
+    out.write(border)
+    for row in rows:
+        write_row(row)
+    out.write(border)
+
+def write_report(site_outages, out=None, format='table', rows=None, downtime=False):
+    """ Write a report of site outages, sorted by device name, one row at a time.
+
+    Formats:
+    table -- the table printed by generate_pretty_table(), without building it in memory
+    csv   -- the same columns as CSV, with warnings separated by '; '
+    jsonl -- one JSON object per outage: id, name, begin, end, duration_seconds and warnings
+
+    With 'downtime', each device's outages are also merged where they overlap
+    (see IntervalIndex) and summarised: as a second table, or in 'jsonl' as one
+    object per device with "type": "downtime", id, name, outages (count), merged
+    (list of begin and end) and downtime_seconds.
+
+    Keyword arguments:
+    site_outages -- [list(dict)] list of outages for a site
+    out          -- [file] (Optional) text stream to write to (defaults to sys.stdout)
+    format       -- [str] (Optional) 'table', 'csv' or 'jsonl' (defaults to 'table')
+    rows         -- [list(tuple)] (Optional) report_row() of every site outage, e.g. computed in parallel by
+                    process_site_outages(). Used by the 'table' and 'csv' formats (defaults to None, computed here)
+    downtime     -- [bool] (Optional) add the downtime of each device, 'table' and 'jsonl' only (defaults to False)
+    """
+    if format not in REPORT_FORMATS:
+        raise ValueError(f'Invalid report format \'{format}\'')
+    if downtime and format == 'csv':
+        raise ValueError('A downtime summary is only available in the \'table\' and \'jsonl\' formats')
+    out = out or sys.stdout
+    if format == 'jsonl':
+        for outage in sorted(site_outages, key=lambda outage: (outage["name"], outage["begin"], outage["end"])):
+            begin = parse_timestamp(outage["begin"])
+            end = parse_timestamp(outage["end"])
+            out.write(json.dumps({
+                "id": outage["id"], "name": outage["name"], "begin": outage["begin"], "end": outage["end"],
+                "duration_seconds": (end - begin).total_seconds(),
+                "warnings": [warning.rstrip('\n') for warning in check_date_warnings(begin, end)]
+                }) + '\n')
+        if downtime:
+            for device in IntervalIndex(site_outages).summary():
+                out.write(json.dumps({
+                    "type": "downtime", "id": device["id"], "name": device["name"], "outages": device["outages"],
+                    "merged": [{"begin": _format_timestamp(begin), "end": _format_timestamp(end)} for begin, end in device["merged"]],
+                    "downtime_seconds": device["downtime"].total_seconds()
+                    }) + '\n')
+        return
+    rows = sorted(rows if rows is not None else map(report_row, site_outages)) # sort once, by device name then the other columns
+    if format == 'csv':
+        writer = csv.writer(out)
+        writer.writerow(REPORT_FIELDS[:-1] + ['Warnings'])
+        for name, begin, end, duration, warnings in rows:
+            writer.writerow([name, begin, end, duration, '; '.join(warnings.split('\n')[1:-1])])
+    else:
+        _write_table(rows, out)
+        if downtime:
+            out.write('\n')
+            _write_table([(device["name"], str(device["outages"]), str(len(device["merged"])), format_duration(device["downtime"]))
+                          for device in IntervalIndex(site_outages).summary()], out, DOWNTIME_FIELDS)
+
+def main(site_ids=None, full_resync=False, chunk_size=None, report_format='table', metrics_file=None, processes=None, downtime=False,
+         save_snapshot=None, replay_snapshot=None, watch=None, rate_limit=None, output=None, site_id=SITE_ID, earliest=EARLIEST,
+         api_key_file=API_KEY_FILE, base_url=None):
+    """ Generate and send site outages, then print a report of them.
+
+    The site's outages are only sent, all of them, if any were added, changed or
+    removed since the last successful run.
+    With a 'csv' or 'jsonl' report, status messages (e.g. '200 OK') are printed
+    to stderr, so the report is all that is written to stdout.
+    With 'metrics_file', the time spent in each stage and every request, the
+    retries, bytes and rows are recorded and written to it, even if the run fails.
+
+    Keyword arguments:
+    site_ids        -- [list(str)] (Optional) sites to process in batch mode, see run_batch(). Batch and watch mode do
+                       not use 'processes', 'downtime' or snapshots. Only 'site_id' is processed when not given.
+    full_resync     -- [bool] (Optional) send the outages even if none changed since the last run (defaults to False)
+    chunk_size      -- [int] (Optional) send outages in compressed chunks of this many, see post_site_outages_chunked()
+                       (defaults to None, one request)
+    report_format   -- [str] (Optional) 'table', 'csv' or 'jsonl', see write_report() (defaults to 'table')
+    metrics_file    -- [str] (Optional) path to write metrics to, in the Prometheus text format if it ends in '.prom',
+                       else as JSON, see Metrics (defaults to None, metrics are not recorded)
+    processes       -- [int] (Optional) match outages and compute the report on this many worker processes,
+                       see process_site_outages() (defaults to None, in this process)
+    downtime        -- [bool] (Optional) add each device's merged outages and total downtime to the report,
+                       see write_report() (defaults to False)
+    save_snapshot   -- [str] (Optional) save the outages fetched from 'GET /outages' to this snapshot file,
+                       see snapshot.py (defaults to None)
+    replay_snapshot -- [str] (Optional) read the outages from this snapshot file instead of 'GET /outages',
+                       e.g. one saved by an earlier run with 'save_snapshot' (defaults to None)
+    watch           -- [float] (Optional) keep running, polling for outages every this many seconds and sending them
+                       whenever they change, until SIGINT or SIGTERM, see Watcher. 'site_ids' (or 'site_id') are
+                       watched without a report (defaults to None, run once)
+    rate_limit      -- [float] (Optional) requests per second to start at, adapting to 429 and 503 responses,
+                       shared by every request, see RateLimiter (defaults to None, no limit)
+    output          -- [str] (Optional) write the report to this file (defaults to None, stdout)
+    site_id         -- [str] (Optional) site to process when 'site_ids' is not given (defaults to SITE_ID)
+    earliest        -- [str] (Optional) the earliest date an outage is deemed valid (ISO 8601 form) (defaults to EARLIEST)
+    api_key_file    -- [str] (Optional) file holding the API key (defaults to API_KEY_FILE)
+    base_url        -- [str] (Optional) base URL of the API, e.g. a local mock (defaults to None, BASE_URL)
+    """
+    run = functools.partial(_run, site_ids, site_id, earliest, api_key_file, full_resync, chunk_size, report_format,
+                            processes, downtime, save_snapshot, replay_snapshot, watch, rate_limit, output, base_url)
+    if metrics_file is None:
+        run()
+        return
+    metrics.enabled = True
+    try:
+        with metrics.timer('stage_seconds', stage='total'):
+            run()
+    finally:
+        metrics.write(metrics_file)
+        metrics.reset()
+
+def _run(site_ids, site_id, earliest, api_key_file, full_resync, chunk_size, report_format, processes, downtime,
+         save_snapshot, replay_snapshot, watch, rate_limit, output, base_url):
+    """ Body of main(), see there for the arguments. """
+    with open(api_key_file) as f:
+        key = f.read().strip() # get API key from file, without a trailing newline
     headers = {'x-api-key': key}
+    cache = HTTPCache(CACHE_DIR) # only re-download responses that have changed since the last run
+    sync_state = SyncState(SYNC_STATE_DIR) # what was sent by the last successful run
+    limiter = RateLimiter(rate_limit) if rate_limit else None
+
+    if watch:
+        with Watcher(site_ids or [site_id], headers, earliest, interval=watch, sync_state=sync_state, full_resync=full_resync,
+                     chunk_size=chunk_size, cache=cache, limiter=limiter, base_url=base_url) as watcher:
+            watcher.run()
+        return
+
+    if site_ids:
+        results = run_batch(site_ids, headers, earliest, sync_state=sync_state, full_resync=full_resync, chunk_size=chunk_size, cache=cache,
+                            limiter=limiter, base_url=base_url)
+        if any(result['error'] is not None for result in results.values()):
+            sys.exit(1)
+        return
+
+    status = contextlib.redirect_stdout(sys.stderr) if report_format != 'table' else contextlib.nullcontext() # keep the report parseable
+    with status, make_session() as session: # reuse one connection for every request
+        with metrics.timer('stage_seconds', stage='site_info'):
+            site = make_request('GET', f'site-info/{site_id}', headers, session=session, cache=cache, limiter=limiter,
+                                base_url=base_url) # get site info
+        with metrics.timer('stage_seconds', stage='outages'): # download, decode and match as the outages arrive
+            feed = None
+            if replay_snapshot:
+                feed = snapshot.Snapshot(replay_snapshot) # nothing to download or parse
+            else:
+                outages = make_request('GET', 'outages', headers, stream=True, session=session, cache=cache, limiter=limiter,
+                                       base_url=base_url) # stream all outages
+                if save_snapshot:
+                    snapshot.save_snapshot(outages, save_snapshot)
+                    feed = snapshot.Snapshot(save_snapshot)
+            rows = None
+            if feed is not None:
+                with feed:
+                    metrics.incr('rows_in_total', len(feed))
+                    if processes:
+                        site_outages, rows = process_site_outages(feed, site, earliest, processes=processes)
+                    else:
+                        site_outages = feed.site_outages(site, earliest)
+            elif processes:
+                site_outages, rows = process_site_outages(metrics.counted('rows_in_total', outages), site, earliest, processes=processes)
+            else:
+                site_outages = generate_site_outages(metrics.counted('rows_in_total', outages), site, earliest) # create site outages list (after 2022-01-01) as outages arrive
+        metrics.incr('rows_matched_total', len(site_outages))
 
-    site = make_request('GET', 'site-info/norwich-pear-tree', headers) # get site info
-    outages = make_request('GET', 'outages', headers) # get all outages
+        with metrics.timer('stage_seconds', stage='diff'):
+            checkpoint = None if full_resync else sync_state.load(site_id)
+            changed, checkpoint = diff_site_outages(site_outages, checkpoint) # only send if anything changed since the last run
+        sent = site_outages if changed or full_resync else [] # the whole list, as a POST replaces the site's outages
+        with metrics.timer('stage_seconds', stage='post'):
+            if chunk_size and sent:
+                if post_site_outages_chunked(site_id, sent, headers, chunk_size, session=session, limiter=limiter,
+                                             base_url=base_url)['failed']:
+                    sys.exit(1)
+            elif changed or full_resync:
+                make_request('POST', f'site-outages/{site_id}', headers, sent, session=session, limiter=limiter, base_url=base_url)
+            else:
+                print('No new or changed outages to send')
+        metrics.incr('rows_sent_total', len(sent))
+        sync_state.save(site_id, checkpoint)
+    with metrics.timer('stage_seconds', stage='report'):
+        if output is None:
+            write_report(site_outages, format=report_format, rows=rows, downtime=downtime)
+        else:
+            with open(output, 'w', newline='') as out: # newline='' as the csv module writes its own line endings
+                write_report(site_outages, out, format=report_format, rows=rows, downtime=downtime)
+
+def _earliest(value):
+    """ Check a date given on the command line is in the API's form, e.g. '2022-01-01T00:00:00.000Z'.
+
+    Outages are filtered by comparing their timestamps with it as strings, and
+    snapshots parse it, so anything else would be wrongly compared or fail later.
+
+    Keyword arguments:
+    value -- [str] the date given on the command line
+    """
+    try:
+        if _format_timestamp(parse_timestamp(value)) == value:
+            return value
+    except ValueError:
+        pass
+    raise argparse.ArgumentTypeError(f'\'{value}\' is not a date in the form \'2022-01-01T00:00:00.000Z\'')
 
-    earliest = '2022-01-01T00:00:00.000Z'
-    site_outages = generate_site_outages(outages, site, earliest) # create site outages list (after 2022-01-01)
+def cli(argv=None):
+    """ Run main() from the command line.
 
-    make_request('POST', 'site-outages/norwich-pear-tree', headers, site_outages)
-    print(generate_pretty_table(site_outages))
+    Keyword arguments:
+    argv -- [list(str)] (Optional) command line arguments (defaults to None, sys.argv[1:])
+    """
+    parser = argparse.ArgumentParser(description='Send the outages of a site to the KrakenFlex API and print a report of them.')
+    parser.add_argument('site_ids', nargs='*', metavar='SITE_ID',
+                        help='process these sites in batch mode, without a report, instead of --site')
+    parser.add_argument('--site', default=SITE_ID, help='site to process (default: %(default)s)')
+    parser.add_argument('--earliest', type=_earliest, default=EARLIEST,
+                        help='leave out outages beginning before this date (default: %(default)s)')
+    parser.add_argument('--format', choices=REPORT_FORMATS, default='table', help='report format (default: %(default)s)')
+    parser.add_argument('--output', metavar='FILE', help='write the report to FILE instead of stdout')
+    parser.add_argument('--base-url', default=BASE_URL, help='base URL of the API (default: %(default)s)')
+    parser.add_argument('--api-key-file', default=API_KEY_FILE, help='file holding the API key (default: %(default)s)')
+    parser.add_argument('--full-resync', action='store_true', help='send the outages even if none changed since the last run')
+    parser.add_argument('--chunk-size', type=int,
+                        help='send outages in compressed chunks of this many (the server must reassemble them)')
+    parser.add_argument('--processes', type=int, help='match outages on this many worker processes')
+    parser.add_argument('--downtime', action='store_true', help='add the downtime of each device to the report')
+    parser.add_argument('--watch', type=float, metavar='SECONDS',
+                        help='keep running, polling for outages every SECONDS and sending them whenever they change')
+    parser.add_argument('--rate-limit', type=float, metavar='RATE',
+                        help='start at RATE requests per second, slowing down when the API throttles requests')
+    parser.add_argument('--metrics', metavar='FILE', help='write metrics to FILE (Prometheus text format if it ends in .prom, else JSON)')
+    snapshots = parser.add_mutually_exclusive_group()
+    snapshots.add_argument('--snapshot', metavar='FILE', help='save the fetched outages to a snapshot FILE')
+    snapshots.add_argument('--replay', metavar='FILE', help='read the outages from a snapshot FILE instead of the API')
+    args = parser.parse_args(argv)
+    main(args.site_ids, full_resync=args.full_resync, chunk_size=args.chunk_size, report_format=args.format,
+         metrics_file=args.metrics, processes=args.processes, downtime=args.downtime, save_snapshot=args.snapshot,
+         replay_snapshot=args.replay, watch=args.watch, rate_limit=args.rate_limit, output=args.output, site_id=args.site,
+         earliest=args.earliest, api_key_file=args.api_key_file, base_url=args.base_url)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    cli()
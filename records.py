@@ -0,0 +1,94 @@
+""" Records and helpers shared by outages.py and snapshot.py.
+
+These have no dependencies on the rest of the tree, so both modules can import
+them without importing each other. outages.py re-exports all of them.
+"""
+import functools
+import sys
+from collections.abc import Mapping
+from datetime import datetime
+
+TIMESTAMP_CACHE_SIZE = 4096 # recently parsed timestamps to remember, outage feeds repeat many of them
+
+@functools.lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def parse_timestamp(timestamp):
+    """ Parse an API timestamp, e.g. '2022-01-01T00:00:00.000Z', into a datetime.
+
+    Timestamps in the API's fixed format are parsed with datetime.fromisoformat,
+    which is many times faster than strptime, and the most recent results are
+    memoised. Anything else falls back to strptime (and its errors).
+
+    Keyword arguments:
+    timestamp -- [str] ISO 8601 timestamp in the form 'YYYY-MM-DDTHH:MM:SS.fffZ'
+    """
+    if len(timestamp) == 24 and timestamp[23] == 'Z' and timestamp[10] == 'T' and timestamp[19] == '.':
+        return datetime.fromisoformat(timestamp[:23])
+    return datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%S.%fZ')
+
+class Record(Mapping):
+    """ Base class for compact records that can be used like a dict.
+
+    Fields are stored in __slots__, so a record takes a fraction of the memory
+    of the equivalent dict. Records support record["field"], compare equal to
+    dicts with the same keys and values, and dict(record) converts one back to
+    a plain dict. Records are not dicts, so json cannot encode them directly:
+    use to_payload() or json.dumps(records, default=dict). make_request() does
+    this for POST payloads.
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if key in self.__slots__:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({", ".join(f"{field}={getattr(self, field)!r}" for field in self.__slots__)})'
+
+    def __reduce__(self): # pickle as a plain tuple of values
+        return type(self), tuple(getattr(self, field) for field in self.__slots__)
+
+class Outage(Record):
+    """ An outage from 'GET /outages', for when a feed has to be held in memory. """
+    __slots__ = ('id', 'begin', 'end')
+
+    def __init__(self, id, begin, end):
+        self.id = id
+        self.begin = begin
+        self.end = end
+
+class SiteOutage(Record):
+    """ An outage joined to a site's device, in the form sent to 'POST /site-outages/{siteId}'. """
+    __slots__ = ('id', 'name', 'begin', 'end')
+
+    def __init__(self, id, name, begin, end):
+        self.id = id
+        self.name = name
+        self.begin = begin
+        self.end = end
+
+def to_payload(site_outages):
+    """ Convert site outages (records or dicts) into a JSON-serialisable list of dicts. """
+    return [dict(outage) for outage in site_outages]
+
+def build_device_index(site):
+    """ Build a lookup of device ID -> tuple of device names for a site.
+
+    The index only needs to be built once per site and can be passed to
+    generate_site_outages() on every call, turning the device join into a
+    single dict lookup per outage. A site that lists a device ID more than once
+    gets one site outage per listing, in the order the devices are listed.
+
+    Keyword arguments:
+    site -- site information from 'GET /site-info/{siteId}'
+    """
+    device_index = {}
+    for device in site["devices"]:
+        device_index[device["id"]] = device_index.get(device["id"], ()) + (sys.intern(device["name"]),) # share one copy of each name
+    return device_index
@@ -0,0 +1,45 @@
+""" Fakes shared by the tests: a mock requests response and a clock that only moves when slept on. """
+import json
+from unittest.mock import MagicMock
+from outages import RetryPolicy
+
+def mock_response(status_code, data=None, body=b'', headers=None):
+    """ Build a mock requests response.
+
+    Keyword arguments:
+    status_code -- [int] HTTP status code, e.g. 200
+    data        -- (Optional) decoded JSON returned by response.json() (defaults to None, 'body' decoded if there is one)
+    body        -- [bytes] (Optional) raw body, streamed by response.iter_content() 4 bytes at a time (defaults to b'')
+    headers     -- [dict] (Optional) response headers (defaults to None, no headers)
+    """
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.content = body
+    if data is None and body:
+        response.json.side_effect = lambda: json.loads(body)
+    else:
+        response.json.return_value = data
+    response.iter_content.side_effect = lambda chunk_size=None: iter([body[i:i+4] for i in range(0, len(body), 4)])
+    return response
+
+class FakeClock:
+    """ A clock that only moves forward when sleep() is called, so retries and waits happen instantly.
+
+    Call it for the current time. Every sleep is recorded in 'sleeps', rounded to
+    the microsecond.
+    """
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 6))
+        self.now += seconds
+
+    def policy(self, **kwargs):
+        """ Return a RetryPolicy without jitter that runs on this clock. """
+        return RetryPolicy(clock=self, sleep=self.sleep, random=lambda: 1.0, **kwargs)
@@ -0,0 +1,61 @@
+import unittest
+import asyncio
+from outages import AsyncClient
+from unittest.mock import patch, MagicMock
+import sys
+import io
+
+class TestAsyncClient(unittest.IsolatedAsyncioTestCase):
+    """ This class contains tests for the AsyncClient class
+        in outages.py, which makes concurrent requests over pooled connections.
+    """
+    def setUp(self):
+        self.capturedOutput = io.StringIO()
+        sys.stdout = self.capturedOutput
+
+    def tearDown(self):
+        sys.stdout = sys.__stdout__
+
+    @patch('outages.requests')
+    async def test_concurrent_requests(self, mock_request):
+        """ Given the server returns status code 200 to several concurrent GET and POST requests
+            Then every request is sent through the same pooled session
+            And each request returns its own result
+        """
+        def get(url, **kwargs):
+            response = MagicMock()
+            response.status_code = 200
+            response.json.return_value = {'id': url.rsplit('/', 1)[1]}
+            return response
+        post_response = MagicMock()
+        post_response.status_code = 200
+        session = mock_request.Session.return_value
+        session.get.side_effect = get
+        session.post.return_value = post_response
+
+        async with AsyncClient({'key': 'val'}, max_connections=4) as client:
+            results = await asyncio.gather(
+                *(client.make_request('GET', f'site-info/site-{i}') for i in range(8)),
+                client.make_request('POST', 'site-outages/site-0', [{'id': '123'}]))
+
+        self.assertEqual(results[:8], [{'id': f'site-{i}'} for i in range(8)])
+        self.assertEqual(results[8], 200)
+        mock_request.Session.assert_called_once()
+        self.assertEqual(session.get.call_count, 8)
+        session.post.assert_called_once()
+        session.close.assert_called_once()
+
+    @patch('outages.requests')
+    async def test_client_error(self, mock_request):
+        """ Given the server returns status code 403 after a GET request
+            Then awaiting the request raises SystemExit, as make_request exits
+            And a 'Error (403: Forbidden)' message is printed
+        """
+        response = MagicMock()
+        response.status_code = 403
+        mock_request.Session.return_value.get.return_value = response
+
+        async with AsyncClient({'key': 'val'}) as client:
+            with self.assertRaises(SystemExit):
+                await client.make_request('GET', 'outages')
+        self.assertEqual('Error (403: Forbidden)\n', self.capturedOutput.getvalue())
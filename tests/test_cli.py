@@ -0,0 +1,165 @@
+import unittest
+import os
+import subprocess
+import sys
+import io
+import json
+import tempfile
+import outages
+from outages import cli, SITE_ID, EARLIEST, API_KEY_FILE, BASE_URL
+from unittest.mock import patch, MagicMock
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STARTUP_BUDGET = 0.05 # seconds 'import outages' may take, as measured by -X importtime
+CHECK_STARTUP = os.environ.get('CHECK_STARTUP_BUDGET') == '1' # timing is only reliable on an idle machine
+
+def run_python(code, *options, env=None):
+    """ Run 'code' in a new interpreter from the repository root and return it. """
+    return subprocess.run([sys.executable, *options, '-c', code], cwd=REPOSITORY, env=env, capture_output=True, text=True, check=True)
+
+class TestCli(unittest.TestCase):
+    """ This class contains tests for the cli function in outages.py,
+        and for how quickly outages.py starts up.
+    """
+    @patch('outages.main')
+    def test_defaults(self, mock_main):
+        """ Given no arguments
+            Then main is run for the default site, date, API and report format
+        """
+        cli([])
+        mock_main.assert_called_once_with(
+            [], full_resync=False, chunk_size=None, report_format='table', metrics_file=None, processes=None,
+            downtime=False, save_snapshot=None, replay_snapshot=None, watch=None, rate_limit=None, output=None, site_id=SITE_ID,
+            earliest=EARLIEST, api_key_file=API_KEY_FILE, base_url=BASE_URL)
+
+    @patch('outages.main')
+    def test_arguments(self, mock_main):
+        """ Given every option
+            Then each is passed on to main
+        """
+        cli(['--site', 'kingfisher', '--earliest', '2023-01-01T00:00:00.000Z', '--format', 'jsonl',
+             '--base-url', 'http://127.0.0.1:8000/v1', '--api-key-file', 'key.txt', '--full-resync', '--chunk-size', '500',
+             '--processes', '4', '--downtime', '--watch', '30', '--rate-limit', '20', '--output', 'report.jsonl', '--metrics', 'metrics.prom',
+             '--replay', 'outages.snap'])
+        mock_main.assert_called_once_with(
+            [], full_resync=True, chunk_size=500, report_format='jsonl', metrics_file='metrics.prom', processes=4,
+            downtime=True, save_snapshot=None, replay_snapshot='outages.snap', watch=30, rate_limit=20, output='report.jsonl', site_id='kingfisher',
+            earliest='2023-01-01T00:00:00.000Z', api_key_file='key.txt', base_url='http://127.0.0.1:8000/v1')
+
+    @patch('outages.main')
+    def test_batch(self, mock_main):
+        """ Given site IDs
+            Then main is run for them in batch mode
+        """
+        cli(['norwich-pear-tree', 'kingfisher', '--metrics=metrics.json'])
+        self.assertEqual(mock_main.call_args.args, (['norwich-pear-tree', 'kingfisher'],))
+        self.assertEqual(mock_main.call_args.kwargs['metrics_file'], 'metrics.json')
+
+    def run_cli(self, mock_request, *argv):
+        """ Run cli() for each list of arguments against a fake API with one site and outage.
+
+        Returns (stdout, stderr, the URLs requested).
+        """
+        site = {'id': SITE_ID, 'name': 'Norwich Pear Tree', 'devices': [{'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'name': 'Battery 1'}]}
+        feed = [{'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'begin': '2022-05-23T12:21:27.377Z', 'end': '2022-11-13T02:16:38.905Z'}]
+
+        def get(url, **kwargs):
+            response = MagicMock()
+            response.status_code = 200
+            response.headers = {}
+            response.content = json.dumps(site).encode()
+            response.json.return_value = site
+            response.iter_content.return_value = iter([json.dumps(feed).encode()])
+            return response
+        session = mock_request.Session.return_value.__enter__.return_value # used as a context manager
+        session.get.side_effect = get
+        session.post.return_value.status_code = 200
+        with tempfile.TemporaryDirectory() as directory:
+            key_file = os.path.join(directory, 'api-key.txt')
+            with open(key_file, 'w') as f:
+                f.write('key')
+            with patch('outages.CACHE_DIR', os.path.join(directory, 'cache')), patch('outages.SYNC_STATE_DIR', os.path.join(directory, 'state')), \
+                 patch('sys.stdout', new=io.StringIO()) as stdout, patch('sys.stderr', new=io.StringIO()) as stderr:
+                for args in argv:
+                    cli(args + ['--api-key-file', key_file, '--full-resync'])
+        urls = [c.args[0] for c in session.get.call_args_list + session.post.call_args_list]
+        return stdout.getvalue(), stderr.getvalue(), urls
+
+    @patch('outages.requests')
+    def test_report_output(self, mock_request):
+        """ Given a JSON lines report is written to stdout, and then to a file with --output
+            Then stdout holds only the report, with status messages such as '200 OK' on stderr
+            And the file holds the same report
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            report_file = os.path.join(directory, 'report.jsonl')
+            stdout, stderr, _ = self.run_cli(mock_request, ['--format', 'jsonl'], ['--format', 'jsonl', '--output', report_file])
+            with open(report_file) as f:
+                written = f.read()
+        self.assertEqual([json.loads(line)['name'] for line in stdout.splitlines()], ['Battery 1'])
+        self.assertEqual(written, stdout)
+        self.assertIn('200 OK', stderr)
+
+    @patch('outages.requests')
+    def test_base_url(self, mock_request):
+        """ Given a run with --base-url, then a run without it
+            Then only the first run's requests go to that URL, and BASE_URL is left unchanged
+        """
+        _, _, urls = self.run_cli(mock_request, ['--base-url', 'http://127.0.0.1:8000/v1', '--format', 'csv'])
+        self.assertEqual(len(urls), 3)
+        self.assertTrue(all(url.startswith('http://127.0.0.1:8000/v1/') for url in urls))
+        mock_request.reset_mock()
+        _, _, urls = self.run_cli(mock_request, ['--format', 'csv'])
+        self.assertTrue(all(url.startswith(BASE_URL + '/') for url in urls))
+        self.assertEqual(outages.BASE_URL, BASE_URL)
+
+    @patch('sys.stderr')
+    def test_invalid_format(self, mock_stderr):
+        """ Given an unknown report format
+            Then the usage is printed and the interpreter exits
+        """
+        with self.assertRaises(SystemExit):
+            cli(['--format', 'xml'])
+
+    @patch('sys.stderr')
+    def test_invalid_earliest(self, mock_stderr):
+        """ Given an earliest date that is not in the API's form
+            Then the usage is printed and the interpreter exits, before anything is run
+        """
+        for earliest in ['2022-01-01', '2022-01-01T00:00:00.5Z', 'yesterday']:
+            with self.assertRaises(SystemExit), patch('outages.main') as mock_main:
+                cli(['--earliest', earliest])
+            mock_main.assert_not_called()
+
+    def test_lazy_imports(self):
+        """ Given outages.py is imported, its help is printed and a JSON lines report is written
+            Then requests, prettytable and asyncio are never imported
+        """
+        code = (
+            "import io, sys, outages\n"
+            "try:\n"
+            "    outages.cli(['--help'])\n"
+            "except SystemExit:\n"
+            "    pass\n"
+            "outages.write_report([{'id': 'a', 'name': 'A', 'begin': '2022-01-01T00:00:00.000Z', 'end': '2022-01-02T00:00:00.000Z'}], io.StringIO(), 'jsonl')\n"
+            "print('imported:', *(name for name in sys.modules if name.startswith(('requests.', 'urllib3', 'prettytable.', 'asyncio.'))))\n")
+        self.assertEqual(run_python(code).stdout.splitlines()[-1], 'imported:')
+
+    @unittest.skipUnless(CHECK_STARTUP, 'set CHECK_STARTUP_BUDGET=1 to check the start-up time')
+    def test_startup_budget(self):
+        """ Given compiled bytecode is cached
+            Then importing outages takes less than STARTUP_BUDGET, as measured by -X importtime
+        """
+        with tempfile.TemporaryDirectory() as pycache:
+            env = {**os.environ, 'PYTHONPYCACHEPREFIX': pycache}
+            env.pop('PYTHONDONTWRITEBYTECODE', None)
+            run_python('import outages', env=env) # compile once
+            best = min(self.import_seconds(run_python('import outages', '-X', 'importtime', env=env).stderr) for _ in range(3))
+        self.assertLess(best, STARTUP_BUDGET)
+
+    def import_seconds(self, importtime):
+        """ Return the cumulative seconds spent importing outages from -X importtime output. """
+        for line in importtime.splitlines():
+            if line.endswith('| outages'):
+                return int(line.split('|')[1]) / 1e6
+        self.fail('outages was not imported')
@@ -0,0 +1,80 @@
+import unittest
+from datetime import datetime
+from outages import build_device_index, generate_site_outages, check_date_warnings, SiteOutage
+from unittest.mock import patch
+
+try:
+    from columnar import OutageColumns
+except ImportError: # NumPy is optional
+    OutageColumns = None
+
+@unittest.skipIf(OutageColumns is None, 'NumPy is not installed')
+class TestOutageColumns(unittest.TestCase):
+    """ This class contains tests for the OutageColumns class in columnar.py,
+        which computes site outages, durations and warnings a column at a time.
+    """
+    now = datetime(2023, 2, 1)
+    mock_outages = [
+        {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'begin': '2022-01-01T00:00:00.000Z', 'end': '2022-09-15T19:45:10.341Z'}, # OK
+        {'id': '09e77920-ca66-4263-8a15-9409210ff858', 'begin': '2021-06-01T18:01:58.920Z', 'end': '2021-09-21T20:02:45.438Z'}, # began too early
+        {'id': '0817cd44-b3ed-4790-8ce4-5b477ea86402', 'begin': '2022-12-04T07:25:45.750Z', 'end': '2022-12-25T16:11:32.270Z'}, # not this site
+        {'id': '86b5c819-6a6c-4978-8c51-a2d810bb9318', 'begin': '2022-05-09T04:47:25.211Z', 'end': '2022-05-02T18:37:16.039Z'}, # negative duration
+        {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'begin': '2023-01-30T00:00:00.001Z', 'end': '2023-03-01T00:00:00.000Z'}, # future end
+        {'id': '86b5c819-6a6c-4978-8c51-a2d810bb9318', 'begin': '2023-04-01T00:00:00.000Z', 'end': '2023-03-01T00:00:00.000Z'}  # all warnings
+    ]
+    mock_site_info = {
+        'id': 'norwich-pear-tree', 'name': 'Norwich Pear Tree', 'devices': [
+            {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'name': 'Battery 1'},
+            {'id': '86b5c819-6a6c-4978-8c51-a2d810bb9318', 'name': 'Battery 2'}
+        ]
+    }
+
+    def setUp(self):
+        self.site = OutageColumns.from_outages(self.mock_outages).join(build_device_index(self.mock_site_info), '2022-01-01T00:00:00.000Z')
+        self.expected = generate_site_outages(self.mock_outages, self.mock_site_info, '2022-01-01T00:00:00.000Z')
+
+    def parse(self, timestamp):
+        return datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%S.%fZ')
+
+    def test_join(self):
+        """ Given outages with a mix of valid, too early and other-site outages
+            Then the joined columns match generate_site_outages exactly
+        """
+        self.assertEqual(len(self.site), 4)
+        self.assertEqual(self.site.to_site_outages(), self.expected)
+        self.assertTrue(all(isinstance(outage, SiteOutage) for outage in self.site.to_site_outages()))
+
+    def test_durations(self):
+        """ Given the joined site outages
+            Then each duration equals end - begin, including negative durations
+        """
+        self.assertEqual(
+            [duration.item() for duration in self.site.durations()],
+            [self.parse(o['end']) - self.parse(o['begin']) for o in self.expected])
+
+    def test_warnings(self):
+        """ Given the joined site outages
+            Then each outage's warnings match check_date_warnings
+        """
+        with patch('outages.datetime') as mock_datetime:
+            mock_datetime.now.return_value = self.now
+            expected = [check_date_warnings(self.parse(o['begin']), self.parse(o['end'])) for o in self.expected]
+        self.assertEqual(self.site.warning_lists(self.now), expected)
+        self.assertEqual(self.site.warnings(self.now)['future_end'].tolist(), [False, False, True, True])
+
+    def test_duplicate_device(self):
+        """ Given a site that lists the same device ID twice
+            Then the joined columns still match generate_site_outages exactly
+        """
+        site_info = {'id': 'norwich-pear-tree', 'devices': self.mock_site_info['devices'] + [
+            {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'name': 'Battery 1 (spare)'}]}
+        site = OutageColumns.from_outages(self.mock_outages).join(build_device_index(site_info), '2022-01-01T00:00:00.000Z')
+        self.assertEqual(site.to_site_outages(), generate_site_outages(self.mock_outages, site_info, '2022-01-01T00:00:00.000Z'))
+
+    def test_no_outages(self):
+        """ Given no outages
+            Then no site outages are returned
+        """
+        site = OutageColumns.from_outages([]).join(build_device_index(self.mock_site_info), '2022-01-01T00:00:00.000Z')
+        self.assertEqual(site.to_site_outages(), [])
+        self.assertEqual(site.warning_lists(self.now), [])
@@ -0,0 +1,68 @@
+import unittest
+import tempfile
+from outages import diff_site_outages, SyncState
+
+class TestDiffSiteOutages(unittest.TestCase):
+    """ This class contains tests for the diff_site_outages function and SyncState
+        class in outages.py, which find whether a site's outages were added, changed
+        or removed since the last successful send.
+    """
+    mock_site_outages = [
+        {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'name': 'Battery 1', 'begin': '2022-01-01T00:00:00.000Z', 'end': '2022-09-15T19:45:10.341Z'},
+        {'id': '86b5c819-6a6c-4978-8c51-a2d810bb9318', 'name': 'Battery 2', 'begin': '2022-05-09T04:47:25.211Z', 'end': '2022-12-02T18:37:16.039Z'},
+        {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'name': 'Battery 1', 'begin': '2022-02-01T00:00:00.000Z', 'end': '2022-02-15T19:45:10.341Z'}
+    ]
+
+    def test_no_checkpoint(self):
+        """ Given no checkpoint
+            Then every outage ID has changed
+        """
+        changed, checkpoint = diff_site_outages(self.mock_site_outages)
+        self.assertEqual(changed, ['111183e7-fb90-436b-9951-63392b36bdd2', '86b5c819-6a6c-4978-8c51-a2d810bb9318'])
+        self.assertEqual(len(checkpoint['digests']), 2)
+
+    def test_unchanged(self):
+        """ Given the same outages as the checkpoint, in a different order
+            Then nothing has changed
+        """
+        _, checkpoint = diff_site_outages(self.mock_site_outages)
+        changed, new_checkpoint = diff_site_outages(list(reversed(self.mock_site_outages)), checkpoint)
+        self.assertEqual(changed, [])
+        self.assertEqual(new_checkpoint, checkpoint)
+
+    def test_changed_and_new(self):
+        """ Given an outage whose end date has changed
+            And a new outage for a device with no previous outages
+            Then both IDs have changed, and the ID of the unchanged device has not
+        """
+        _, checkpoint = diff_site_outages(self.mock_site_outages[:2])
+        new_outage = {'id': '0817cd44-b3ed-4790-8ce4-5b477ea86402', 'name': 'Battery 3', 'begin': '2022-12-04T07:25:45.750Z', 'end': '2022-12-25T16:11:32.270Z'}
+        updated = dict(self.mock_site_outages[0], end='2022-09-16T00:00:00.000Z')
+        changed, checkpoint = diff_site_outages([updated, self.mock_site_outages[1], new_outage], checkpoint)
+        self.assertEqual(changed, ['0817cd44-b3ed-4790-8ce4-5b477ea86402', '111183e7-fb90-436b-9951-63392b36bdd2'])
+        self.assertEqual(len(checkpoint['digests']), 3)
+
+    def test_removed(self):
+        """ Given every outage of one ID has disappeared since the checkpoint
+            And nothing else has changed
+            Then that ID has changed
+            And once every outage has gone, every ID has changed
+        """
+        _, checkpoint = diff_site_outages(self.mock_site_outages)
+        changed, checkpoint = diff_site_outages([self.mock_site_outages[1]], checkpoint)
+        self.assertEqual(changed, ['111183e7-fb90-436b-9951-63392b36bdd2'])
+        self.assertEqual(list(checkpoint['digests']), ['86b5c819-6a6c-4978-8c51-a2d810bb9318'])
+        changed, _ = diff_site_outages([], checkpoint)
+        self.assertEqual(changed, ['86b5c819-6a6c-4978-8c51-a2d810bb9318'])
+
+    def test_sync_state_round_trip(self):
+        """ Given a checkpoint saved for a site
+            Then loading it returns the same checkpoint
+            And loading a site with no checkpoint returns an empty checkpoint
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            sync_state = SyncState(directory)
+            _, checkpoint = diff_site_outages(self.mock_site_outages)
+            sync_state.save('norwich-pear-tree', checkpoint)
+            self.assertEqual(sync_state.load('norwich-pear-tree'), checkpoint)
+            self.assertEqual(sync_state.load('kingfisher'), {'digests': {}})
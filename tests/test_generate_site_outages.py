@@ -1,5 +1,5 @@
 import unittest
-from outages import generate_site_outages
+from outages import generate_site_outages, build_device_index
 
 class TestGenerateSiteOutages(unittest.TestCase):
     """ This class contains tests for the generate_site_outages function
@@ -126,4 +126,57 @@ class TestGenerateSiteOutages(unittest.TestCase):
                 {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'name': 'Battery 1'}
             ]
         }
-        self.assertEqual(generate_site_outages(mock_outages, mock_site_info, '2022-01-01T00:00:00.000Z'), [])
\ No newline at end of file
+        self.assertEqual(generate_site_outages(mock_outages, mock_site_info, '2022-01-01T00:00:00.000Z'), [])
+
+    def test_site_outages_prebuilt_device_index(self):
+        """ Given a device index built once with build_device_index
+            And a list of outages in a mixed order
+
+            Then the function 'generate_site_outages' should return the same data
+            as without the index, in the order the outages were received
+        """
+        mock_outages = [
+            {"id": "86b5c819-6a6c-4978-8c51-a2d810bb9318", "begin": "2022-05-09T04:47:25.211Z", "end": "2022-12-02T18:37:16.039Z"}, # OK
+            {'id': '0817cd44-b3ed-4790-8ce4-5b477ea86402', 'begin': '2022-12-04T07:25:45.750Z', 'end': '2022-12-25T16:11:32.270Z'}, # not this site
+            {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'begin': '2022-01-01T00:00:00.000Z', 'end': '2022-09-15T19:45:10.341Z'}  # OK
+        ]
+        mock_site_info = {
+            'id': 'norwich-pear-tree', 'name': 'Norwich Pear Tree', 'devices': [
+                {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'name': 'Battery 1'},
+                {"id": "86b5c819-6a6c-4978-8c51-a2d810bb9318", "name": "Battery 2"}
+            ]
+        }
+        device_index = build_device_index(mock_site_info)
+        self.assertEqual(device_index, {
+            '111183e7-fb90-436b-9951-63392b36bdd2': ('Battery 1',),
+            '86b5c819-6a6c-4978-8c51-a2d810bb9318': ('Battery 2',)
+        })
+        self.assertEqual(
+            generate_site_outages(mock_outages, mock_site_info, '2022-01-01T00:00:00.000Z', device_index),
+            [{'id': '86b5c819-6a6c-4978-8c51-a2d810bb9318', 'name': 'Battery 2', 'begin': '2022-05-09T04:47:25.211Z', 'end': '2022-12-02T18:37:16.039Z'},
+             {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'name': 'Battery 1', 'begin': '2022-01-01T00:00:00.000Z', 'end': '2022-09-15T19:45:10.341Z'}]
+        )
+        self.assertEqual(
+            generate_site_outages(mock_outages, mock_site_info, '2022-01-01T00:00:00.000Z', device_index),
+            generate_site_outages(mock_outages, mock_site_info, '2022-01-01T00:00:00.000Z')
+        )
+
+    def test_site_outages_duplicate_device(self):
+        """ Given a site that lists the same device ID twice, under different names
+
+            Then the function 'generate_site_outages' should return one site outage
+            per listing, in the order the devices are listed
+        """
+        mock_outages = [
+            {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'begin': '2022-01-01T00:00:00.000Z', 'end': '2022-09-15T19:45:10.341Z'}
+        ]
+        mock_site_info = {
+            'id': 'norwich-pear-tree', 'name': 'Norwich Pear Tree', 'devices': [
+                {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'name': 'Battery 1'},
+                {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'name': 'Battery 1 (spare)'}
+            ]
+        }
+        self.assertEqual(generate_site_outages(mock_outages, mock_site_info, '2022-01-01T00:00:00.000Z'), [
+            {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'name': 'Battery 1', 'begin': '2022-01-01T00:00:00.000Z', 'end': '2022-09-15T19:45:10.341Z'},
+            {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'name': 'Battery 1 (spare)', 'begin': '2022-01-01T00:00:00.000Z', 'end': '2022-09-15T19:45:10.341Z'}
+        ])
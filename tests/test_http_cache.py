@@ -0,0 +1,118 @@
+import unittest
+import json
+import os
+import tempfile
+from outages import make_request, HTTPCache
+from unittest.mock import patch
+import sys
+import io
+from tests.helpers import mock_response
+
+class TestHTTPCache(unittest.TestCase):
+    """ This class contains tests for the HTTPCache class in outages.py,
+        which stores GET responses on disk and revalidates them with conditional requests.
+    """
+    body = json.dumps([{'id': '123', 'begin': '2022-01-01T00:00:00.000Z', 'end': '2022-01-02T00:00:00.000Z'}]).encode()
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.now = 1000.0
+        self.cache = HTTPCache(self.tmp.name, ttl=60, max_bytes=1024, clock=lambda: self.now)
+        self.capturedOutput = io.StringIO()
+        sys.stdout = self.capturedOutput
+
+    def tearDown(self):
+        sys.stdout = sys.__stdout__
+        self.tmp.cleanup()
+
+    @patch('outages.requests')
+    def test_not_modified(self, mock_request):
+        """ Given a GET response with an ETag has been cached
+            And the server returns status code 304 to the next request
+            Then the next request sends 'If-None-Match' with the ETag
+            And the cached data is returned
+        """
+        mock_request.get.return_value = mock_response(200, body=self.body, headers={'ETag': '"v1"'})
+        first = make_request('GET', 'outages', {'key': 'val'}, cache=self.cache)
+
+        mock_request.get.return_value = mock_response(304)
+        second = make_request('GET', 'outages', {'key': 'val'}, cache=self.cache)
+
+        self.assertEqual(second, first)
+        self.assertEqual(mock_request.get.call_args.kwargs['headers'], {'key': 'val', 'If-None-Match': '"v1"'})
+        self.assertEqual('200 OK\n304 Not Modified\n', self.capturedOutput.getvalue())
+
+    @patch('outages.requests')
+    def test_not_modified_stream(self, mock_request):
+        """ Given a streamed GET response with a Last-Modified date has been cached
+            And the server returns status code 304 to the next streamed request
+            Then the next request sends 'If-Modified-Since' with the date
+            And the cached data is streamed
+        """
+        mock_request.get.return_value = mock_response(200, body=self.body, headers={'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+        first = list(make_request('GET', 'outages', {}, stream=True, cache=self.cache))
+
+        mock_request.get.return_value = mock_response(304)
+        second = list(make_request('GET', 'outages', {}, stream=True, cache=self.cache))
+
+        self.assertEqual(second, first)
+        self.assertEqual(mock_request.get.call_args.kwargs['headers'], {'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+
+    @patch('outages.requests')
+    def test_modified(self, mock_request):
+        """ Given a GET response has been cached
+            And the server returns status code 200 with new data to the next request
+            Then the new data is returned and replaces the cached data
+        """
+        mock_request.get.return_value = mock_response(200, body=b'[1]', headers={'ETag': '"v1"'})
+        make_request('GET', 'outages', {}, cache=self.cache)
+        mock_request.get.return_value = mock_response(200, body=b'[2]', headers={'ETag': '"v2"'})
+        self.assertEqual(make_request('GET', 'outages', {}, cache=self.cache), [2])
+        self.assertEqual(self.cache.lookup(mock_request.get.call_args.args[0])['etag'], '"v2"')
+
+    @patch('outages.requests')
+    def test_no_validators(self, mock_request):
+        """ Given a GET response with neither an ETag nor a Last-Modified date
+            Then it is not cached
+        """
+        mock_request.get.return_value = mock_response(200, body=self.body)
+        make_request('GET', 'outages', {}, cache=self.cache)
+        self.assertIsNone(self.cache.lookup(mock_request.get.call_args.args[0]))
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    @patch('outages.requests')
+    def test_interrupted_stream(self, mock_request):
+        """ Given a streamed GET response that is not read to the end
+            Then it is not cached
+        """
+        mock_request.get.return_value = mock_response(200, body=self.body, headers={'ETag': '"v1"'})
+        outages = make_request('GET', 'outages', {}, stream=True, cache=self.cache)
+        next(iter(outages), None)
+        outages.close()
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    @patch('outages.requests')
+    def test_ttl_eviction(self, mock_request):
+        """ Given a cached GET response that has not been revalidated for longer than the TTL
+            Then it is evicted and the next request is not conditional
+        """
+        mock_request.get.return_value = mock_response(200, body=self.body, headers={'ETag': '"v1"'})
+        make_request('GET', 'outages', {}, cache=self.cache)
+        self.now += 61
+        make_request('GET', 'outages', {}, cache=self.cache)
+        self.assertEqual(mock_request.get.call_args.kwargs['headers'], {})
+
+    @patch('outages.requests')
+    def test_size_eviction(self, mock_request):
+        """ Given cached responses larger in total than the cache's maximum size
+            Then the least recently revalidated responses are evicted first
+        """
+        body = b'[' + b' ' * 500 + b'1]'
+        mock_request.get.return_value = mock_response(200, body=body, headers={'ETag': '"v1"'})
+        for endpoint in ('site-info/a', 'site-info/b', 'site-info/c'):
+            make_request('GET', endpoint, {}, cache=self.cache)
+            self.now += 1
+        urls = [c.args[0] for c in mock_request.get.call_args_list]
+        self.assertIsNone(self.cache.lookup(urls[0]))
+        self.assertIsNotNone(self.cache.lookup(urls[1]))
+        self.assertIsNotNone(self.cache.lookup(urls[2]))
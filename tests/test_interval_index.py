@@ -0,0 +1,86 @@
+import unittest
+from datetime import datetime, timedelta
+from outages import IntervalIndex
+
+class TestIntervalIndex(unittest.TestCase):
+    """ This class contains tests for the IntervalIndex class in outages.py,
+        which answers point-in-time, range and downtime queries over site outages.
+    """
+    mock_site_outages = [
+        {'id': 'battery-1', 'name': 'Battery 1', 'begin': '2022-01-01T00:00:00.000Z', 'end': '2022-01-01T06:00:00.000Z'},
+        {'id': 'battery-1', 'name': 'Battery 1', 'begin': '2022-01-01T04:00:00.000Z', 'end': '2022-01-01T08:00:00.000Z'}, # overlaps
+        {'id': 'battery-1', 'name': 'Battery 1', 'begin': '2022-01-01T08:00:00.000Z', 'end': '2022-01-01T09:00:00.000Z'}, # touches
+        {'id': 'battery-1', 'name': 'Battery 1', 'begin': '2022-01-03T00:00:00.000Z', 'end': '2022-01-03T01:00:00.000Z'},
+        {'id': 'battery-1', 'name': 'Battery 1', 'begin': '2022-01-01T01:00:00.000Z', 'end': '2022-01-01T02:00:00.000Z'}, # inside
+        {'id': 'battery-2', 'name': 'Battery 2', 'begin': '2022-01-02T00:00:00.000Z', 'end': '2022-01-02T12:00:00.000Z'},
+        {'id': 'aardvark', 'name': 'Aardvark', 'begin': '2022-01-01T05:00:00.000Z', 'end': '2022-01-01T04:00:00.000Z'}  # negative duration
+    ]
+
+    def setUp(self):
+        self.index = IntervalIndex(self.mock_site_outages)
+
+    def test_merged(self):
+        """ Given overlapping, touching, nested and out of order outages for a device
+            Then they are merged into sorted, non-overlapping intervals
+        """
+        self.assertEqual(self.index.merged('battery-1'), [
+            (datetime(2022, 1, 1, 0), datetime(2022, 1, 1, 9)),
+            (datetime(2022, 1, 3, 0), datetime(2022, 1, 3, 1))
+        ])
+        self.assertEqual(self.index.merged('aardvark'), []) # negative durations are not indexed
+        self.assertEqual(self.index.merged('unknown'), [])
+
+    def test_point_queries(self):
+        """ Given instants inside, at the edges of and between outages
+            Then a device is down from the begin of an outage up to (not including) its end
+        """
+        self.assertEqual(self.index.down_at('2022-01-01T08:30:00.000Z'), ['battery-1'])
+        self.assertEqual(self.index.down_at(datetime(2022, 1, 2, 0)), ['battery-2'])
+        self.assertEqual(self.index.down_at(datetime(2022, 1, 1, 9)), [])
+        self.assertEqual(self.index.down_at(datetime(2021, 12, 31)), [])
+        self.assertTrue(self.index.is_down('battery-1', datetime(2022, 1, 1, 0)))
+        self.assertFalse(self.index.is_down('aardvark', datetime(2022, 1, 1, 4, 30)))
+
+    def test_range_queries(self):
+        """ Given a time range
+            Then the merged outages overlapping it are returned per device, clipped to the range
+        """
+        self.assertEqual(self.index.overlapping('2022-01-01T08:00:00.000Z', '2022-01-02T06:00:00.000Z'), {
+            'battery-1': [(datetime(2022, 1, 1, 8), datetime(2022, 1, 1, 9))],
+            'battery-2': [(datetime(2022, 1, 2, 0), datetime(2022, 1, 2, 6))]
+        })
+        self.assertEqual(self.index.overlapping(datetime(2022, 1, 1, 9), datetime(2022, 1, 2)), {})
+
+    def test_downtime(self):
+        """ Given a device's outages, with or without a time range
+            Then its downtime counts overlapping outages once, clipped to the range
+        """
+        self.assertEqual(self.index.downtime('battery-1'), timedelta(hours=10))
+        self.assertEqual(self.index.downtime('battery-1', datetime(2022, 1, 1, 3), datetime(2022, 1, 3, 0, 30)), timedelta(hours=6, minutes=30))
+        self.assertEqual(self.index.downtime('battery-1', end=datetime(2022, 1, 1, 1)), timedelta(hours=1))
+        self.assertEqual(self.index.downtime('battery-1', datetime(2022, 1, 2), datetime(2022, 1, 2, 12)), timedelta(0))
+        self.assertEqual(self.index.downtime('aardvark'), timedelta(0))
+
+    def test_summary(self):
+        """ Given site outages
+            Then a summary per device is returned, sorted by device name
+        """
+        summary = self.index.summary()
+        self.assertEqual([device['name'] for device in summary], ['Aardvark', 'Battery 1', 'Battery 2'])
+        self.assertEqual((summary[1]['outages'], len(summary[1]['merged']), summary[1]['downtime']), (5, 2, timedelta(hours=10)))
+        self.assertEqual(summary[0]['downtime'], timedelta(0))
+        self.assertEqual(self.index.summary(datetime(2022, 1, 2, 6))[2]['downtime'], timedelta(hours=6))
+
+    def test_summary_duplicate_device(self):
+        """ Given a device ID listed twice under two names, so each of its outages appears once per name
+            Then the summary has a row per name, each counting the outage once
+        """
+        index = IntervalIndex([
+            {'id': 'battery-1', 'name': 'Battery 1', 'begin': '2022-01-01T00:00:00.000Z', 'end': '2022-01-01T06:00:00.000Z'},
+            {'id': 'battery-1', 'name': 'Battery One', 'begin': '2022-01-01T00:00:00.000Z', 'end': '2022-01-01T06:00:00.000Z'}
+        ])
+        self.assertEqual([(device['id'], device['name'], device['outages'], device['downtime']) for device in index.summary()], [
+            ('battery-1', 'Battery 1', 1, timedelta(hours=6)),
+            ('battery-1', 'Battery One', 1, timedelta(hours=6))
+        ])
+        self.assertEqual(index.down_at(datetime(2022, 1, 1, 3)), ['battery-1'])
@@ -0,0 +1,57 @@
+import unittest
+import json
+from outages import iter_json_array
+
+class TestIterJsonArray(unittest.TestCase):
+    """ This class contains tests for the iter_json_array function
+        in outages.py, which decodes a streamed JSON array one element at a time.
+    """
+    mock_outages = [
+        {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'begin': '2022-01-01T00:00:00.000Z', 'end': '2022-09-15T19:45:10.341Z'},
+        {'id': '09e77920-ca66-4263-8a15-9409210ff858', 'begin': '2021-06-01T18:01:58.920Z', 'end': '2021-09-21T20:02:45.438Z'},
+        {'id': 'bättery-ünicode', 'begin': '2022-12-04T07:25:45.750Z', 'end': '2022-12-25T16:11:32.270Z'}
+    ]
+
+    def test_whole_body(self):
+        """ Given a JSON array delivered in a single chunk
+            Then every element is yielded in order
+        """
+        body = json.dumps(self.mock_outages).encode()
+        self.assertEqual(list(iter_json_array([body])), self.mock_outages)
+
+    def test_split_chunks(self):
+        """ Given a JSON array split into chunks of every possible size
+            (including splits inside multi-byte UTF-8 characters)
+            Then every element is yielded in order
+        """
+        body = json.dumps(self.mock_outages, ensure_ascii=False).encode()
+        for size in range(1, len(body) + 1):
+            chunks = [body[i:i+size] for i in range(0, len(body), size)]
+            self.assertEqual(list(iter_json_array(chunks)), self.mock_outages)
+
+    def test_numbers_split_across_chunks(self):
+        """ Given a JSON array of numbers split in the middle of a number
+            Then the complete numbers are yielded
+        """
+        self.assertEqual(list(iter_json_array([b'[12', b'34, 5', b'6]'])), [1234, 56])
+
+    def test_empty_array(self):
+        """ Given an empty JSON array
+            Then nothing is yielded
+        """
+        self.assertEqual(list(iter_json_array([b' [ ', b' ] '])), [])
+
+    def test_truncated_array(self):
+        """ Given a JSON array that is cut off before the closing bracket
+            Then a ValueError is raised
+        """
+        body = json.dumps(self.mock_outages).encode()
+        with self.assertRaises(ValueError):
+            list(iter_json_array([body[:-10]]))
+
+    def test_not_an_array(self):
+        """ Given a JSON object instead of an array
+            Then a ValueError is raised
+        """
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'{"id": "123"}']))
@@ -1,8 +1,10 @@
 import unittest
-from outages import make_request
+from outages import make_request, SiteOutage
 from unittest.mock import patch, MagicMock
+from requests.exceptions import ConnectionError, ReadTimeout
 import sys
 import io
+from tests.helpers import FakeClock
 
 class TestMakeRequest(unittest.TestCase):
     """ This class contains tests for the make_request function
@@ -28,6 +30,26 @@ class TestMakeRequest(unittest.TestCase):
         sys.stdout = sys.__stdout__
         self.assertEqual('200 OK\n', capturedOutput.getvalue())
     
+    @patch('outages.requests')
+    def test_status_code_200_get_stream(self, mock_request):
+        """ Given the server returns status code 200 after a streamed GET request
+            Then the make_request function returns a generator over the data
+            And the response body is only read as the generator is consumed
+            And a '200 OK' message is printed
+        """
+        mock_response = MagicMock()
+        mock_response.status_code = 200 # simulate 200 OK response
+        mock_response.iter_content.return_value = iter([b'[{"id": "123", "begin": "12:00", ', b'"end": "13:00"}]'])
+        mock_request.get.return_value = mock_response
+        capturedOutput = io.StringIO()
+        sys.stdout = capturedOutput
+        outages = make_request('GET', 'url', {'key': 'val'}, stream=True)
+        sys.stdout = sys.__stdout__
+        mock_response.json.assert_not_called()
+        self.assertEqual(list(outages), [{'id': '123','begin': '12:00','end': '13:00'}])
+        mock_response.close.assert_called_once()
+        self.assertEqual('200 OK\n', capturedOutput.getvalue())
+
     @patch('sys.exit')
     @patch('outages.requests')
     def test_status_code_200_get_none(self, mock_request, mock_exit):
@@ -64,6 +86,23 @@ class TestMakeRequest(unittest.TestCase):
         sys.stdout = sys.__stdout__
         self.assertEqual('200 OK\n', capturedOutput.getvalue())
 
+    @patch('outages.requests')
+    def test_record_payload_post(self, mock_request):
+        """ Given a POST request whose payload is a list of SiteOutage records
+            Then the records are sent as plain dicts, which requests can encode as JSON
+        """
+        mock_response = MagicMock()
+        mock_response.status_code = 200 # simulate 200 OK response
+
+        mock_request.post.return_value = mock_response # mock request.post() returns mock response
+        site_outage = {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'name': 'Battery 1', 'begin': '2022-01-01T00:00:00.000Z', 'end': '2022-09-15T19:45:10.341Z'}
+        capturedOutput = io.StringIO()
+        sys.stdout = capturedOutput
+        self.assertEqual(make_request('POST', 'url', {'key': 'val'}, [SiteOutage(**site_outage)]), 200)
+        sys.stdout = sys.__stdout__
+        self.assertEqual(type(mock_request.post.call_args.kwargs['json'][0]), dict)
+        self.assertEqual(mock_request.post.call_args.kwargs['json'], [site_outage])
+
     @patch('sys.exit')
     @patch('outages.requests')
     def test_status_code_client_error_403_get(self, mock_request, mock_exit):
@@ -143,8 +182,9 @@ class TestMakeRequest(unittest.TestCase):
     @patch('sys.exit')
     @patch('outages.requests')
     def test_status_code_client_error_429_get(self, mock_request, mock_exit):
-        """ Given the server returns status code 429 after a GET request
-            Then the make_request function exits the interpreter using sys.exit
+        """ Given the server keeps returning status code 429 after a GET request
+            Then the make_request function retries 5 times
+            And then exits the interpreter using sys.exit
             And a 'Error (429: Too Many Requests)' message is printed
         """
         mock_response = MagicMock()
@@ -153,17 +193,19 @@ class TestMakeRequest(unittest.TestCase):
 
         capturedOutput = io.StringIO() # create StringIO object to store stdout
         sys.stdout = capturedOutput # direct output to new StringIO object
-        make_request('GET', 'url', {'key': 'val'}) # capture output
+        make_request('GET', 'url', {'key': 'val'}, retry_policy=FakeClock().policy()) # capture output
         sys.stdout = sys.__stdout__
 
         mock_exit.assert_called_once_with(1)  # assert mock sys.exit was called 
-        self.assertEqual('Error (429: Too Many Requests)\n', capturedOutput.getvalue()) # assert correct error message
+        self.assertTrue('Retrying... 5/5' in capturedOutput.getvalue())
+        self.assertTrue(capturedOutput.getvalue().endswith('Error (429: Too Many Requests)\n')) # assert correct error message
     
     @patch('sys.exit')
     @patch('outages.requests')
     def test_status_code_client_error_429_post(self, mock_request, mock_exit):
-        """ Given the server returns status code 429 after a POST request
-            Then the make_request function exits the interpreter using sys.exit
+        """ Given the server keeps returning status code 429 after a POST request
+            Then the make_request function retries 5 times
+            And then exits the interpreter using sys.exit
             And a 'Error (429: Too Many Requests)' message is printed
         """
         mock_response = MagicMock()
@@ -172,11 +214,12 @@ class TestMakeRequest(unittest.TestCase):
 
         capturedOutput = io.StringIO() # create StringIO object to store stdout
         sys.stdout = capturedOutput # direct output to new StringIO object
-        make_request('POST', 'url', {'key': 'val'}) # capture output
+        make_request('POST', 'url', {'key': 'val'}, retry_policy=FakeClock().policy()) # capture output
         sys.stdout = sys.__stdout__
 
         mock_exit.assert_called_once_with(1)  # assert mock sys.exit was called 
-        self.assertEqual('Error (429: Too Many Requests)\n', capturedOutput.getvalue()) # assert correct error message
+        self.assertTrue('Retrying... 5/5' in capturedOutput.getvalue())
+        self.assertTrue(capturedOutput.getvalue().endswith('Error (429: Too Many Requests)\n')) # assert correct error message
 
     @patch('sys.exit')
     @patch('outages.requests')
@@ -192,9 +235,125 @@ class TestMakeRequest(unittest.TestCase):
 
         capturedOutput = io.StringIO()
         sys.stdout = capturedOutput
-        make_request('GET', 'url', {'key': 'val'})
+        make_request('GET', 'url', {'key': 'val'}, retry_policy=FakeClock().policy())
         sys.stdout = sys.__stdout__
 
         mock_exit.assert_called_once_with(1) # assert mock sys.exit was called 
         self.assertTrue('Retrying... 5/5' in capturedOutput.getvalue()) # assert 5 retries have happened...
-        self.assertTrue('Error (500: Internal Server Error)' in capturedOutput.getvalue()) # ...and the last one failed
\ No newline at end of file
+        self.assertTrue('Error (500: Internal Server Error)' in capturedOutput.getvalue()) # ...and the last one failed
+
+    @patch('outages.requests')
+    def test_status_code_server_error_500_then_200_get(self, mock_request):
+        """ Given the server returns status code 500 twice after a GET request
+            And then returns status code 200
+            Then the make_request function returns the data from the successful retry
+        """
+        error_response = MagicMock()
+        error_response.status_code = 500
+        ok_response = MagicMock()
+        ok_response.status_code = 200
+        ok_response.json.return_value = [{'id': '123'}]
+        mock_request.get.side_effect = [error_response, error_response, ok_response]
+
+        clock = FakeClock()
+        capturedOutput = io.StringIO()
+        sys.stdout = capturedOutput
+        self.assertEqual(make_request('GET', 'url', {'key': 'val'}, retry_policy=clock.policy()), [{'id': '123'}])
+        sys.stdout = sys.__stdout__
+
+        self.assertEqual(clock.sleeps, [1.0, 2.0]) # exponential backoff
+        self.assertTrue('Retrying... 2/5' in capturedOutput.getvalue())
+        self.assertTrue(capturedOutput.getvalue().endswith('200 OK\n'))
+
+    @patch('outages.requests')
+    def test_status_code_client_error_429_retry_after_post(self, mock_request):
+        """ Given the server returns status code 429 with a 'Retry-After: 7' header after a POST request
+            And then returns status code 200
+            Then the make_request function waits 7 seconds before retrying
+            And returns status code 200
+        """
+        throttled_response = MagicMock()
+        throttled_response.status_code = 429
+        throttled_response.headers = {'Retry-After': '7'}
+        ok_response = MagicMock()
+        ok_response.status_code = 200
+        mock_request.post.side_effect = [throttled_response, ok_response]
+
+        clock = FakeClock()
+        capturedOutput = io.StringIO()
+        sys.stdout = capturedOutput
+        self.assertEqual(make_request('POST', 'url', {'key': 'val'}, retry_policy=clock.policy()), 200)
+        sys.stdout = sys.__stdout__
+
+        self.assertEqual(clock.sleeps, [7.0])
+
+    @patch('sys.exit')
+    @patch('outages.requests')
+    def test_status_code_server_error_503_deadline_get(self, mock_request, mock_exit):
+        """ Given the server keeps returning status code 503 after a GET request
+            And the retry policy has a 10 second deadline
+            Then the make_request function stops retrying before the deadline is passed
+            And exits the interpreter using sys.exit
+        """
+        mock_response = MagicMock()
+        mock_response.status_code = 503
+        mock_response.headers = {}
+        mock_request.get.return_value = mock_response
+
+        clock = FakeClock()
+        capturedOutput = io.StringIO()
+        sys.stdout = capturedOutput
+        make_request('GET', 'url', {'key': 'val'}, retry_policy=clock.policy(deadline=10))
+        sys.stdout = sys.__stdout__
+
+        self.assertEqual(clock.sleeps, [1.0, 2.0, 4.0]) # waiting 8 more seconds would pass the deadline
+        mock_exit.assert_called_once_with(1)
+        self.assertTrue(capturedOutput.getvalue().endswith('Error (503: Service Unavailable)\n'))
+
+    @patch('outages.requests')
+    def test_timeout(self, mock_request):
+        """ Given a retry policy with a 10 second deadline
+            Then each attempt is sent with a timeout of the time left until the deadline
+        """
+        error_response = MagicMock()
+        error_response.status_code = 500
+        ok_response = MagicMock()
+        ok_response.status_code = 200
+        mock_request.post.side_effect = [error_response, ok_response]
+
+        with patch('sys.stdout', new=io.StringIO()):
+            make_request('POST', 'url', {'key': 'val'}, retry_policy=FakeClock().policy(deadline=10))
+
+        self.assertEqual([c.kwargs['timeout'] for c in mock_request.post.call_args_list], [10, 9])
+
+    @patch('outages.requests')
+    def test_connection_error_then_200_get(self, mock_request):
+        """ Given the connection fails during a GET request
+            And the retry then returns status code 200
+            Then the make_request function waits, retries and returns the data
+        """
+        ok_response = MagicMock()
+        ok_response.status_code = 200
+        ok_response.json.return_value = [{'id': '123'}]
+        mock_request.get.side_effect = [ConnectionError('Connection reset by peer'), ok_response]
+
+        clock = FakeClock()
+        with patch('sys.stdout', new=io.StringIO()) as capturedOutput:
+            self.assertEqual(make_request('GET', 'url', {'key': 'val'}, retry_policy=clock.policy()), [{'id': '123'}])
+
+        self.assertEqual(clock.sleeps, [1.0])
+        self.assertTrue('Request failed (ConnectionError)... Retrying... 1/5' in capturedOutput.getvalue())
+
+    @patch('outages.requests')
+    def test_timeout_error_get(self, mock_request):
+        """ Given every attempt of a GET request times out
+            Then the make_request function retries 5 times
+            And exits the interpreter with an error message instead of raising
+        """
+        mock_request.get.side_effect = ReadTimeout('Read timed out')
+
+        with patch('sys.stdout', new=io.StringIO()) as capturedOutput, self.assertRaises(SystemExit):
+            make_request('GET', 'url', {'key': 'val'}, retry_policy=FakeClock().policy())
+
+        self.assertEqual(mock_request.get.call_count, 6)
+        self.assertTrue(capturedOutput.getvalue().endswith('Error (ReadTimeout: Read timed out)\n'))
@@ -0,0 +1,148 @@
+import unittest
+from outages import Metrics, make_request, main
+from unittest.mock import patch, MagicMock
+import io
+import os
+import json
+import tempfile
+
+class TestMetrics(unittest.TestCase):
+    """ This class contains tests for the Metrics class in outages.py,
+        which records counters and timings during a run.
+    """
+    def setUp(self):
+        self.metrics = Metrics(enabled=True, buckets=(0.1, 1))
+
+    def test_disabled(self):
+        """ Given metrics are disabled
+            Then nothing is recorded and items are passed through untouched
+        """
+        metrics = Metrics()
+        items = [1, 2, 3]
+        metrics.incr('rows_total')
+        metrics.observe('seconds', 0.5)
+        with metrics.timer('stage_seconds', stage='post'):
+            pass
+        self.assertIs(metrics.counted('rows_total', items), items)
+        self.assertEqual(metrics.summary(), {'counters': [], 'histograms': []})
+
+    def test_counters(self):
+        """ Given a counter is incremented with and without labels
+            Then each set of labels is counted separately
+        """
+        self.metrics.incr('http_retries_total', method='GET')
+        self.metrics.incr('http_retries_total', 2, method='GET')
+        self.metrics.incr('http_retries_total', method='POST')
+        self.assertEqual(self.metrics.summary()['counters'], [
+            {'name': 'http_retries_total', 'labels': {'method': 'GET'}, 'value': 3},
+            {'name': 'http_retries_total', 'labels': {'method': 'POST'}, 'value': 1}
+        ])
+
+    def test_histograms(self):
+        """ Given values are observed in a histogram
+            Then the count, sum, min, max and bucket counts are recorded
+        """
+        for value in [0.05, 0.5, 0.6, 5]:
+            self.metrics.observe('stage_seconds', value, stage='post')
+        histogram = self.metrics.summary()['histograms'][0]
+        self.assertEqual(histogram['count'], 4)
+        self.assertAlmostEqual(histogram['sum'], 6.15)
+        self.assertEqual((histogram['min'], histogram['max']), (0.05, 5))
+        self.assertEqual(histogram['buckets'], {'0.1': 1, '1': 2}) # 5 is only in +Inf
+
+    def test_timer(self):
+        """ Given a block is timed
+            Then its duration is observed in the histogram
+        """
+        with patch('outages.time.perf_counter', side_effect=[10.0, 10.25]):
+            with self.metrics.timer('stage_seconds', stage='report'):
+                pass
+        histogram = self.metrics.summary()['histograms'][0]
+        self.assertEqual(histogram['labels'], {'stage': 'report'})
+        self.assertEqual(histogram['sum'], 0.25)
+
+    def test_counted(self):
+        """ Given items are passed through counted()
+            Then the counter is incremented by the number (or weight) of items used
+        """
+        self.assertEqual(list(self.metrics.counted('rows_in_total', iter([1, 2, 3]))), [1, 2, 3])
+        self.assertEqual(list(self.metrics.counted('bytes_total', [b'ab', b'cde'], len)), [b'ab', b'cde'])
+        self.assertEqual(self.metrics.counters, {('bytes_total', ()): 5, ('rows_in_total', ()): 3})
+
+    def test_prometheus(self):
+        """ Given a counter and a histogram
+            Then they are written in the Prometheus text format with cumulative buckets
+        """
+        self.metrics.incr('rows_in_total', 3)
+        self.metrics.observe('http_request_seconds', 0.05, method='GET')
+        self.metrics.observe('http_request_seconds', 0.5, method='GET')
+        self.assertEqual(self.metrics.to_prometheus(), '\n'.join([
+            '# TYPE rows_in_total counter',
+            'rows_in_total 3',
+            '# TYPE http_request_seconds histogram',
+            'http_request_seconds_bucket{method="GET",le="0.1"} 1',
+            'http_request_seconds_bucket{method="GET",le="1"} 2',
+            'http_request_seconds_bucket{method="GET",le="+Inf"} 2',
+            'http_request_seconds_sum{method="GET"} 0.55',
+            'http_request_seconds_count{method="GET"} 2'
+        ]) + '\n')
+
+    def test_write(self):
+        """ Given a path ending in '.prom' or '.json'
+            Then the metrics are written in the Prometheus text format or as JSON
+        """
+        self.metrics.incr('rows_in_total', 3)
+        with tempfile.TemporaryDirectory() as directory:
+            self.metrics.write(os.path.join(directory, 'metrics.prom'))
+            self.metrics.write(os.path.join(directory, 'metrics.json'))
+            with open(os.path.join(directory, 'metrics.prom')) as f:
+                self.assertEqual(f.read(), self.metrics.to_prometheus())
+            with open(os.path.join(directory, 'metrics.json')) as f:
+                self.assertEqual(json.load(f), self.metrics.summary())
+
+    @patch('outages.requests')
+    def test_make_request(self, mock_request):
+        """ Given metrics are enabled and a request is retried once
+            Then the request timings, responses, retries and bytes received are recorded per endpoint
+        """
+        failed, ok = MagicMock(), MagicMock()
+        failed.status_code, failed.headers = 503, {'Retry-After': '0'}
+        ok.status_code, ok.content = 200, b'{"id": "norwich-pear-tree"}'
+        ok.json.return_value = {'id': 'norwich-pear-tree'}
+        mock_request.get.side_effect = [failed, ok]
+        with patch('outages.metrics', self.metrics), patch('sys.stdout', new=io.StringIO()):
+            make_request('GET', 'site-info/norwich-pear-tree', {})
+        labels = {'method': 'GET', 'endpoint': 'site-info'}
+        summary = self.metrics.summary()
+        self.assertIn({'name': 'http_retries_total', 'labels': labels, 'value': 1}, summary['counters'])
+        self.assertIn({'name': 'http_responses_total', 'labels': {**labels, 'status': '503'}, 'value': 1}, summary['counters'])
+        self.assertIn({'name': 'http_response_bytes_total', 'labels': labels, 'value': len(ok.content)}, summary['counters'])
+        self.assertEqual(summary['histograms'][0]['count'], 2)
+
+    @patch('outages._run', side_effect=SystemExit(1))
+    def test_main_writes_on_failure(self, mock_run):
+        """ Given main is run with a metrics file and the run fails
+            Then the metrics are still written
+        """
+        with tempfile.TemporaryDirectory() as directory, patch('outages.metrics', self.metrics):
+            path = os.path.join(directory, 'metrics.json')
+            with self.assertRaises(SystemExit):
+                main(metrics_file=path)
+            with open(path) as f:
+                self.assertEqual(json.load(f)['histograms'][0]['labels'], {'stage': 'total'})
+
+    @patch('outages._run')
+    def test_main_resets_metrics(self, mock_run):
+        """ Given main is run with a metrics file and then again without one
+            Then the second run records nothing and a third run's file only holds its own metrics
+        """
+        with tempfile.TemporaryDirectory() as directory, patch('outages.metrics', self.metrics):
+            path = os.path.join(directory, 'metrics.json')
+            main(metrics_file=path)
+            self.assertFalse(self.metrics.enabled)
+            self.assertEqual(self.metrics.summary(), {'counters': [], 'histograms': []})
+            main()
+            self.assertEqual(self.metrics.summary(), {'counters': [], 'histograms': []})
+            main(metrics_file=path)
+            with open(path) as f:
+                self.assertEqual(json.load(f)['histograms'][0]['count'], 1)
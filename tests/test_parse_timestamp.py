@@ -0,0 +1,39 @@
+import unittest
+from datetime import datetime
+from outages import parse_timestamp
+
+class TestParseTimestamp(unittest.TestCase):
+    """ This class contains tests for the parse_timestamp function
+        in outages.py, which parses the API's timestamps into datetimes.
+    """
+    def setUp(self):
+        parse_timestamp.cache_clear()
+
+    def test_matches_strptime(self):
+        """ Given timestamps in the API's format
+            Then the result is the same as datetime.strptime
+        """
+        for timestamp in ['2022-01-01T00:00:00.000Z', '2022-09-15T19:45:10.341Z', '1997-01-09T07:25:45.750Z', '2024-02-29T23:59:59.999Z']:
+            self.assertEqual(parse_timestamp(timestamp), datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%S.%fZ'))
+
+    def test_other_precision(self):
+        """ Given a valid timestamp with microsecond precision
+            Then it is parsed like datetime.strptime would
+        """
+        self.assertEqual(parse_timestamp('2022-09-15T19:45:10.341123Z'), datetime(2022, 9, 15, 19, 45, 10, 341123))
+
+    def test_invalid(self):
+        """ Given an invalid date or a timestamp in another format
+            Then a ValueError is raised
+        """
+        for timestamp in ['2022-13-01T00:00:00.000Z', '2022-01-01 00:00:00.000Z', '2022-01-01T00:00:00.000', 'not a timestamp']:
+            with self.assertRaises(ValueError):
+                parse_timestamp(timestamp)
+
+    def test_memoised(self):
+        """ Given the same timestamp is parsed twice
+            Then the second result comes from the cache
+        """
+        first = parse_timestamp('2022-01-01T00:00:00.000Z')
+        self.assertIs(parse_timestamp('2022-01-01T00:00:00.000Z'), first)
+        self.assertEqual(parse_timestamp.cache_info().hits, 1)
@@ -0,0 +1,116 @@
+import unittest
+import gzip
+import json
+from outages import post_site_outages_chunked, SiteOutage
+from unittest.mock import patch
+import sys
+import io
+import requests
+from benchmarks.mock_api import serve, base_url
+from tests.helpers import mock_response
+
+class TestPostSiteOutagesChunked(unittest.TestCase):
+    """ This class contains tests for the post_site_outages_chunked function
+        in outages.py, which sends a site's outages in concurrent, compressed chunks.
+    """
+    site_outages = [SiteOutage(f'id-{i}', f'Battery {i}', '2022-01-01T00:00:00.000Z', '2022-01-02T00:00:00.000Z') for i in range(25)]
+
+    def setUp(self):
+        self.capturedOutput = io.StringIO()
+        sys.stdout = self.capturedOutput
+
+    def tearDown(self):
+        sys.stdout = sys.__stdout__
+
+    def chunk(self, call):
+        """ Decode the outages sent in a mock POST call. """
+        return json.loads(gzip.decompress(call.kwargs['data']))
+
+    @patch('outages.requests')
+    def test_chunks(self, mock_request):
+        """ Given 25 site outages and a chunk size of 10
+            Then 3 gzip-compressed requests are sent
+            And each carries the same upload ID, its chunk index and the chunk count
+            And together they hold every outage exactly once
+            And the throughput is printed
+        """
+        session = mock_request.Session.return_value
+        session.post.return_value = mock_response(200, {})
+
+        report = post_site_outages_chunked('norwich-pear-tree', self.site_outages, {'key': 'val'}, chunk_size=10)
+
+        self.assertEqual(session.post.call_count, 3)
+        headers = [call.kwargs['headers'] for call in session.post.call_args_list]
+        upload_id = headers[0]['X-Upload-Id']
+        self.assertEqual(sorted(headers, key=lambda h: h['X-Chunk-Index']), [
+            {'key': 'val', 'Content-Type': 'application/json', 'Content-Encoding': 'gzip',
+             'X-Upload-Id': upload_id, 'X-Chunk-Count': '3', 'X-Chunk-Index': str(index)} for index in range(3)])
+        sent = sorted((o for call in session.post.call_args_list for o in self.chunk(call)), key=lambda o: int(o['id'][3:]))
+        self.assertEqual(sent, [dict(o) for o in self.site_outages])
+        self.assertEqual(report['rows'], 25)
+        self.assertEqual(report['failed'], [])
+        self.assertEqual(report['bytes'], sum(len(call.kwargs['data']) for call in session.post.call_args_list))
+        self.assertTrue('Sent 25 outages to norwich-pear-tree in 3/3 chunks' in self.capturedOutput.getvalue())
+        session.close.assert_called_once()
+
+    @patch('outages.requests')
+    def test_retry_failed_chunk(self, mock_request):
+        """ Given the second chunk fails once with status code 403
+            Then only that chunk is sent again
+            And every outage is sent
+        """
+        failures = []
+        def post(url, **kwargs):
+            first_id = json.loads(gzip.decompress(kwargs['data']))[0]['id']
+            if first_id == 'id-10' and not failures:
+                failures.append(first_id)
+                return mock_response(403, {})
+            return mock_response(200, {})
+        session = mock_request.Session.return_value
+        session.post.side_effect = post
+
+        report = post_site_outages_chunked('norwich-pear-tree', self.site_outages, {}, chunk_size=10)
+
+        self.assertEqual(session.post.call_count, 4)
+        self.assertEqual(self.chunk(session.post.call_args)[0]['id'], 'id-10') # the resent chunk
+        self.assertEqual(report['rows'], 25)
+        self.assertEqual(report['failed'], [])
+
+    @patch('outages.requests')
+    def test_chunk_keeps_failing(self, mock_request):
+        """ Given one chunk fails every time
+            Then it is reported as failed after the chunk retries
+            And the other chunks are sent
+        """
+        def post(url, **kwargs):
+            return mock_response(403 if json.loads(kwargs['data'])[0]['id'] == 'id-20' else 200, {})
+        session = mock_request.Session.return_value
+        session.post.side_effect = post
+
+        report = post_site_outages_chunked('norwich-pear-tree', self.site_outages, {}, chunk_size=10, compress=False, chunk_retries=2)
+
+        self.assertEqual(session.post.call_count, 5)
+        self.assertEqual(report['failed'], [2])
+        self.assertEqual(report['rows'], 20)
+        self.assertTrue('Sent 20 outages to norwich-pear-tree in 2/3 chunks' in self.capturedOutput.getvalue())
+
+    @patch('outages.requests')
+    def test_chunks_out_of_order(self, mock_request):
+        """ Given the chunks of 25 site outages reach the mock API in reverse order
+            Then the site's outages are unchanged until the last chunk arrives
+            And are then replaced by every outage, in the original order
+        """
+        session = mock_request.Session.return_value
+        session.post.return_value = mock_response(200, {})
+        post_site_outages_chunked('norwich-pear-tree', self.site_outages, {}, chunk_size=10)
+
+        server = serve([], [{'id': 'norwich-pear-tree', 'name': 'Norwich Pear Tree', 'devices': []}])
+        self.addCleanup(server.shutdown)
+        server.site_outages['norwich-pear-tree'] = [{'id': 'stale'}]
+        calls = sorted(session.post.call_args_list, key=lambda call: call.kwargs['headers']['X-Chunk-Index'], reverse=True)
+        for call in calls:
+            self.assertEqual(server.site_outages['norwich-pear-tree'], [{'id': 'stale'}])
+            response = requests.post(base_url(server) + '/site-outages/norwich-pear-tree', headers=call.kwargs['headers'], data=call.kwargs['data'])
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(server.site_outages['norwich-pear-tree'], [dict(o) for o in self.site_outages])
+        self.assertEqual(server.uploads, {})
@@ -0,0 +1,49 @@
+import unittest
+import io
+from outages import process_site_outages, generate_site_outages, report_row, write_report, SiteOutage
+
+class TestProcessSiteOutages(unittest.TestCase):
+    """ This class contains tests for the process_site_outages function
+        in outages.py, which generates site outages on a pool of worker processes.
+    """
+    mock_outages = [
+        {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'begin': '2022-01-01T00:00:00.000Z', 'end': '2022-09-15T19:45:10.341Z'}, # OK
+        {'id': '09e77920-ca66-4263-8a15-9409210ff858', 'begin': '2021-06-01T18:01:58.920Z', 'end': '2021-09-21T20:02:45.438Z'}, # began too early
+        {'id': '0817cd44-b3ed-4790-8ce4-5b477ea86402', 'begin': '2022-12-04T07:25:45.750Z', 'end': '2022-12-25T16:11:32.270Z'}, # not this site
+        {"id": "86b5c819-6a6c-4978-8c51-a2d810bb9318", "begin": "2022-05-09T04:47:25.211Z", "end": "2022-12-02T18:37:16.039Z"}, # OK
+        {"id": "86b5c819-6a6c-4978-8c51-a2d810bb9318", "begin": "2022-12-02T18:37:16.039Z", "end": "2022-05-09T04:47:25.211Z"}, # negative duration
+        {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'begin': '2099-01-01T00:00:00.000Z', 'end': '2099-01-02T00:00:00.000Z'}  # future
+    ]
+    mock_site_info = {
+        'id': 'norwich-pear-tree', 'name': 'Norwich Pear Tree', 'devices': [
+            {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'name': 'Battery 1'},
+            {"id": "86b5c819-6a6c-4978-8c51-a2d810bb9318", "name": "Battery 2"}
+        ]
+    }
+    earliest = '2022-01-01T00:00:00.000Z'
+
+    def test_same_as_single_process(self):
+        """ Given outages split into chunks over several worker processes
+            Then the site outages and report rows are the same, in the same order, as in a single process
+        """
+        site_outages, rows = process_site_outages(iter(self.mock_outages), self.mock_site_info, self.earliest, processes=2, chunk_size=2)
+        expected = generate_site_outages(self.mock_outages, self.mock_site_info, self.earliest)
+        self.assertEqual(site_outages, expected)
+        self.assertTrue(all(isinstance(outage, SiteOutage) for outage in site_outages))
+        self.assertEqual(rows, [report_row(outage) for outage in expected])
+
+    def test_report(self):
+        """ Given report rows computed by worker processes
+            Then write_report writes the same report as without them
+        """
+        site_outages, rows = process_site_outages(self.mock_outages, self.mock_site_info, self.earliest, processes=2, chunk_size=1)
+        expected, out = io.StringIO(), io.StringIO()
+        write_report(site_outages, expected)
+        write_report(site_outages, out, rows=rows)
+        self.assertEqual(out.getvalue(), expected.getvalue())
+
+    def test_no_outages(self):
+        """ Given no outages
+            Then no site outages or rows are returned
+        """
+        self.assertEqual(process_site_outages([], self.mock_site_info, self.earliest, processes=1), ([], []))
@@ -0,0 +1,108 @@
+import unittest
+from outages import RateLimiter, RetryPolicy, make_request
+from unittest.mock import patch
+import io
+import threading
+from tests.helpers import mock_response, FakeClock
+
+class TestRateLimiter(unittest.TestCase):
+    """ This class contains tests for the RateLimiter class in outages.py,
+        which limits the rate and concurrency of requests and adapts to throttling.
+    """
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def limiter(self, **kwargs):
+        return RateLimiter(clock=self.clock, sleep=self.clock.sleep, **kwargs)
+
+    def test_token_bucket(self):
+        """ Given a rate of 2 requests per second and a burst of 2
+            Then 2 requests start at once and each one after waits half a second
+        """
+        limiter = self.limiter(rate=2, burst=2, max_rate=2)
+        for _ in range(4):
+            limiter.release(limiter.acquire())
+        self.assertEqual(self.clock.sleeps, [0.5, 0.5])
+
+    def test_max_in_flight(self):
+        """ Given one request in flight and a limit of one
+            Then the next request waits in the queue until the first is released
+        """
+        limiter = RateLimiter(rate=1000, max_in_flight=1)
+        started = limiter.acquire()
+        waiter = threading.Thread(target=lambda: limiter.release(limiter.acquire()))
+        waiter.start()
+        waiter.join(0.1)
+        self.assertTrue(waiter.is_alive())
+        self.assertEqual((limiter.queue_depth, limiter.in_flight), (1, 1))
+        limiter.release(started)
+        waiter.join(5)
+        self.assertEqual((limiter.queue_depth, limiter.in_flight), (0, 0))
+
+    def test_backoff(self):
+        """ Given three requests in flight are throttled
+            Then the rate is only halved once, as they were all sent at the old rate
+            And a request sent after that being throttled halves it again, down to the minimum rate
+        """
+        limiter = self.limiter(rate=8, min_rate=1.5)
+        started = [limiter.acquire() for _ in range(3)]
+        for time in started:
+            limiter.release(time, mock_response(429))
+        self.assertEqual(limiter.rate, 4)
+        self.clock.now += 1
+        limiter.release(limiter.acquire(), mock_response(503))
+        self.assertEqual(limiter.rate, 2)
+        self.clock.now += 1
+        limiter.release(limiter.acquire(), mock_response(429))
+        self.assertEqual(limiter.rate, 1.5)
+
+    def test_retry_after(self):
+        """ Given a 429 response asking to retry after 5 seconds
+            Then the next request waits until then
+        """
+        limiter = self.limiter(rate=10, decrease=1)
+        limiter.release(limiter.acquire(), mock_response(429, headers={'Retry-After': '5'}))
+        limiter.release(limiter.acquire())
+        self.assertEqual(self.clock.sleeps, [5.1])
+
+    def test_increase(self):
+        """ Given successful responses
+            Then the rate increases, up to the maximum rate
+        """
+        limiter = self.limiter(rate=2, increase=1, max_rate=3)
+        limiter.release(limiter.acquire(), mock_response(200))
+        self.assertEqual(limiter.rate, 2.5)
+        for _ in range(10):
+            limiter.release(limiter.acquire(), mock_response(304))
+        self.assertEqual(limiter.rate, 3)
+
+    def test_invalid(self):
+        """ Given a rate that is not positive
+            Then ValueError is raised
+        """
+        with self.assertRaises(ValueError):
+            RateLimiter(rate=0)
+
+    @patch('outages.requests')
+    def test_make_request(self, mock_request):
+        """ Given make_request is given a limiter and its request is throttled once
+            Then the rate is reduced and every slot is released
+        """
+        mock_request.get.side_effect = [mock_response(429, headers={'Retry-After': '0'}), mock_response(200, {'id': 'norwich-pear-tree'})]
+        limiter = RateLimiter(rate=100)
+        with patch('sys.stdout', new=io.StringIO()):
+            self.assertEqual(make_request('GET', 'site-info/norwich-pear-tree', {}, limiter=limiter), {'id': 'norwich-pear-tree'})
+        self.assertLess(limiter.rate, 100)
+        self.assertEqual((limiter.queue_depth, limiter.in_flight), (0, 0))
+
+    @patch('outages.requests')
+    def test_make_request_error(self, mock_request):
+        """ Given every attempt raises before a response is received
+            Then each attempt's slot is still released
+        """
+        mock_request.get.side_effect = ConnectionError
+        limiter = RateLimiter(max_in_flight=1)
+        with patch('sys.stdout', new=io.StringIO()), self.assertRaises(SystemExit):
+            make_request('GET', 'outages', {}, limiter=limiter, retry_policy=RetryPolicy(sleep=self.clock.sleep))
+        self.assertEqual(mock_request.get.call_count, 6)
+        self.assertEqual(limiter.in_flight, 0)
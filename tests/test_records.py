@@ -0,0 +1,59 @@
+import unittest
+import json
+import pickle
+import tracemalloc
+from outages import SiteOutage, to_payload, generate_site_outages
+from records import Outage
+from benchmarks.synthetic import generate_site, generate_outages
+
+class TestRecords(unittest.TestCase):
+    """ This class contains tests for the Record classes (Outage and SiteOutage)
+        in outages.py, which hold outages in a fraction of the memory of a dict.
+    """
+    mock_site_outage = {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'name': 'Battery 1', 'begin': '2022-01-01T00:00:00.000Z', 'end': '2022-09-15T19:45:10.341Z'}
+
+    def test_behaves_like_dict(self):
+        """ Given a SiteOutage record
+            Then its fields can be read like a dict
+            And it equals the dict with the same keys and values
+        """
+        record = SiteOutage(**self.mock_site_outage)
+        self.assertEqual(record["name"], 'Battery 1')
+        self.assertEqual(record.name, 'Battery 1')
+        self.assertEqual(record, self.mock_site_outage)
+        self.assertEqual(list(record.keys()), ['id', 'name', 'begin', 'end'])
+        with self.assertRaises(KeyError):
+            record["__class__"]
+
+    def test_lossless_payload(self):
+        """ Given SiteOutage records
+            Then to_payload converts them to the exact JSON payload schema
+            And json.dumps encodes them with default=dict
+            And they survive being pickled
+        """
+        record = SiteOutage(**self.mock_site_outage)
+        self.assertEqual(json.loads(json.dumps(to_payload([record]))), [self.mock_site_outage])
+        self.assertEqual(type(to_payload([record])[0]), dict)
+        self.assertEqual(json.dumps([record], default=dict), json.dumps([self.mock_site_outage]))
+        self.assertEqual(pickle.loads(pickle.dumps(record)), record)
+        self.assertEqual(pickle.loads(pickle.dumps(Outage('123', 'a', 'b'))), {'id': '123', 'begin': 'a', 'end': 'b'})
+
+    def test_memory(self):
+        """ Given 20,000 site outages
+            Then the records take less than half the memory of the equivalent dicts
+        """
+        site = generate_site(100)
+        outages = generate_outages(20000, [d['id'] for d in site['devices']], match_ratio=1)
+
+        def retained(fn):
+            fn() # warm up any caches, so only the result is measured
+            tracemalloc.start()
+            result = fn()
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del result
+            return size
+
+        as_records = retained(lambda: generate_site_outages(outages, site, '2000-01-01T00:00:00.000Z'))
+        as_dicts = retained(lambda: to_payload(generate_site_outages(outages, site, '2000-01-01T00:00:00.000Z')))
+        self.assertLess(as_records, as_dicts / 2)
@@ -0,0 +1,51 @@
+import unittest
+from outages import RetryPolicy, parse_retry_after
+from tests.helpers import mock_response
+
+class TestRetryPolicy(unittest.TestCase):
+    """ This class contains tests for the RetryPolicy class and parse_retry_after
+        function in outages.py, which decide when and for how long to wait
+        before retrying a request.
+    """
+    def test_exponential_backoff(self):
+        """ Given a policy with no jitter
+            Then each wait is double the last, up to the maximum delay
+        """
+        policy = RetryPolicy(base_delay=1, max_delay=10, max_retries=6, random=lambda: 1.0, clock=lambda: 0)
+        delays = [policy.next_delay(attempt, mock_response(500), 1000) for attempt in range(6)]
+        self.assertEqual(delays, [1, 2, 4, 8, 10, 10])
+
+    def test_jitter(self):
+        """ Given a policy whose jitter returns 0.25
+            Then each wait is a quarter of the backoff
+        """
+        policy = RetryPolicy(base_delay=4, random=lambda: 0.25, clock=lambda: 0)
+        self.assertEqual(policy.next_delay(1, mock_response(502), 1000), 2)
+
+    def test_retry_after(self):
+        """ Given a 429 or 503 response with a 'Retry-After' header
+            Then the wait is the time the header asks for
+        """
+        policy = RetryPolicy(random=lambda: 1.0, clock=lambda: 0)
+        self.assertEqual(policy.next_delay(0, mock_response(429, headers={'Retry-After': '12'}), 1000), 12)
+        self.assertEqual(policy.next_delay(0, mock_response(503, headers={'Retry-After': '3'}), 1000), 3)
+        self.assertEqual(policy.next_delay(0, mock_response(500, headers={'Retry-After': '12'}), 1000), 1) # only honoured for 429 and 503
+
+    def test_no_retry(self):
+        """ Given a non-retryable status code, too many attempts or a wait past the deadline
+            Then no retry is made
+        """
+        policy = RetryPolicy(max_retries=2, random=lambda: 1.0, clock=lambda: 0)
+        self.assertIsNone(policy.next_delay(0, mock_response(403), 1000))
+        self.assertIsNone(policy.next_delay(2, mock_response(500), 1000))
+        self.assertIsNone(policy.next_delay(0, mock_response(429, headers={'Retry-After': '60'}), 30))
+
+    def test_parse_retry_after(self):
+        """ Given 'Retry-After' values in seconds, as an HTTP date, or invalid
+            Then the number of seconds to wait is returned, or None if invalid
+        """
+        self.assertEqual(parse_retry_after('120'), 120)
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT', now=1445412420), 60)
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT', now=1445412540), 0)
+        self.assertIsNone(parse_retry_after('soon'))
+        self.assertIsNone(parse_retry_after(None))
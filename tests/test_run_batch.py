@@ -0,0 +1,176 @@
+import unittest
+from outages import run_batch, partition_site_outages, SyncState
+from unittest.mock import patch
+import sys
+import io
+import json
+import tempfile
+from tests.helpers import mock_response
+
+def mock_session(mock_request):
+    """ Return the mock session created by make_session() with a patched 'requests' module. """
+    session = mock_request.Session.return_value
+    session.__enter__.return_value = session
+    return session
+
+class TestRunBatch(unittest.TestCase):
+    """ This class contains tests for the run_batch and partition_site_outages
+        functions in outages.py, which generate and send outages for many sites.
+    """
+    mock_outages = [
+        {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'begin': '2022-01-01T00:00:00.000Z', 'end': '2022-09-15T19:45:10.341Z'}, # site A
+        {'id': '09e77920-ca66-4263-8a15-9409210ff858', 'begin': '2021-06-01T18:01:58.920Z', 'end': '2021-09-21T20:02:45.438Z'}, # began too early
+        {'id': '0817cd44-b3ed-4790-8ce4-5b477ea86402', 'begin': '2022-12-04T07:25:45.750Z', 'end': '2022-12-25T16:11:32.270Z'}, # site B
+        {"id": "86b5c819-6a6c-4978-8c51-a2d810bb9318", "begin": "2022-05-09T04:47:25.211Z", "end": "2022-12-02T18:37:16.039Z"}  # sites A and B
+    ]
+    mock_sites = {
+        'site-a': {'id': 'site-a', 'name': 'Site A', 'devices': [
+            {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'name': 'Battery 1'},
+            {'id': '86b5c819-6a6c-4978-8c51-a2d810bb9318', 'name': 'Battery 2'}
+        ]},
+        'site-b': {'id': 'site-b', 'name': 'Site B', 'devices': [
+            {'id': '0817cd44-b3ed-4790-8ce4-5b477ea86402', 'name': 'Battery 3'},
+            {'id': '86b5c819-6a6c-4978-8c51-a2d810bb9318', 'name': 'Shared Battery'}
+        ]}
+    }
+
+    def test_partition_site_outages(self):
+        """ Given outages for two sites sharing a device
+            Then each site receives its own outages with its own device names
+        """
+        self.assertEqual(partition_site_outages(self.mock_outages, self.mock_sites, '2022-01-01T00:00:00.000Z'), {
+            'site-a': [
+                {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'name': 'Battery 1', 'begin': '2022-01-01T00:00:00.000Z', 'end': '2022-09-15T19:45:10.341Z'},
+                {'id': '86b5c819-6a6c-4978-8c51-a2d810bb9318', 'name': 'Battery 2', 'begin': '2022-05-09T04:47:25.211Z', 'end': '2022-12-02T18:37:16.039Z'}
+            ],
+            'site-b': [
+                {'id': '0817cd44-b3ed-4790-8ce4-5b477ea86402', 'name': 'Battery 3', 'begin': '2022-12-04T07:25:45.750Z', 'end': '2022-12-25T16:11:32.270Z'},
+                {'id': '86b5c819-6a6c-4978-8c51-a2d810bb9318', 'name': 'Shared Battery', 'begin': '2022-05-09T04:47:25.211Z', 'end': '2022-12-02T18:37:16.039Z'}
+            ]
+        })
+
+    @patch('outages.requests')
+    def test_batch_success(self, mock_request):
+        """ Given two valid sites
+            Then every request is sent through one pooled session
+            And 'GET /outages' is requested once
+            And each site's outages are sent to its own endpoint
+            And a success line is printed for each site
+        """
+        def get(url, **kwargs):
+            if url.endswith('/outages'):
+                return mock_response(200, body=json.dumps(self.mock_outages).encode())
+            return mock_response(200, self.mock_sites[url.rsplit('/', 1)[1]])
+        session = mock_session(mock_request)
+        session.get.side_effect = get
+        session.post.return_value = mock_response(200, {})
+
+        capturedOutput = io.StringIO()
+        sys.stdout = capturedOutput
+        results = run_batch(['site-a', 'site-b'], {'key': 'val'}, '2022-01-01T00:00:00.000Z')
+        sys.stdout = sys.__stdout__
+
+        self.assertEqual(results, {'site-a': {'outages': 2, 'error': None}, 'site-b': {'outages': 2, 'error': None}})
+        outage_requests = [c for c in session.get.call_args_list if c.args[0].endswith('/outages')]
+        self.assertEqual(len(outage_requests), 1)
+        mock_request.Session.assert_called_once()
+        posted = {c.args[0].rsplit('/', 1)[1]: c.kwargs['json'] for c in session.post.call_args_list}
+        self.assertEqual([o['name'] for o in posted['site-b']], ['Battery 3', 'Shared Battery'])
+        self.assertTrue('site-a: OK (2 outages sent)' in capturedOutput.getvalue())
+        self.assertTrue('site-b: OK (2 outages sent)' in capturedOutput.getvalue())
+
+    @patch('outages.requests')
+    def test_batch_partial_failure(self, mock_request):
+        """ Given one site whose site-info cannot be found
+            And one site whose POST is forbidden
+            And one valid site
+            Then only the valid site succeeds
+            And a failure line is printed for each failed site
+        """
+        sites = dict(self.mock_sites, **{'site-c': {'id': 'site-c', 'name': 'Site C', 'devices': []}})
+        def get(url, **kwargs):
+            if url.endswith('/outages'):
+                return mock_response(200, body=json.dumps(self.mock_outages).encode())
+            site_id = url.rsplit('/', 1)[1]
+            return mock_response(200, sites[site_id]) if site_id != 'site-a' else mock_response(404)
+        def post(url, **kwargs):
+            return mock_response(403) if url.endswith('/site-c') else mock_response(200, {})
+        session = mock_session(mock_request)
+        session.get.side_effect = get
+        session.post.side_effect = post
+
+        capturedOutput = io.StringIO()
+        sys.stdout = capturedOutput
+        results = run_batch(['site-a', 'site-b', 'site-c'], {'key': 'val'}, '2022-01-01T00:00:00.000Z')
+        sys.stdout = sys.__stdout__
+
+        self.assertEqual(results['site-a'], {'outages': None, 'error': 'site-info: request failed'})
+        self.assertEqual(results['site-b'], {'outages': 2, 'error': None})
+        self.assertEqual(results['site-c'], {'outages': 0, 'error': 'site-outages: request failed'})
+        self.assertTrue('site-a: FAILED (site-info: request failed)' in capturedOutput.getvalue())
+        self.assertTrue('site-c: FAILED (site-outages: request failed)' in capturedOutput.getvalue())
+
+
+    @patch('outages.requests')
+    def test_batch_incremental(self, mock_request):
+        """ Given two sites were sent successfully by the previous run
+            And one new outage has appeared for site B only
+            Then site B is posted with all of its outages, not only the new one
+            And site A is not posted at all
+        """
+        new_outage = {'id': '0817cd44-b3ed-4790-8ce4-5b477ea86402', 'begin': '2023-01-04T07:25:45.750Z', 'end': '2023-01-05T16:11:32.270Z'}
+        feeds = [self.mock_outages, self.mock_outages + [new_outage]]
+        def get(url, **kwargs):
+            if url.endswith('/outages'):
+                return mock_response(200, body=json.dumps(feeds[0]).encode())
+            return mock_response(200, self.mock_sites[url.rsplit('/', 1)[1]])
+        session = mock_session(mock_request)
+        session.get.side_effect = get
+        session.post.return_value = mock_response(200, {})
+
+        capturedOutput = io.StringIO()
+        sys.stdout = capturedOutput
+        with tempfile.TemporaryDirectory() as directory:
+            sync_state = SyncState(directory)
+            run_batch(['site-a', 'site-b'], {'key': 'val'}, '2022-01-01T00:00:00.000Z', sync_state=sync_state)
+            session.post.reset_mock()
+            feeds.pop(0)
+            results = run_batch(['site-a', 'site-b'], {'key': 'val'}, '2022-01-01T00:00:00.000Z', sync_state=sync_state)
+        sys.stdout = sys.__stdout__
+
+        self.assertEqual(results, {'site-a': {'outages': 0, 'error': None}, 'site-b': {'outages': 3, 'error': None}})
+        session.post.assert_called_once()
+        self.assertTrue(session.post.call_args.args[0].endswith('/site-outages/site-b'))
+        self.assertEqual([o['begin'] for o in session.post.call_args.kwargs['json']],
+                         ['2022-12-04T07:25:45.750Z', '2022-05-09T04:47:25.211Z', '2023-01-04T07:25:45.750Z'])
+
+    @patch('outages.requests')
+    def test_batch_removed(self, mock_request):
+        """ Given two sites were sent successfully by the previous run
+            And the only outage of one of site A's devices has disappeared
+            Then site A's remaining outages are sent again
+            And site B is not posted at all
+        """
+        feeds = [self.mock_outages, self.mock_outages[1:]]
+        def get(url, **kwargs):
+            if url.endswith('/outages'):
+                return mock_response(200, body=json.dumps(feeds[0]).encode())
+            return mock_response(200, self.mock_sites[url.rsplit('/', 1)[1]])
+        session = mock_session(mock_request)
+        session.get.side_effect = get
+        session.post.return_value = mock_response(200, {})
+
+        capturedOutput = io.StringIO()
+        sys.stdout = capturedOutput
+        with tempfile.TemporaryDirectory() as directory:
+            sync_state = SyncState(directory)
+            run_batch(['site-a', 'site-b'], {'key': 'val'}, '2022-01-01T00:00:00.000Z', sync_state=sync_state)
+            session.post.reset_mock()
+            feeds.pop(0)
+            results = run_batch(['site-a', 'site-b'], {'key': 'val'}, '2022-01-01T00:00:00.000Z', sync_state=sync_state)
+        sys.stdout = sys.__stdout__
+
+        self.assertEqual(results, {'site-a': {'outages': 1, 'error': None}, 'site-b': {'outages': 0, 'error': None}})
+        session.post.assert_called_once()
+        self.assertTrue(session.post.call_args.args[0].endswith('/site-outages/site-a'))
+        self.assertEqual([o['name'] for o in session.post.call_args.kwargs['json']], ['Battery 2'])
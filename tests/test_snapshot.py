@@ -0,0 +1,102 @@
+import unittest
+import os
+import subprocess
+import sys
+import tempfile
+from outages import generate_site_outages, SiteOutage
+from snapshot import save_snapshot, Snapshot
+
+class TestSnapshot(unittest.TestCase):
+    """ This class contains tests for snapshot.py, which saves outages in a
+        binary columnar file and reads them back with mmap.
+    """
+    mock_outages = [
+        {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'begin': '2022-01-01T00:00:00.000Z', 'end': '2022-09-15T19:45:10.341Z'}, # OK
+        {'id': '09e77920-ca66-4263-8a15-9409210ff858', 'begin': '2021-06-01T18:01:58.920Z', 'end': '2021-09-21T20:02:45.438Z'}, # began too early
+        {'id': '0817cd44-b3ed-4790-8ce4-5b477ea86402', 'begin': '2022-12-04T07:25:45.750Z', 'end': '2022-12-25T16:11:32.270Z'}, # not this site
+        {"id": "86b5c819-6a6c-4978-8c51-a2d810bb9318", "begin": "2022-05-09T04:47:25.211Z", "end": "2022-12-02T18:37:16.039Z"}, # OK
+        {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'begin': '1969-12-31T23:59:59.999Z', 'end': '2099-01-01T00:00:00.000Z'}  # before the epoch
+    ]
+    mock_site_info = {
+        'id': 'norwich-pear-tree', 'name': 'Norwich Pear Tree', 'devices': [
+            {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'name': 'Battery 1'},
+            {"id": "86b5c819-6a6c-4978-8c51-a2d810bb9318", "name": "Battery 2"},
+            {"id": "not-in-the-feed", "name": "Battery 3"}
+        ]
+    }
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'outages.snap')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        """ Given outages saved to a snapshot
+            Then iterating the snapshot gives back the same outages, in the same order
+        """
+        self.assertEqual(save_snapshot(iter(self.mock_outages), self.path), 5)
+        with Snapshot(self.path) as snapshot:
+            self.assertEqual(len(snapshot), 5)
+            self.assertEqual(list(snapshot), self.mock_outages)
+
+    def test_site_outages(self):
+        """ Given a snapshot and site information
+            Then the site outages are the same as generate_site_outages gives for the original outages
+        """
+        save_snapshot(self.mock_outages, self.path)
+        with Snapshot(self.path) as snapshot:
+            site_outages = snapshot.site_outages(self.mock_site_info, '2022-01-01T00:00:00.000Z')
+            self.assertEqual(site_outages, generate_site_outages(self.mock_outages, self.mock_site_info, '2022-01-01T00:00:00.000Z'))
+            self.assertTrue(all(isinstance(outage, SiteOutage) for outage in site_outages))
+            self.assertEqual(generate_site_outages(snapshot, self.mock_site_info, '1900-01-01T00:00:00.000Z'),
+                             generate_site_outages(self.mock_outages, self.mock_site_info, '1900-01-01T00:00:00.000Z'))
+
+    def test_id_dictionary(self):
+        """ Given a snapshot with repeated outage IDs
+            Then each distinct ID is stored once, sorted, and can be looked up in both directions
+        """
+        save_snapshot(self.mock_outages, self.path)
+        with Snapshot(self.path) as snapshot:
+            ids = sorted({outage['id'] for outage in self.mock_outages})
+            self.assertEqual([snapshot.id(code) for code in range(len(ids))], ids)
+            self.assertEqual([snapshot.code(id) for id in ids], list(range(len(ids))))
+            self.assertIsNone(snapshot.code('not-in-the-feed'))
+            self.assertEqual(list(snapshot.codes), [ids.index(outage['id']) for outage in self.mock_outages])
+
+    def test_empty(self):
+        """ Given no outages
+            Then an empty snapshot is saved and read back
+        """
+        save_snapshot([], self.path)
+        with Snapshot(self.path) as snapshot:
+            self.assertEqual(list(snapshot), [])
+            self.assertEqual(snapshot.site_outages(self.mock_site_info, '2022-01-01T00:00:00.000Z'), [])
+
+    def test_unsupported_timestamp(self):
+        """ Given an outage with a timestamp not in the API's millisecond format
+            Then a ValueError is raised and no snapshot is written
+        """
+        with self.assertRaises(ValueError):
+            save_snapshot([{'id': 'a', 'begin': '2022-01-01T00:00:00Z', 'end': '2022-01-02T00:00:00.000Z'}], self.path)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_not_a_snapshot(self):
+        """ Given a file that is not a snapshot
+            Then a ValueError is raised
+        """
+        for content in [b'', b'[{"id": "a", "begin": "2022-01-01T00:00:00.000Z"}]']:
+            with open(self.path, 'wb') as f:
+                f.write(content)
+            with self.assertRaises(ValueError):
+                Snapshot(self.path)
+
+    def test_independent_of_outages(self):
+        """ Given snapshot.py is imported in a new interpreter
+            Then outages.py is not imported, so running outages.py as a script never imports it a second time
+        """
+        code = "import sys, snapshot; print('outages' in sys.modules)"
+        repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run([sys.executable, '-c', code], cwd=repository, capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout, 'False\n')
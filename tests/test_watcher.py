@@ -0,0 +1,147 @@
+import unittest
+from outages import Watcher, SyncState
+from unittest.mock import patch, MagicMock
+import os
+import io
+import json
+import signal
+import tempfile
+from tests.helpers import mock_response
+
+class TestWatcher(unittest.TestCase):
+    """ This class contains tests for the Watcher class in outages.py,
+        which polls for outages and sends each site's outages whenever they change.
+    """
+    mock_outages = [
+        {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'begin': '2022-01-01T00:00:00.000Z', 'end': '2022-09-15T19:45:10.341Z'}, # site A
+        {'id': '0817cd44-b3ed-4790-8ce4-5b477ea86402', 'begin': '2022-12-04T07:25:45.750Z', 'end': '2022-12-25T16:11:32.270Z'}  # site B
+    ]
+    new_outage = {'id': '0817cd44-b3ed-4790-8ce4-5b477ea86402', 'begin': '2023-01-04T07:25:45.750Z', 'end': '2023-01-05T16:11:32.270Z'}
+    earliest = '2022-01-01T00:00:00.000Z'
+
+    def setUp(self):
+        self.sites = {
+            'site-a': {'id': 'site-a', 'name': 'Site A', 'devices': [{'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'name': 'Battery 1'}]},
+            'site-b': {'id': 'site-b', 'name': 'Site B', 'devices': [{'id': '0817cd44-b3ed-4790-8ce4-5b477ea86402', 'name': 'Battery 3'}]}
+        }
+        self.feed = list(self.mock_outages)
+        patcher = patch('outages.requests')
+        self.mock_request = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.session = self.mock_request.Session.return_value
+        self.session.get.side_effect = self.get
+        self.session.post.return_value = mock_response(200, {})
+        patcher = patch('sys.stdout', new=io.StringIO())
+        self.output = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, url, **kwargs):
+        if url.endswith('/outages'):
+            return mock_response(200, body=json.dumps(self.feed).encode())
+        return mock_response(200, json.loads(json.dumps(self.sites[url.rsplit('/', 1)[1]]))) # a new copy, as from the API
+
+    def posted(self):
+        """ Return the site IDs posted to since the last call, in order. """
+        sites = sorted(c.args[0].rsplit('/', 1)[1] for c in self.session.post.call_args_list)
+        self.session.post.reset_mock()
+        return sites
+
+    def test_posts_only_changes(self):
+        """ Given a first poll sends every site
+            And a second poll finds nothing changed
+            And a third poll finds a new outage for site B
+            Then nothing is sent by the second poll, and only site B by the third, with all of its outages
+            And one session is used and each site's information is fetched once
+        """
+        with Watcher(['site-a', 'site-b'], {'key': 'val'}, self.earliest) as watcher:
+            watcher.poll()
+            self.assertEqual(self.posted(), ['site-a', 'site-b'])
+            self.assertEqual(watcher.poll(), {'site-a': {'outages': 0, 'error': None}, 'site-b': {'outages': 0, 'error': None}})
+            self.assertEqual(self.posted(), [])
+            self.feed.append(self.new_outage)
+            watcher.poll()
+            self.assertEqual(len(self.session.post.call_args.kwargs['json']), 2)
+            self.assertEqual(self.posted(), ['site-b'])
+        self.mock_request.Session.assert_called_once()
+        site_info = [c for c in self.session.get.call_args_list if '/site-info/' in c.args[0]]
+        self.assertEqual(len(site_info), 2)
+        self.session.close.assert_called_once()
+
+    def test_site_refresh(self):
+        """ Given a device is renamed between polls
+            And site information is refreshed every poll
+            Then the device index is rebuilt and the renamed outages are sent
+        """
+        with Watcher(['site-a', 'site-b'], {'key': 'val'}, self.earliest, site_refresh=1) as watcher:
+            watcher.poll()
+            index = watcher.device_indexes['site-b']
+            self.posted()
+            self.sites['site-a']['devices'][0]['name'] = 'Battery 1 (replaced)'
+            watcher.poll()
+            self.assertIs(watcher.device_indexes['site-b'], index) # unchanged site, index kept
+            self.assertEqual(self.posted(), ['site-a'])
+
+    def test_failed_post(self):
+        """ Given a site's POST fails
+            Then it is reported as failed and sent again by the next poll
+        """
+        self.session.post.return_value = mock_response(403)
+        with Watcher(['site-a'], {'key': 'val'}, self.earliest) as watcher:
+            self.assertEqual(watcher.poll(), {'site-a': {'outages': 1, 'error': 'site-outages: request failed'}})
+            self.session.post.return_value = mock_response(200, {})
+            self.posted()
+            self.assertEqual(watcher.poll(), {'site-a': {'outages': 1, 'error': None}})
+            self.assertEqual(self.posted(), ['site-a'])
+
+    def test_sync_state(self):
+        """ Given the outages were sent before the watcher was started
+            Then the first poll sends nothing
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            sync_state = SyncState(directory)
+            with Watcher(['site-a'], {'key': 'val'}, self.earliest, sync_state=sync_state) as watcher:
+                watcher.poll()
+            self.posted()
+            with Watcher(['site-a'], {'key': 'val'}, self.earliest, sync_state=sync_state) as watcher:
+                self.assertEqual(watcher.poll(), {'site-a': {'outages': 0, 'error': None}})
+        self.assertEqual(self.posted(), [])
+
+    def test_max_polls(self):
+        """ Given a maximum number of polls and no interval
+            Then the watcher stops after that many polls
+        """
+        with Watcher(['site-a'], {'key': 'val'}, self.earliest, interval=0) as watcher:
+            watcher.run(max_polls=3)
+        self.assertEqual(watcher.polls, 3)
+
+    def test_failed_poll(self):
+        """ Given the first of three polls raises an exception
+            Then it is printed and counted, and the watcher keeps polling
+            And a later poll sends the site
+        """
+        with Watcher(['site-a'], {'key': 'val'}, self.earliest, interval=0) as watcher:
+            poll = watcher.poll
+            failures = [ValueError('bad site information')]
+
+            def flaky_poll():
+                if failures:
+                    raise failures.pop()
+                return poll()
+            watcher.poll = MagicMock(side_effect=flaky_poll)
+            watcher.run(max_polls=3)
+        self.assertEqual(watcher.poll.call_count, 3)
+        self.assertIn('Poll failed (ValueError: bad site information)', self.output.getvalue())
+        self.assertEqual(self.posted(), ['site-a'])
+
+    def test_signal(self):
+        """ Given SIGTERM is received during a poll
+            Then the poll is finished, the watcher stops without waiting for the next poll
+            And the previous signal handler is restored
+        """
+        handler = signal.getsignal(signal.SIGTERM)
+        with Watcher(['site-a'], {'key': 'val'}, self.earliest, interval=3600) as watcher:
+            watcher.poll = MagicMock(side_effect=lambda: os.kill(os.getpid(), signal.SIGTERM))
+            watcher.run()
+        watcher.poll.assert_called_once()
+        self.assertIs(signal.getsignal(signal.SIGTERM), handler)
+        self.assertIn('Received SIGTERM', self.output.getvalue())
@@ -0,0 +1,104 @@
+import unittest
+import csv
+import io
+import json
+from outages import write_report, generate_pretty_table, format_duration
+from datetime import timedelta
+
+class TestWriteReport(unittest.TestCase):
+    """ This class contains tests for the write_report function
+        in outages.py, which writes a report of site outages one row at a time.
+    """
+    mock_site_outages = [
+        {'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'name': 'Battery 1', 'begin': '2022-01-01T00:00:00.000Z', 'end': '2021-09-15T19:45:10.341Z'}, # negative duration
+        {'id': '86b5c819-6a6c-4978-8c51-a2d810bb9318', 'name': 'Battery 2', 'begin': '2022-05-09T04:47:25.211Z', 'end': '2022-12-02T18:37:16.039Z'},
+        {'id': '0817cd44-b3ed-4790-8ce4-5b477ea86402', 'name': 'Aardvark 中', 'begin': '2022-12-04T07:25:45.750Z', 'end': '2099-12-25T16:11:32.270Z'}, # future end
+        {'id': '86b5c819-6a6c-4978-8c51-a2d810bb9318', 'name': 'Battery 2', 'begin': '2022-02-09T04:47:25.000Z', 'end': '2022-02-09T04:52:25.000Z'}
+    ]
+
+    def report(self, site_outages, format='table', downtime=False):
+        out = io.StringIO()
+        write_report(site_outages, out, format, downtime=downtime)
+        return out.getvalue()
+
+    def test_table_matches_pretty_table(self):
+        """ Given site outages with warnings, wide characters and repeated device names
+            Then the table is identical to the one printed from generate_pretty_table
+        """
+        self.assertEqual(self.report(self.mock_site_outages), str(generate_pretty_table(self.mock_site_outages)) + '\n')
+
+    def test_empty_table(self):
+        """ Given no site outages
+            Then only the header is written, as generate_pretty_table would
+        """
+        self.assertEqual(self.report([]), str(generate_pretty_table([])) + '\n')
+
+    def test_csv(self):
+        """ Given site outages
+            Then a CSV header and a row per outage are written, sorted by device name
+            And warnings are separated by '; '
+        """
+        rows = list(csv.reader(io.StringIO(self.report(self.mock_site_outages, 'csv'))))
+        self.assertEqual(rows[0], ['Device Name', 'Begin', 'End', 'Duration', 'Warnings'])
+        self.assertEqual([row[0] for row in rows[1:]], ['Aardvark 中', 'Battery 1', 'Battery 2', 'Battery 2'])
+        self.assertEqual(rows[2], ['Battery 1', '2022-01-01 00:00:00', '2021-09-15 19:45:10', '-108 days, 19:45:10', 'Negative duration detected'])
+        self.assertEqual(rows[3][3], '0:05:00')
+
+    def test_jsonl(self):
+        """ Given site outages
+            Then a JSON object is written per outage, sorted by device name
+            With the original dates, the duration in seconds and a list of warnings
+        """
+        lines = [json.loads(line) for line in self.report(self.mock_site_outages, 'jsonl').splitlines()]
+        self.assertEqual([line['name'] for line in lines], ['Aardvark 中', 'Battery 1', 'Battery 2', 'Battery 2'])
+        self.assertEqual(lines[1], {
+            'id': '111183e7-fb90-436b-9951-63392b36bdd2', 'name': 'Battery 1',
+            'begin': '2022-01-01T00:00:00.000Z', 'end': '2021-09-15T19:45:10.341Z',
+            'duration_seconds': -9260089.659, 'warnings': ['Negative duration detected']})
+        self.assertEqual(lines[0]['warnings'], ['Outage has future end date'])
+
+    def test_table_downtime(self):
+        """ Given site outages and a downtime summary is asked for
+            Then a second table shows each device's outages, merged outages and downtime
+        """
+        report = self.report(self.mock_site_outages, downtime=True)
+        outages_table, downtime_table = report.split('\n\n')
+        self.assertEqual(outages_table + '\n', self.report(self.mock_site_outages))
+        lines = downtime_table.splitlines()
+        self.assertEqual([cell.strip() for cell in lines[1].strip('|').split('|')], ['Device Name', 'Outages', 'Merged', 'Downtime'])
+        self.assertEqual([cell.strip() for cell in lines[5].strip('|').split('|')], ['Battery 2', '2', '2', '207 days, 13:54:50'])
+        self.assertEqual([cell.strip() for cell in lines[4].strip('|').split('|')], ['Battery 1', '1', '0', '0:00:00']) # negative duration
+
+    def test_jsonl_downtime(self):
+        """ Given site outages and a downtime summary is asked for
+            Then a JSON object is written per device after the outages, with its merged outages and downtime
+        """
+        lines = [json.loads(line) for line in self.report(self.mock_site_outages, 'jsonl', downtime=True).splitlines()]
+        self.assertEqual(len(lines), 7)
+        self.assertEqual(lines[-1], {
+            'type': 'downtime', 'id': '86b5c819-6a6c-4978-8c51-a2d810bb9318', 'name': 'Battery 2', 'outages': 2,
+            'merged': [{'begin': '2022-02-09T04:47:25.000Z', 'end': '2022-02-09T04:52:25.000Z'},
+                       {'begin': '2022-05-09T04:47:25.211Z', 'end': '2022-12-02T18:37:16.039Z'}],
+            'downtime_seconds': 17934890.828})
+
+    def test_csv_downtime(self):
+        """ Given the CSV format and a downtime summary is asked for
+            Then a ValueError is raised
+        """
+        with self.assertRaises(ValueError):
+            self.report(self.mock_site_outages, 'csv', downtime=True)
+
+    def test_invalid_format(self):
+        """ Given an unknown format
+            Then a ValueError is raised
+        """
+        with self.assertRaises(ValueError):
+            self.report(self.mock_site_outages, 'xml')
+
+    def test_format_duration(self):
+        """ Given durations with and without fractions of a second
+            Then they are formatted to the whole second
+        """
+        self.assertEqual(format_duration(timedelta(minutes=5)), '0:05:00')
+        self.assertEqual(format_duration(timedelta(days=1, microseconds=500000)), '1 day, 0:00:00')
+        self.assertEqual(format_duration(timedelta(seconds=-1.5)), '-1 day, 23:59:58')